@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после инициализации Django
+from main_wh.middleware import WebhookBodyLimitASGIMiddleware  # noqa: E402
+
+# Ограничение размера уведомлений до того, как Django прочитает тело целиком
+application = WebhookBodyLimitASGIMiddleware(django_application)
@@ -110,6 +110,10 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Отсечение запросов к неизвестным категориям до DRF (фильтр Блума)
+    'main_wh.middleware.UnknownCategoryMiddleware',
+    # Отклонение слишком больших уведомлений до чтения тела
+    'main_wh.middleware.WebhookBodyLimitMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -232,6 +236,122 @@ REDIS_QUEUE_URL = getenv('REDIS_QUEUE_URL', 'redis://localhost:6379/1')
 # URL-адрес брокера результатов, также Redis
 REDIS_QUEUE_NAME = getenv('REDIS_QUEUE_NAME', 'webhook_queue')
 
+# Тип очереди бизнес-сервиса: 'list' (список Redis) или 'stream' (поток Redis с группами потребителей,
+# подтверждением обработки и передачей неподтверждённых сообщений другим потребителям).
+# При смене типа ключ REDIS_QUEUE_NAME со старой очередью должен быть разобран и удалён (или задайте новое имя)
+REDIS_QUEUE_BACKEND = getenv('REDIS_QUEUE_BACKEND', 'list')
+REDIS_QUEUE_STREAM_GROUP = getenv('REDIS_QUEUE_STREAM_GROUP', 'business')
+REDIS_QUEUE_STREAM_MAXLEN = int(getenv('REDIS_QUEUE_STREAM_MAXLEN', 100000))
+
+# Размер пула соединений с Redis в каждом процессе. Для воркера Celery с пулом threads/eventlet
+# должен быть не меньше параллельности (--concurrency), иначе задачи ждут свободное соединение
+REDIS_QUEUE_POOL_SIZE = int(getenv('REDIS_QUEUE_POOL_SIZE', 10))
+
+# Формат сообщений бизнес-очереди: 'v1' (прежний JSON), 'json' (компактный JSON версии 2)
+# или 'msgpack' (версия 2, пакет msgpack). Версия 2 включается, только когда потребители
+# подтвердили её поддержку: SET <REDIS_QUEUE_NAME>:format:accept 2
+# Сжатие сообщений версии 2 от REDIS_QUEUE_COMPRESS_MIN_SIZE байт: 'zlib', 'zstd' (пакет zstandard)
+# или 'lz4' (пакет lz4). Сравнение форматов - команда bench_queue_codecs
+REDIS_QUEUE_MESSAGE_FORMAT = getenv('REDIS_QUEUE_MESSAGE_FORMAT', 'v1')
+REDIS_QUEUE_COMPRESSION = getenv('REDIS_QUEUE_COMPRESSION', '')
+REDIS_QUEUE_COMPRESS_MIN_SIZE = int(getenv('REDIS_QUEUE_COMPRESS_MIN_SIZE', 1024))
+
+# Буферизованный приём уведомлений: запись в БД и постановка в Celery пакетами.
+# Для партнёров, присылающих тысячи уведомлений в минуту.
+INGEST_BUFFER_ENABLED = getenv('INGEST_BUFFER_ENABLED', 'False').strip().lower() in ('true', '1', 'yes')
+
+# Где хранится буфер: 'memory' (в памяти воркера) или 'redis' (общий для всех воркеров)
+INGEST_BUFFER_BACKEND = getenv('INGEST_BUFFER_BACKEND', 'memory')
+
+# Когда отвечать отправителю: 'accepted' - после помещения в буфер, 'durable' - после записи в БД
+INGEST_ACK_MODE = getenv('INGEST_ACK_MODE', 'accepted')
+
+# Ограничения пакета: количество уведомлений и время ожидания в секундах
+INGEST_BATCH_SIZE = int(getenv('INGEST_BATCH_SIZE', 200))
+INGEST_FLUSH_INTERVAL = float(getenv('INGEST_FLUSH_INTERVAL', 1.0))
+
+# Сколько последних отклонённых при записи уведомлений хранить в буфере Redis (более старые удаляются)
+INGEST_DEAD_LETTER_MAX_SIZE = int(getenv('INGEST_DEAD_LETTER_MAX_SIZE', 1000))
+
+# Максимальный размер тела уведомления в байтах. Запросы больше отклоняются с кодом 413
+# по заголовку Content-Length, не дочитывая тело
+WEBHOOK_MAX_BODY_SIZE = int(getenv('WEBHOOK_MAX_BODY_SIZE', 10000))
+
+# Пакетная обработка: уведомления ставятся в Celery не по одному, а пакетами
+# (задача process_webhook_batch), размер пакета и максимальное ожидание в секундах
+BATCH_DISPATCH_ENABLED = getenv('BATCH_DISPATCH_ENABLED', 'False').strip().lower() in ('true', '1', 'yes')
+BATCH_DISPATCH_SIZE = int(getenv('BATCH_DISPATCH_SIZE', 100))
+BATCH_DISPATCH_MAX_DELAY = float(getenv('BATCH_DISPATCH_MAX_DELAY', 0.5))
+
+# Outbox бизнес-очереди: сообщения записываются в БД вместе с результатом разбора
+# и отправляются в Redis пакетами (задача relay_business_outbox, команда relay_outbox).
+# При отдельно запущенном ретрансляторе (relay_outbox --loop) отправку из воркеров можно отключить
+BUSINESS_OUTBOX_BATCH_SIZE = int(getenv('BUSINESS_OUTBOX_BATCH_SIZE', 500))
+BUSINESS_OUTBOX_RELAY_INLINE = getenv('BUSINESS_OUTBOX_RELAY_INLINE', 'True').strip().lower() in ('true', '1', 'yes')
+
+# Потоковая выгрузка Уведомлений (api/internal/webhooks/export/): записей в одном пакете чтения
+EXPORT_CHUNK_SIZE = int(getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Пакетное обновление бизнес-статуса (api/internal/webhooks/bulk-update/): элементов в одном запросе
+BULK_UPDATE_MAX_ITEMS = int(getenv('BULK_UPDATE_MAX_ITEMS', 10000))
+
+# Лента изменений Уведомлений (api/internal/webhooks/changes/): события разбора и изменения бизнес-статуса
+# в потоке Redis CHANGE_FEED_STREAM (на REDIS_QUEUE_URL). Клиент ждёт событие в запросе до CHANGE_FEED_MAX_WAIT
+# секунд (long-poll) или держит соединение Server-Sent Events до CHANGE_FEED_SSE_DURATION секунд.
+# Ожидание доступно только под ASGI-сервером (app-asgi, uvicorn): под WSGI (gunicorn) лента отдаёт
+# события без ожидания, а запросы с timeout и Server-Sent Events отклоняются
+CHANGE_FEED_ENABLED = getenv('CHANGE_FEED_ENABLED', 'False').strip().lower() in ('true', '1', 'yes')
+CHANGE_FEED_STREAM = getenv('CHANGE_FEED_STREAM', 'webhook_changes')
+CHANGE_FEED_MAXLEN = int(getenv('CHANGE_FEED_MAXLEN', 100000))
+CHANGE_FEED_MAX_WAIT = int(getenv('CHANGE_FEED_MAX_WAIT', 25))
+CHANGE_FEED_SSE_DURATION = int(getenv('CHANGE_FEED_SSE_DURATION', 60))
+
+# Срок хранения Уведомлений: удаление диапазонами id по RETENTION_CHUNK_SIZE с паузой RETENTION_CHUNK_PAUSE секунд,
+# не дольше RETENTION_MAX_SECONDS за запуск. После перевода таблицы на секционирование
+# (python manage.py partition_notifications --convert) устаревшие секции удаляются целиком
+RETENTION_DAYS = int(getenv('RETENTION_DAYS', 30))
+RETENTION_CHUNK_SIZE = int(getenv('RETENTION_CHUNK_SIZE', 5000))
+RETENTION_CHUNK_PAUSE = float(getenv('RETENTION_CHUNK_PAUSE', 0.5))
+RETENTION_MAX_SECONDS = int(getenv('RETENTION_MAX_SECONDS', 1800))
+RETENTION_PARTITION_DAYS = int(getenv('RETENTION_PARTITION_DAYS', 7))
+RETENTION_PARTITIONS_AHEAD = int(getenv('RETENTION_PARTITIONS_AHEAD', 4))
+
+# Архивация перед удалением по сроку хранения: записи пишутся в файлы NDJSON (gzip) в ARCHIVE_DIR по дням добавления,
+# файлы регистрируются в манифесте (модель NotificationArchive), удаляются только заархивированные записи.
+# Восстановление: python manage.py restore_notifications --id <id> | --date-from ... --date-to ...
+ARCHIVE_ENABLED = getenv('ARCHIVE_ENABLED', 'False').strip().lower() in ('true', '1', 'yes')
+ARCHIVE_DIR = getenv('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+ARCHIVE_CHUNK_SIZE = int(getenv('ARCHIVE_CHUNK_SIZE', 5000))
+ARCHIVE_FILE_MAX_ROWS = int(getenv('ARCHIVE_FILE_MAX_ROWS', 100000))
+ARCHIVE_COMPRESS_LEVEL = int(getenv('ARCHIVE_COMPRESS_LEVEL', 6))
+
+# Повторная обработка Уведомлений с ошибкой: ошибки в самих данных (размер, невалидный JSON) не повторяются,
+# остальные - не более RETRY_MAX_ATTEMPTS раз с паузой RETRY_BACKOFF_BASE * 2^попытка секунд (до RETRY_BACKOFF_MAX).
+# За запуск задачи в обработку возвращается не более RETRY_MAX_PER_RUN Уведомлений, по RETRY_CHUNK_SIZE за UPDATE
+RETRY_MAX_ATTEMPTS = int(getenv('RETRY_MAX_ATTEMPTS', 5))
+RETRY_BACKOFF_BASE = int(getenv('RETRY_BACKOFF_BASE', 60))
+RETRY_BACKOFF_MAX = int(getenv('RETRY_BACKOFF_MAX', 3600))
+RETRY_CHUNK_SIZE = int(getenv('RETRY_CHUNK_SIZE', 500))
+RETRY_MAX_PER_RUN = int(getenv('RETRY_MAX_PER_RUN', 5000))
+
+# Обработка Уведомления начинается с захвата (статус 'processing' с арендой на SWEEPER_LEASE_SECONDS секунд),
+# поэтому задачи и несколько экземпляров досборки process_pending_notifications не обрабатывают его дважды.
+# Досборка берёт ожидающие Уведомления старше SWEEPER_MIN_AGE секунд. Каждые SWEEPER_MIN_INTERVAL-SWEEPER_MAX_INTERVAL
+# секунд она замеряет очередь и скорость обработки, выбирает размер пакета (SWEEPER_BATCH_SIZE-SWEEPER_MAX_BATCH_SIZE)
+# и запускает по задаче на каждые SWEEPER_FANOUT_THRESHOLD ожидающих (не более SWEEPER_MAX_WORKERS).
+# Оценка времени разбора очереди: api/internal/metrics/ (webhook_sweeper_drain_eta_seconds)
+SWEEPER_BATCH_SIZE = int(getenv('SWEEPER_BATCH_SIZE', 100))
+SWEEPER_MAX_BATCH_SIZE = int(getenv('SWEEPER_MAX_BATCH_SIZE', 1000))
+SWEEPER_TARGET_BATCH_SECONDS = float(getenv('SWEEPER_TARGET_BATCH_SECONDS', 2))
+SWEEPER_LEASE_SECONDS = int(getenv('SWEEPER_LEASE_SECONDS', 300))
+SWEEPER_MIN_AGE = int(getenv('SWEEPER_MIN_AGE', 60))
+SWEEPER_MAX_SECONDS = int(getenv('SWEEPER_MAX_SECONDS', 240))
+SWEEPER_MIN_INTERVAL = int(getenv('SWEEPER_MIN_INTERVAL', 10))
+SWEEPER_MAX_INTERVAL = int(getenv('SWEEPER_MAX_INTERVAL', 300))
+SWEEPER_FANOUT_THRESHOLD = int(getenv('SWEEPER_FANOUT_THRESHOLD', 5000))
+SWEEPER_MAX_WORKERS = int(getenv('SWEEPER_MAX_WORKERS', 4))
+SWEEPER_STATE_KEY = getenv('SWEEPER_STATE_KEY', 'webhook_sweeper')
+
 # Настройки для Celery
 
 # URL-адрес брокера сообщений
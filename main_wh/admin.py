@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from main_wh.models import WebhookRequest, CategoryWebhook
+from main_wh.category_cache import invalidate_category_cache
 
 
 @admin.register(WebhookRequest)
@@ -30,10 +33,10 @@ class WebhookRequestAdmin(admin.ModelAdmin):
 
 @admin.register(CategoryWebhook)
 class CategoryWebhookAdmin(admin.ModelAdmin):
-    list_display = ('id_ext', 'name', 'is_active', 'created_at', 'webhook_count')
-    list_filter = ('is_active', 'created_at')
+    list_display = ('id_ext', 'name', 'is_active', 'parsing_profile', 'created_at', 'webhook_count')
+    list_filter = ('is_active', 'parsing_profile', 'created_at')
     search_fields = ('id_ext', 'name', 'description')
-    readonly_fields = ('created_at', 'webhook_count_display')
+    readonly_fields = ('created_at', 'updated_at', 'webhook_count_display')
     actions = ['activate_categories', 'deactivate_categories']
 
     # Поля для формы редактирования
@@ -45,8 +48,14 @@ class CategoryWebhookAdmin(admin.ModelAdmin):
             'fields': ('description',),
             'classes': ('collapse',)
         }),
+        ('Профиль разбора', {
+            'fields': ('parsing_profile', 'allowed_content_types', 'max_body_size', 'max_form_params',
+                       'max_json_depth', 'max_keys', 'max_array_length'),
+            'description': 'Пустые значения лимитов берутся из профиля.',
+            'classes': ('collapse',)
+        }),
         ('Статистика', {
-            'fields': ('created_at', 'webhook_count_display'),
+            'fields': ('created_at', 'updated_at', 'webhook_count_display'),
             'classes': ('collapse',)
         })
     )
@@ -65,14 +74,18 @@ class CategoryWebhookAdmin(admin.ModelAdmin):
 
     def activate_categories(self, request, queryset):
         """Активировать выбранные категории"""
-        updated = queryset.update(is_active=True)
+        updated = queryset.update(is_active=True, updated_at=timezone.now())
+        # update() не отправляет сигналы, сбрасываем кэш категорий явно после фиксации транзакции
+        transaction.on_commit(invalidate_category_cache)
         self.message_user(request, f'Активировано {updated} категорий.')
 
     activate_categories.short_description = 'Активировать выбранные категории'
 
     def deactivate_categories(self, request, queryset):
         """Деактивировать выбранные категории"""
-        updated = queryset.update(is_active=False)
+        updated = queryset.update(is_active=False, updated_at=timezone.now())
+        # update() не отправляет сигналы, сбрасываем кэш категорий явно после фиксации транзакции
+        transaction.on_commit(invalidate_category_cache)
         self.message_user(request, f'Деактивировано {updated} категорий.')
 
     deactivate_categories.short_description = 'Деактивировать выбранные категории'
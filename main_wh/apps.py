@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MainWhConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_wh'
+
+    def ready(self):
+        # Регистрация обработчиков сигналов
+        import main_wh.signals  # noqa: F401
@@ -0,0 +1,258 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import DateTimeField, Max
+
+from main_wh.conf import app_settings
+from main_wh.models import CategoryWebhook, NotificationArchive, WebhookRequest
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Колонки записи в архиве (все колонки таблицы, категория - идентификатором category_id)
+ARCHIVE_FIELDS = tuple(field.attname for field in WebhookRequest._meta.concrete_fields)
+
+# Поля, значения которых при восстановлении преобразуются из строки ISO 8601
+DATETIME_FIELDS = frozenset(field.attname for field in WebhookRequest._meta.concrete_fields
+                            if isinstance(field, DateTimeField))
+
+# Поля, которые create() / bulk_create заполняют текущим временем (восстанавливаются отдельным UPDATE)
+AUTO_DATETIME_FIELDS = ('inserted_at', 'updated_at')
+
+FILE_SUFFIX = '.ndjson.gz'
+
+
+def json_default(value):
+    # Время - полностью (DjangoJSONEncoder отбрасывает микросекунды)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Тип {type(value).__name__} не поддерживается в архиве')
+
+
+def get_archive_dir():
+    return Path(app_settings.ARCHIVE_DIR)
+
+
+class ArchiveFileWriter:
+    """
+    Файл архива одного дня: записи пишутся во временный файл, который после закрытия
+    (fsync) переименовывается по диапазону идентификаторов и регистрируется в манифесте.
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.directory = get_archive_dir() / f'{day:%Y/%m/%d}'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.directory / f'.webhooks_{day:%Y%m%d}_{os.getpid()}_{time.time_ns()}.tmp'
+        self.file = open(self.temp_path, 'wb')
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=app_settings.ARCHIVE_COMPRESS_LEVEL)
+        self.first_id = None
+        self.last_id = None
+        self.row_count = 0
+
+    def write(self, record):
+        self.gzip.write(json.dumps(record, ensure_ascii=False, separators=(',', ':'),
+                                   default=json_default).encode('utf-8'))
+        self.gzip.write(b'\n')
+        if self.first_id is None:
+            self.first_id = record['id']
+        self.last_id = record['id']
+        self.row_count += 1
+
+    def close(self):
+        """
+        Returns:
+            NotificationArchive: Запись манифеста (не сохранённая)
+        """
+
+        self.gzip.close()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        # Файл с тем же диапазоном уже есть (записи восстанавливались и архивируются повторно) - не перезаписывается
+        name = f'webhooks_{self.day:%Y%m%d}_{self.first_id}-{self.last_id}'
+        path = self.directory / f'{name}{FILE_SUFFIX}'
+        number = 1
+        while path.exists():
+            path = self.directory / f'{name}_{number}{FILE_SUFFIX}'
+            number += 1
+        os.replace(self.temp_path, path)
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                sha256.update(block)
+
+        return NotificationArchive(
+            path=str(path.relative_to(get_archive_dir())), day=self.day,
+            first_id=self.first_id, last_id=self.last_id, row_count=self.row_count,
+            size_bytes=path.stat().st_size, sha256=sha256.hexdigest(),
+        )
+
+    def discard(self):
+        self.gzip.close()
+        self.file.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+
+
+def archive_expired(cutoff, max_seconds=None):
+    """
+    Запись Уведомлений старше cutoff в файлы архива (по дням добавления) по возрастанию id.
+    Записи читаются через серверный курсор пакетами по ARCHIVE_CHUNK_SIZE, поэтому память
+    не зависит от их количества. Сами записи не удаляются: удаление - после регистрации файлов
+    в манифесте, только до последнего заархивированного id (см. main_wh.retention.cleanup_expired).
+
+    Returns:
+        dict: Количество файлов и записей, последний заархивированный id, признак полного прохода
+    """
+
+    max_seconds = max_seconds or app_settings.RETENTION_MAX_SECONDS
+    deadline = time.monotonic() + max_seconds
+    result = {'files': 0, 'rows': 0, 'last_id': None, 'complete': True}
+
+    expired = WebhookRequest.objects.filter(inserted_at__lt=cutoff)
+    # Точная граница (в отличие от delete_in_chunks): незаархивированная запись не должна быть удалена
+    boundary = expired.aggregate(boundary=Max('id'))['boundary']
+    if boundary is None:
+        return result
+
+    rows = (expired.filter(id__lte=boundary).order_by('id').values_list(*ARCHIVE_FIELDS)
+            .iterator(chunk_size=app_settings.ARCHIVE_CHUNK_SIZE))
+
+    writers = {}
+    entries = []
+    try:
+        for row in rows:
+            record = dict(zip(ARCHIVE_FIELDS, row))
+            day = record['inserted_at'].astimezone(dt_timezone.utc).date()
+
+            writer = writers.get(day)
+            if writer is None:
+                writer = writers[day] = ArchiveFileWriter(day)
+            writer.write(record)
+            result['rows'] += 1
+            result['last_id'] = record['id']
+
+            if writer.row_count >= app_settings.ARCHIVE_FILE_MAX_ROWS:
+                entries.append(writers.pop(day).close())
+
+            if time.monotonic() >= deadline:
+                result['complete'] = False
+                logger.warning(f"Архивация Уведомлений прервана по времени ({max_seconds} с) на id {record['id']}")
+                break
+
+        entries.extend(writer.close() for writer in writers.values())
+        writers = {}
+    finally:
+        # Ошибка чтения или записи: незавершённые файлы удаляются, записи остаются в таблице
+        for writer in writers.values():
+            writer.discard()
+
+    NotificationArchive.objects.bulk_create(entries)
+    result['files'] = len(entries)
+
+    logger.info(f"Заархивировано Уведомлений: {result['rows']}, файлов: {result['files']}")
+    return result
+
+
+def find_archives(ids=None, date_from=None, date_to=None):
+    """
+    Файлы манифеста, которые могут содержать записи с указанными id или добавленные за период
+    """
+
+    archives = NotificationArchive.objects.all()
+    if ids:
+        archives = archives.filter(first_id__lte=max(ids), last_id__gte=min(ids))
+    if date_from:
+        archives = archives.filter(day__gte=date_from)
+    if date_to:
+        archives = archives.filter(day__lte=date_to)
+    return archives.order_by('day', 'first_id')
+
+
+def read_archive(archive):
+    """
+    Записи файла архива (поля времени - объекты datetime)
+    """
+
+    path = get_archive_dir() / archive.path
+    with gzip.open(path, 'rb') as file:
+        for line in file:
+            record = json.loads(line)
+            for field_name in DATETIME_FIELDS:
+                if record.get(field_name):
+                    record[field_name] = datetime.fromisoformat(record[field_name])
+            yield record
+
+
+def iter_archived(ids=None, date_from=None, date_to=None):
+    """
+    Записи архива по списку id и/или периоду добавления (date_from / date_to - даты UTC включительно)
+    """
+
+    ids = set(ids or ())
+    # Запись может быть в нескольких файлах (восстановлена и заархивирована повторно)
+    seen = set()
+    for archive in find_archives(ids, date_from, date_to):
+        for record in read_archive(archive):
+            if (ids and record['id'] not in ids) or record['id'] in seen:
+                continue
+            day = record['inserted_at'].astimezone(dt_timezone.utc).date()
+            if (date_from and day < date_from) or (date_to and day > date_to):
+                continue
+            seen.add(record['id'])
+            yield record
+
+
+def restore_records(records, batch_size=1000):
+    """
+    Возврат записей архива в таблицу Уведомлений с прежними id и временем.
+    Записи, уже присутствующие в таблице, и записи удалённых Категорий пропускаются.
+
+    Returns:
+        dict: Количество восстановленных и пропущенных записей
+    """
+
+    result = {'restored': 0, 'skipped': 0}
+    category_ids = set(CategoryWebhook.objects.values_list('id', flat=True))
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _restore_batch(batch, category_ids, result)
+            batch = []
+    if batch:
+        _restore_batch(batch, category_ids, result)
+
+    return result
+
+
+def _restore_batch(records, category_ids, result):
+    existing = set(WebhookRequest.objects.filter(id__in=[record['id'] for record in records])
+                   .values_list('id', flat=True))
+    pairs = [(WebhookRequest(**record), record) for record in records
+             if record['id'] not in existing and record['category_id'] in category_ids]
+    result['skipped'] += len(records) - len(pairs)
+    if not pairs:
+        return
+
+    objects = [obj for obj, _ in pairs]
+    with transaction.atomic():
+        WebhookRequest.objects.bulk_create(objects)
+        # bulk_create заполняет inserted_at / updated_at текущим временем, bulk_update - нет
+        for obj, record in pairs:
+            for field_name in AUTO_DATETIME_FIELDS:
+                setattr(obj, field_name, record[field_name])
+        WebhookRequest.objects.bulk_update(objects, AUTO_DATETIME_FIELDS)
+
+    result['restored'] += len(objects)
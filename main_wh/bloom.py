@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from hashlib import blake2b
+
+from main_wh.conf import app_settings
+from main_wh.category_cache import category_cache
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Компактный фильтр Блума: отвечает "точно нет" или "возможно есть".
+    Ложноотрицательных ответов не бывает, ложноположительные ограничены error_rate.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        # Размер битового массива и количество хэш-функций по стандартным формулам
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Двойное хэширование: две половины одного дайджеста дают все k позиций
+        digest = blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class ActiveCategoryFilter:
+    """
+    Фильтр Блума по id_ext активных Категорий Уведомлений.
+    Перестраивается после сброса кэша категорий (сигналы и рассылка через Redis)
+    и по истечении CATEGORY_CACHE_TTL.
+    """
+
+    # Попыток построения, если фильтр сбрасывается во время запроса к БД
+    REFRESH_ATTEMPTS = 3
+
+    def __init__(self):
+        self._filter = None
+        self._built_at = 0.0
+        # Номер сброса: фильтр, построенный до сброса, не публикуется
+        self._generation = 0
+        self._lock = threading.Lock()
+        category_cache.add_clear_listener(self.invalidate)
+
+    def invalidate(self):
+        self._generation += 1
+        self._filter = None
+
+    def is_stale(self):
+        return self._filter is None or time.monotonic() - self._built_at > app_settings.CATEGORY_CACHE_TTL
+
+    def refresh(self):
+        """
+        Построение фильтра по активным категориям (один запрос к БД).
+        Если во время запроса кэш категорий сброшен (создана или включена категория),
+        результат может не содержать новую категорию, и запрос повторяется.
+        Подписку на сброс запускает UnknownCategoryMiddleware при создании.
+        """
+
+        # Импорт здесь, чтобы избежать циклических импортов
+        from main_wh.models import CategoryWebhook
+
+        with self._lock:
+            for _ in range(self.REFRESH_ATTEMPTS):
+                if not self.is_stale():
+                    return
+
+                generation = self._generation
+                external_ids = list(CategoryWebhook.get_active_categories().values_list('id_ext', flat=True))
+                bloom_filter = BloomFilter(len(external_ids), app_settings.CATEGORY_FILTER_ERROR_RATE)
+                for external_id in external_ids:
+                    bloom_filter.add(external_id)
+
+                if generation != self._generation:
+                    continue
+
+                self._filter = bloom_filter
+                self._built_at = time.monotonic()
+                logger.info(f"Фильтр активных категорий перестроен: {len(external_ids)} шт.")
+                return
+
+            # Сбросы идут непрерывно: без фильтра запросы проходят дальше, решение примет представление
+            logger.warning("Фильтр активных категорий не построен: кэш категорий сбрасывался во время построения")
+
+    def might_exist(self, external_id):
+        """
+        Returns:
+            bool: False - категории точно нет, True - возможно есть (или фильтр не построен)
+        """
+
+        bloom_filter = self._filter
+        if bloom_filter is None:
+            return True
+        return external_id in bloom_filter
+
+
+# Глобальный экземпляр фильтра процесса
+active_category_filter = ActiveCategoryFilter()
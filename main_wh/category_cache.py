@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from redis import from_url as redis_from_url
+
+from main_wh.conf import app_settings
+from main_wh.redis_client import redis_queue
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Сообщение в канале Redis о сбросе всего кэша
+INVALIDATE_ALL = '*'
+
+
+class CategoryCache:
+    """
+    Кэш активных Категорий Уведомлений в памяти процесса.
+    Хранит и отрицательные результаты (категория не найдена), чтобы перебор
+    случайных id_ext сканерами не доходил до PostgreSQL.
+    Все воркеры сбрасывают кэш одновременно по сообщению в канале Redis.
+    """
+
+    # Признак отсутствия значения в кэше (None - закэшированное "не найдено")
+    MISSING = object()
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._subscriber = None
+        self._subscriber_pid = None
+        self._clear_listeners = []
+
+    def lookup(self, external_id):
+        """
+        Поиск категории в кэше.
+
+        Returns:
+            CategoryWebhook | None | MISSING: Категория, None (не найдена) или MISSING (нет в кэше)
+        """
+
+        if not app_settings.CATEGORY_CACHE_ENABLED:
+            return self.MISSING
+
+        self.ensure_subscriber()
+
+        with self._lock:
+            entry = self._entries.get(external_id)
+            if entry is not None:
+                expires_at, category = entry
+                if expires_at > time.monotonic():
+                    # Недавно использованные записи вытесняются последними
+                    self._entries.move_to_end(external_id)
+                    if category is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return category
+                del self._entries[external_id]
+
+            self.misses += 1
+            return self.MISSING
+
+    def store(self, external_id, category):
+        """
+        Сохранение результата поиска категории (в т.ч. None).
+        """
+
+        if not app_settings.CATEGORY_CACHE_ENABLED:
+            return
+
+        ttl = app_settings.CATEGORY_CACHE_TTL if category is not None else app_settings.CATEGORY_CACHE_NEGATIVE_TTL
+
+        with self._lock:
+            self._entries[external_id] = (time.monotonic() + ttl, category)
+            self._entries.move_to_end(external_id)
+            while len(self._entries) > app_settings.CATEGORY_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Сброс кэша текущего процесса.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+        for listener in self._clear_listeners:
+            listener()
+
+    def add_clear_listener(self, listener):
+        """
+        Регистрация функции, вызываемой при сбросе кэша (например, для перестроения фильтра категорий).
+        """
+
+        self._clear_listeners.append(listener)
+
+    def stats(self):
+        """
+        Счётчики кэша текущего процесса
+        """
+
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'pid': os.getpid(),
+            'enabled': app_settings.CATEGORY_CACHE_ENABLED,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations,
+            'subscriber_alive': bool(self._subscriber and self._subscriber.is_alive()),
+        }
+
+    def ensure_subscriber(self):
+        """
+        Запуск подписки на канал сброса кэша в текущем процессе (после fork - заново).
+        """
+
+        pid = os.getpid()
+        if self._subscriber is not None and self._subscriber_pid == pid and self._subscriber.is_alive():
+            return
+
+        with self._lock:
+            if self._subscriber is not None and self._subscriber_pid == pid and self._subscriber.is_alive():
+                return
+
+            self._subscriber = threading.Thread(target=self._listen, name='webhook-category-cache', daemon=True)
+            self._subscriber_pid = pid
+            self._subscriber.start()
+
+    def _listen(self):
+        while True:
+            try:
+                redis_client = redis_from_url(app_settings.REDIS_QUEUE_URL, decode_responses=True,
+                                              socket_connect_timeout=5, health_check_interval=30)
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(app_settings.CATEGORY_CACHE_CHANNEL)
+
+                # Пока подписка не установлена, сообщения могли быть пропущены
+                self.clear()
+
+                for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.clear()
+
+            except Exception as err:
+                logger.warning(f"Подписка на сброс кэша категорий прервана: {err}")
+                # Без подписки устаревание ограничено только TTL, поэтому сбрасываем кэш
+                self.clear()
+                time.sleep(5)
+
+
+def invalidate_category_cache(external_id=INVALIDATE_ALL):
+    """
+    Сброс кэша категорий в текущем процессе и рассылка сброса остальным воркерам.
+    """
+
+    category_cache.clear()
+
+    try:
+        # Соединение из общего пула процесса
+        redis_queue.get_client().publish(app_settings.CATEGORY_CACHE_CHANNEL, external_id)
+    except Exception as err:
+        logger.error(f"Ошибка рассылки сброса кэша категорий: {err}")
+
+
+# Глобальный экземпляр кэша процесса
+category_cache = CategoryCache()
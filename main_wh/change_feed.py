@@ -0,0 +1,196 @@
+import json
+import re
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from redis.asyncio import Redis as AsyncRedis
+
+from main_wh.conf import app_settings
+from main_wh.redis_client import redis_queue
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Типы событий ленты изменений
+EVENT_PROCESSED = 'processed'  # Уведомление разобрано (status 'complete' или 'error')
+EVENT_BUSINESS_STATUS = 'business_status'  # Бизнес-сервис изменил бизнес-статус
+
+# Поле записи потока, в котором хранится событие
+EVENT_FIELD = 'event'
+
+# Курсор - идентификатор записи потока Redis ('<мс>-<номер>' или '<мс>')
+CURSOR_PATTERN = re.compile(r'^\d+(-\d+)?$')
+CURSOR_START = '0-0'
+
+
+def build_event(event_type, notification, updated_at=None):
+    """
+    Событие ленты: только идентификатор и статусы. Полные данные клиент получает через
+    api/internal/webhooks/<id>/ (с ETag), поэтому событие остаётся маленьким.
+    """
+    updated_at = updated_at or notification.updated_at or timezone.now()
+    return {
+        'type': event_type,
+        'id': notification.id,
+        'status': notification.status,
+        'business_status': notification.business_status,
+        'updated_at': updated_at.isoformat(),
+    }
+
+
+def _parse_cursor(cursor):
+    milliseconds, _, sequence = cursor.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+class ChangeFeed:
+    """
+    Лента изменений Уведомлений на потоке Redis (Streams).
+    Запись - XADD с приблизительным ограничением длины (MAXLEN ~), чтение - XREAD с ожиданием (BLOCK),
+    поэтому клиент получает событие сразу после фиксации изменения, а не при следующем опросе списка.
+    Курсор клиента - идентификатор последней полученной записи потока: после переподключения
+    чтение продолжается с него, пока запись не вытеснена обрезкой потока.
+    Ожидающее чтение - асинхронное (redis.asyncio): ожидание не занимает поток воркера.
+    """
+
+    def __init__(self):
+        self.stream_name = app_settings.CHANGE_FEED_STREAM
+
+    @staticmethod
+    def get_reader_client():
+        """
+        Клиент redis.asyncio для ожидающих чтений (XREAD BLOCK). Отдельный от общего пула бизнес-очереди:
+        долгий XREAD BLOCK не должен упираться в его таймаут сокета (5 секунд).
+        Клиент привязан к циклу событий, в котором используется, поэтому создаётся на запрос
+        и закрывается вызывающим (aclose).
+        """
+        return AsyncRedis.from_url(
+            app_settings.REDIS_QUEUE_URL,
+            decode_responses=True,
+            # Таймаут сокета больше максимального ожидания XREAD BLOCK
+            socket_timeout=app_settings.CHANGE_FEED_MAX_WAIT + 5,
+            socket_connect_timeout=5,
+        )
+
+    def publish(self, events):
+        """
+        Запись событий в поток после фиксации текущей транзакции (вне транзакции - сразу).
+        Ошибка Redis не прерывает изменение данных: лента - уведомление о событии,
+        а не источник данных, и пропущенное изменение клиент увидит при сверке через список.
+        """
+
+        if not app_settings.CHANGE_FEED_ENABLED or not events:
+            return
+
+        events = list(events)
+        transaction.on_commit(lambda: self._write(events))
+
+    def _write(self, events):
+        try:
+            pipeline = redis_queue.get_client().pipeline(transaction=False)
+            for event in events:
+                pipeline.xadd(self.stream_name, {EVENT_FIELD: json.dumps(event, ensure_ascii=False)},
+                              maxlen=app_settings.CHANGE_FEED_MAXLEN, approximate=True)
+            pipeline.execute()
+        except Exception as err:
+            logger.error(f"Ошибка записи событий в ленту изменений {self.stream_name}: {err}")
+
+    @staticmethod
+    def validate_cursor(cursor):
+        """
+        Returns:
+            bool: Допустим ли курсор
+        """
+        return bool(CURSOR_PATTERN.match(cursor))
+
+    @staticmethod
+    def _latest_cursor(latest):
+        return latest[0][0] if latest else CURSOR_START
+
+    @staticmethod
+    def _is_truncated(cursor, first):
+        # Курсор старше первой сохранённой записи потока
+        if _parse_cursor(cursor) == (0, 0):
+            return False
+        return bool(first) and _parse_cursor(cursor) < _parse_cursor(first[0][0])
+
+    def get_latest_cursor(self, redis_client=None):
+        """
+        Идентификатор последней записи потока
+        """
+        redis_client = redis_client or redis_queue.get_client()
+        return self._latest_cursor(redis_client.xrevrange(self.stream_name, count=1))
+
+    async def aget_latest_cursor(self, redis_client):
+        """
+        Идентификатор последней записи потока (начало чтения для клиента без курсора)
+        """
+        return self._latest_cursor(await redis_client.xrevrange(self.stream_name, count=1))
+
+    async def ais_truncated(self, redis_client, cursor):
+        """
+        Записи после курсора могли быть вытеснены обрезкой потока: курсор старше первой сохранённой записи.
+        В этом случае клиенту нужна сверка через список Уведомлений.
+        """
+        return self._is_truncated(cursor, await redis_client.xrange(self.stream_name, count=1))
+
+    async def aread(self, redis_client, cursor=None, limit=100, wait=0):
+        """
+        События после курсора. Если их нет, ожидание до wait секунд появления новых.
+
+        Args:
+            redis_client: Клиент redis.asyncio (get_reader_client)
+            cursor: Курсор из предыдущего ответа (без курсора - только новые события)
+            limit: Максимальное количество событий
+            wait: Время ожидания в секундах (0 - без ожидания)
+        Returns:
+            tuple: (события, курсор для следующего запроса, признак возможного пропуска событий)
+        """
+
+        cursor = cursor or await self.aget_latest_cursor(redis_client)
+        truncated = await self.ais_truncated(redis_client, cursor)
+
+        # block=None - без ожидания (BLOCK 0 в Redis означает бесконечное ожидание)
+        result = await redis_client.xread({self.stream_name: cursor}, count=limit,
+                                          block=max(int(wait * 1000), 1) if wait > 0 else None)
+
+        events = []
+        for _, entries in result or ():
+            for entry_id, fields in entries:
+                events.append({'cursor': entry_id, **json.loads(fields[EVENT_FIELD])})
+                cursor = entry_id
+
+        return events, cursor, truncated
+
+    async def aiter_events(self, redis_client, cursor=None, duration=None, wait=None, limit=100):
+        """
+        Непрерывное чтение для Server-Sent Events: пачки событий по мере появления
+        (пустая пачка - истёк интервал ожидания, можно отправить keepalive).
+        Чтение завершается через duration секунд, клиент переподключается с курсором.
+        """
+
+        duration = duration or app_settings.CHANGE_FEED_SSE_DURATION
+        wait = wait or app_settings.CHANGE_FEED_MAX_WAIT
+        deadline = time.monotonic() + duration
+
+        cursor = cursor or await self.aget_latest_cursor(redis_client)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events, cursor, truncated = await self.aread(redis_client, cursor, limit=limit,
+                                                         wait=min(wait, remaining))
+            yield events, cursor, truncated
+
+    def get_stats(self):
+        redis_client = redis_queue.get_client()
+        return {
+            'stream': self.stream_name,
+            'length': redis_client.xlen(self.stream_name),
+            'latest_cursor': self.get_latest_cursor(redis_client),
+        }
+
+
+# Глобальный экземпляр (в каждом процессе)
+change_feed = ChangeFeed()
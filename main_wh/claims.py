@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from main_wh.conf import app_settings
+from main_wh.models import NULL_DATE, WebhookRequest
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _claim_sql(condition):
+    table = connection.ops.quote_name(WebhookRequest._meta.db_table)
+    # Подзапрос с SKIP LOCKED: строки, которые сейчас захватывает другой процесс, пропускаются,
+    # а не ожидаются. Захват с истёкшей арендой (процесс упал, не завершив обработку) перехватывается
+    return (
+        f"UPDATE {table} SET status = %s, claimed_until = %s, updated_at = %s "
+        f"WHERE id IN (SELECT id FROM {table} WHERE {condition} "
+        f"AND (status = %s OR (status = %s AND claimed_until < %s)) "
+        f"ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED) "
+        f"RETURNING id"
+    )
+
+
+def _claim(condition, condition_param, limit, lease_seconds):
+    now = timezone.now()
+    lease_seconds = lease_seconds or app_settings.SWEEPER_LEASE_SECONDS
+    with connection.cursor() as cursor:
+        cursor.execute(_claim_sql(condition), [
+            WebhookRequest.STATUS_PROCESSING, now + timedelta(seconds=lease_seconds), now,
+            condition_param,
+            WebhookRequest.STATUS_NEW, WebhookRequest.STATUS_PROCESSING, now,
+            limit,
+        ])
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def claim_notifications(notification_ids, lease_seconds=None):
+    """
+    Захват указанных Уведомлений для обработки (статус 'processing' с арендой до claimed_until).
+    Захватываются только новые Уведомления и Уведомления с истёкшей арендой: уже обработанные
+    и обрабатываемые другим процессом пропускаются, поэтому одно Уведомление не обрабатывается дважды.
+
+    Returns:
+        list: Идентификаторы захваченных Уведомлений
+    """
+
+    notification_ids = list(set(notification_ids))
+    if not notification_ids:
+        return []
+    return _claim('id = ANY(%s)', notification_ids, len(notification_ids), lease_seconds)
+
+
+def claim_pending(limit, lease_seconds=None, min_age=None):
+    """
+    Захват порции ожидающих Уведомлений для периодической досборки.
+    Уведомления моложе min_age секунд не берутся: их обычно уже обрабатывает собственная задача.
+
+    Returns:
+        list: Идентификаторы захваченных Уведомлений
+    """
+
+    min_age = app_settings.SWEEPER_MIN_AGE if min_age is None else min_age
+    return _claim('updated_at <= %s', timezone.now() - timedelta(seconds=min_age), limit, lease_seconds)
+
+
+def release_claims(notification_ids):
+    """
+    Возврат захваченных, но не обработанных Уведомлений в статус 'new' (например, перед повтором задачи).
+    Ошибка не прерывает вызывающего: без возврата Уведомления освободятся по истечении аренды.
+    """
+
+    try:
+        WebhookRequest.objects.filter(id__in=notification_ids, status=WebhookRequest.STATUS_PROCESSING).update(
+            status=WebhookRequest.STATUS_NEW, claimed_until=NULL_DATE, updated_at=timezone.now())
+    except Exception as err:
+        logger.error(f"Ошибка освобождения {len(notification_ids)} захваченных Уведомлений: {err}")
+
+
+def get_claim_stats():
+    """
+    Ожидающие и захваченные Уведомления (в том числе с истёкшей арендой)
+    """
+
+    processing = WebhookRequest.objects.filter(status=WebhookRequest.STATUS_PROCESSING)
+    return {
+        'pending': WebhookRequest.objects.filter(status=WebhookRequest.STATUS_NEW).count(),
+        'processing': processing.count(),
+        'expired_claims': processing.filter(claimed_until__lt=timezone.now()).count(),
+    }
@@ -0,0 +1,35 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """
+    ETag (в кавычках) по версии ресурса: идентификаторам, updated_at и параметрам представления.
+    """
+    return f'"{hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"'
+
+
+def _timestamp(last_modified):
+    # Last-Modified передаётся с точностью до секунды
+    return timegm(last_modified.utctimetuple()) if last_modified else None
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """
+    Ответ 304, если у клиента та же версия (If-None-Match / If-Modified-Since), иначе None.
+    If-None-Match проверяется первым: изменения в пределах одной секунды видны только по ETag.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
@@ -29,5 +29,336 @@ class AppSettings:
     def REDIS_QUEUE_NAME(self):
         return self._get_setting('REDIS_QUEUE_NAME', 'webhook_queue')
 
+    @property
+    def REDIS_QUEUE_BACKEND(self):
+        # 'list' - список Redis (LPUSH), 'stream' - поток Redis с группами потребителей
+        return self._get_setting('REDIS_QUEUE_BACKEND', 'list')
+
+    @property
+    def REDIS_QUEUE_STREAM_GROUP(self):
+        # Группа потребителей потока, создаваемая при первой записи
+        return self._get_setting('REDIS_QUEUE_STREAM_GROUP', 'business')
+
+    @property
+    def REDIS_QUEUE_STREAM_MAXLEN(self):
+        # Приблизительная максимальная длина потока (старые записи обрезаются)
+        return self._get_setting('REDIS_QUEUE_STREAM_MAXLEN', 100000)
+
+    @property
+    def REDIS_QUEUE_POOL_SIZE(self):
+        # Максимальное количество соединений с Redis в пуле процесса
+        return self._get_setting('REDIS_QUEUE_POOL_SIZE', 10)
+
+    @property
+    def REDIS_QUEUE_POOL_TIMEOUT(self):
+        # Время ожидания (в секундах) свободного соединения, когда пул исчерпан
+        return self._get_setting('REDIS_QUEUE_POOL_TIMEOUT', 5)
+
+    @property
+    def REDIS_QUEUE_MESSAGE_FORMAT(self):
+        # Формат сообщений бизнес-очереди: 'v1', 'json' или 'msgpack' (см. main_wh.queue_codecs)
+        return self._get_setting('REDIS_QUEUE_MESSAGE_FORMAT', 'v1')
+
+    @property
+    def REDIS_QUEUE_COMPRESSION(self):
+        # Сжатие сообщений версии 2: '' (без сжатия), 'zlib', 'zstd' или 'lz4'
+        return self._get_setting('REDIS_QUEUE_COMPRESSION', '')
+
+    @property
+    def REDIS_QUEUE_COMPRESS_MIN_SIZE(self):
+        # Минимальный размер сообщения (в байтах), начиная с которого оно сжимается
+        return self._get_setting('REDIS_QUEUE_COMPRESS_MIN_SIZE', 1024)
+
+    # Буферизованный приём уведомлений (пакетная запись в БД)
+
+    @property
+    def INGEST_BUFFER_ENABLED(self):
+        return self._get_setting('INGEST_BUFFER_ENABLED', False)
+
+    @property
+    def INGEST_BUFFER_BACKEND(self):
+        # 'memory' - буфер в памяти процесса, 'redis' - общий буфер в Redis
+        return self._get_setting('INGEST_BUFFER_BACKEND', 'memory')
+
+    @property
+    def INGEST_BUFFER_REDIS_URL(self):
+        return self._get_setting('INGEST_BUFFER_REDIS_URL', self.REDIS_QUEUE_URL)
+
+    @property
+    def INGEST_BUFFER_KEY(self):
+        return self._get_setting('INGEST_BUFFER_KEY', 'webhook_ingest_buffer')
+
+    @property
+    def INGEST_BATCH_SIZE(self):
+        return self._get_setting('INGEST_BATCH_SIZE', 200)
+
+    @property
+    def INGEST_FLUSH_INTERVAL(self):
+        # Максимальное время (в секундах) нахождения уведомления в буфере
+        return self._get_setting('INGEST_FLUSH_INTERVAL', 1.0)
+
+    @property
+    def INGEST_BUFFER_MAX_SIZE(self):
+        return self._get_setting('INGEST_BUFFER_MAX_SIZE', 10000)
+
+    @property
+    def INGEST_DEAD_LETTER_MAX_SIZE(self):
+        # Сколько последних отклонённых записей хранить в <INGEST_BUFFER_KEY>:dead
+        return self._get_setting('INGEST_DEAD_LETTER_MAX_SIZE', 1000)
+
+    @property
+    def INGEST_ACK_MODE(self):
+        # 'accepted' - ответ после помещения в буфер, 'durable' - после записи в БД
+        return self._get_setting('INGEST_ACK_MODE', 'accepted')
+
+    @property
+    def INGEST_ACK_TIMEOUT(self):
+        return self._get_setting('INGEST_ACK_TIMEOUT', 5.0)
+
+    # Кэш Категорий Уведомлений в памяти процесса
+
+    @property
+    def CATEGORY_CACHE_ENABLED(self):
+        return self._get_setting('CATEGORY_CACHE_ENABLED', True)
+
+    @property
+    def CATEGORY_CACHE_TTL(self):
+        return self._get_setting('CATEGORY_CACHE_TTL', 300)
+
+    @property
+    def CATEGORY_CACHE_NEGATIVE_TTL(self):
+        # Время хранения результата "категория не найдена"
+        return self._get_setting('CATEGORY_CACHE_NEGATIVE_TTL', 60)
+
+    @property
+    def CATEGORY_CACHE_MAX_ENTRIES(self):
+        return self._get_setting('CATEGORY_CACHE_MAX_ENTRIES', 10000)
+
+    @property
+    def CATEGORY_CACHE_CHANNEL(self):
+        # Канал Redis для рассылки сброса кэша всем воркерам
+        return self._get_setting('CATEGORY_CACHE_CHANNEL', 'webhook_category_invalidate')
+
+    @property
+    def CATEGORY_FILTER_ENABLED(self):
+        # Отсечение неизвестных id_ext в middleware до маршрутизации DRF
+        return self._get_setting('CATEGORY_FILTER_ENABLED', True)
+
+    @property
+    def CATEGORY_FILTER_ERROR_RATE(self):
+        return self._get_setting('CATEGORY_FILTER_ERROR_RATE', 0.001)
+
+    # Ограничение размера тела уведомления (в байтах)
+
+    @property
+    def WEBHOOK_MAX_BODY_SIZE(self):
+        return self._get_setting('WEBHOOK_MAX_BODY_SIZE', 10000)
+
+    # Пакетная постановка уведомлений в обработку (задача process_webhook_batch)
+
+    @property
+    def BATCH_DISPATCH_ENABLED(self):
+        return self._get_setting('BATCH_DISPATCH_ENABLED', False)
+
+    @property
+    def BATCH_DISPATCH_SIZE(self):
+        return self._get_setting('BATCH_DISPATCH_SIZE', 100)
+
+    @property
+    def BATCH_DISPATCH_MAX_DELAY(self):
+        # Максимальное время (в секундах) ожидания уведомления до отправки пакета
+        return self._get_setting('BATCH_DISPATCH_MAX_DELAY', 0.5)
+
+    @property
+    def BATCH_DISPATCH_KEY(self):
+        return self._get_setting('BATCH_DISPATCH_KEY', 'webhook_dispatch_pending')
+
+    @property
+    def BUSINESS_OUTBOX_BATCH_SIZE(self):
+        # Количество сообщений outbox, отправляемых в Redis одним pipeline
+        return self._get_setting('BUSINESS_OUTBOX_BATCH_SIZE', 500)
+
+    @property
+    def BUSINESS_OUTBOX_RELAY_INLINE(self):
+        # Отправлять сообщения из outbox сразу после обработки уведомлений в воркере Celery
+        return self._get_setting('BUSINESS_OUTBOX_RELAY_INLINE', True)
+
+    @property
+    def EXPORT_CHUNK_SIZE(self):
+        # Количество записей, читаемых из курсора БД и отдаваемых клиенту за один раз при выгрузке
+        return self._get_setting('EXPORT_CHUNK_SIZE', 2000)
+
+    @property
+    def BULK_UPDATE_MAX_ITEMS(self):
+        # Максимальное количество элементов в запросе пакетного обновления бизнес-статуса
+        return self._get_setting('BULK_UPDATE_MAX_ITEMS', 10000)
+
+    # Лента изменений Уведомлений (поток Redis, api/internal/webhooks/changes/)
+
+    @property
+    def CHANGE_FEED_ENABLED(self):
+        # Ожидающие запросы ленты обслуживает ASGI-приложение (app-asgi), поэтому по умолчанию выключена
+        return self._get_setting('CHANGE_FEED_ENABLED', False)
+
+    @property
+    def CHANGE_FEED_STREAM(self):
+        return self._get_setting('CHANGE_FEED_STREAM', 'webhook_changes')
+
+    @property
+    def CHANGE_FEED_MAXLEN(self):
+        # Приблизительная максимальная длина ленты: глубина, с которой клиент может продолжить чтение
+        return self._get_setting('CHANGE_FEED_MAXLEN', 100000)
+
+    @property
+    def CHANGE_FEED_MAX_WAIT(self):
+        # Максимальное время ожидания новых событий в одном запросе (в секундах)
+        return self._get_setting('CHANGE_FEED_MAX_WAIT', 25)
+
+    @property
+    def CHANGE_FEED_SSE_DURATION(self):
+        # Длительность одного соединения Server-Sent Events (в секундах), меньше --timeout gunicorn
+        return self._get_setting('CHANGE_FEED_SSE_DURATION', 60)
+
+    # Срок хранения Уведомлений (задача cleanup_old_notifications, команда cleanup_notifications)
+
+    @property
+    def RETENTION_DAYS(self):
+        return self._get_setting('RETENTION_DAYS', 30)
+
+    @property
+    def RETENTION_CHUNK_SIZE(self):
+        # Диапазон id, удаляемый одним DELETE (одной транзакцией)
+        return self._get_setting('RETENTION_CHUNK_SIZE', 5000)
+
+    @property
+    def RETENTION_CHUNK_PAUSE(self):
+        # Пауза (в секундах) между диапазонами
+        return self._get_setting('RETENTION_CHUNK_PAUSE', 0.5)
+
+    @property
+    def RETENTION_MAX_SECONDS(self):
+        # Ограничение времени одного запуска очистки (остаток удалит следующий запуск)
+        return self._get_setting('RETENTION_MAX_SECONDS', 1800)
+
+    @property
+    def RETENTION_PARTITION_DAYS(self):
+        # Ширина секции (в сутках) при секционировании таблицы (команда partition_notifications)
+        return self._get_setting('RETENTION_PARTITION_DAYS', 7)
+
+    @property
+    def RETENTION_PARTITIONS_AHEAD(self):
+        # Количество секций, создаваемых наперёд
+        return self._get_setting('RETENTION_PARTITIONS_AHEAD', 4)
+
+    # Архив Уведомлений перед удалением по сроку хранения (main_wh.archive)
+
+    @property
+    def ARCHIVE_ENABLED(self):
+        return self._get_setting('ARCHIVE_ENABLED', False)
+
+    @property
+    def ARCHIVE_DIR(self):
+        # Каталог файлов архива (<ГГГГ>/<ММ>/<ДД>/webhooks_<день>_<первый id>-<последний id>.ndjson.gz)
+        return self._get_setting('ARCHIVE_DIR', 'archive')
+
+    @property
+    def ARCHIVE_CHUNK_SIZE(self):
+        # Записей, читаемых из серверного курсора за одно обращение
+        return self._get_setting('ARCHIVE_CHUNK_SIZE', 5000)
+
+    @property
+    def ARCHIVE_FILE_MAX_ROWS(self):
+        # Максимальное количество записей в одном файле архива
+        return self._get_setting('ARCHIVE_FILE_MAX_ROWS', 100000)
+
+    @property
+    def ARCHIVE_COMPRESS_LEVEL(self):
+        # Уровень сжатия gzip (1-9)
+        return self._get_setting('ARCHIVE_COMPRESS_LEVEL', 6)
+
+    # Повторная обработка Уведомлений с ошибкой (main_wh.retry)
+
+    @property
+    def RETRY_MAX_ATTEMPTS(self):
+        # Максимальное количество повторных попыток, после которого ошибка остаётся
+        return self._get_setting('RETRY_MAX_ATTEMPTS', 5)
+
+    @property
+    def RETRY_BACKOFF_BASE(self):
+        # Пауза перед первой повторной попыткой в секундах (далее удваивается)
+        return self._get_setting('RETRY_BACKOFF_BASE', 60)
+
+    @property
+    def RETRY_BACKOFF_MAX(self):
+        # Максимальная пауза между попытками в секундах
+        return self._get_setting('RETRY_BACKOFF_MAX', 3600)
+
+    @property
+    def RETRY_CHUNK_SIZE(self):
+        # Уведомлений, возвращаемых в обработку одним UPDATE
+        return self._get_setting('RETRY_CHUNK_SIZE', 500)
+
+    @property
+    def RETRY_MAX_PER_RUN(self):
+        # Максимальное количество Уведомлений за один запуск retry_failed_notifications
+        return self._get_setting('RETRY_MAX_PER_RUN', 5000)
+
+    # Захват Уведомлений для обработки и периодическая досборка ожидающих (main_wh.claims)
+
+    @property
+    def SWEEPER_BATCH_SIZE(self):
+        # Минимальный размер пакета досборки (захватывается и обрабатывается за один шаг)
+        return self._get_setting('SWEEPER_BATCH_SIZE', 100)
+
+    @property
+    def SWEEPER_MAX_BATCH_SIZE(self):
+        # Максимальный размер пакета досборки
+        return self._get_setting('SWEEPER_MAX_BATCH_SIZE', 1000)
+
+    @property
+    def SWEEPER_TARGET_BATCH_SECONDS(self):
+        # Желаемая длительность обработки одного пакета (по ней выбирается размер пакета)
+        return self._get_setting('SWEEPER_TARGET_BATCH_SECONDS', 2)
+
+    @property
+    def SWEEPER_MIN_INTERVAL(self):
+        # Минимальный интервал между замерами очереди (интервал задачи process_pending_notifications)
+        return self._get_setting('SWEEPER_MIN_INTERVAL', 10)
+
+    @property
+    def SWEEPER_MAX_INTERVAL(self):
+        # Максимальный интервал между замерами (при пустой очереди)
+        return self._get_setting('SWEEPER_MAX_INTERVAL', 300)
+
+    @property
+    def SWEEPER_FANOUT_THRESHOLD(self):
+        # Ожидающих Уведомлений на одного воркера досборки
+        return self._get_setting('SWEEPER_FANOUT_THRESHOLD', 5000)
+
+    @property
+    def SWEEPER_MAX_WORKERS(self):
+        # Максимальное количество параллельных задач досборки
+        return self._get_setting('SWEEPER_MAX_WORKERS', 4)
+
+    @property
+    def SWEEPER_STATE_KEY(self):
+        # Ключ Redis с состоянием досборки (размер очереди, скорость, оценка времени разбора)
+        return self._get_setting('SWEEPER_STATE_KEY', 'webhook_sweeper')
+
+    @property
+    def SWEEPER_LEASE_SECONDS(self):
+        # Срок аренды захвата: по его истечении Уведомление упавшего процесса захватывается заново
+        return self._get_setting('SWEEPER_LEASE_SECONDS', 300)
+
+    @property
+    def SWEEPER_MIN_AGE(self):
+        # Досборка не берёт Уведомления, изменённые менее указанного количества секунд назад
+        return self._get_setting('SWEEPER_MIN_AGE', 60)
+
+    @property
+    def SWEEPER_MAX_SECONDS(self):
+        # Максимальная длительность работы одной задачи досборки
+        return self._get_setting('SWEEPER_MAX_SECONDS', 240)
+
 # Создаём глобальный объект для импорта
 app_settings = AppSettings('')
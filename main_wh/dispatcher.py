@@ -0,0 +1,157 @@
+import atexit
+import os
+import threading
+
+from main_wh.conf import app_settings
+from main_wh.redis_client import redis_queue
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Постановка уведомлений в обработку Celery.
+    В пакетном режиме (BATCH_DISPATCH_ENABLED) идентификаторы копятся в общем списке Redis
+    и уходят в задачу process_webhook_batch, как только набрался пакет (BATCH_DISPATCH_SIZE)
+    или прошло BATCH_DISPATCH_MAX_DELAY секунд.
+    Уведомления, не попавшие в задачу (например, при сбое Redis), остаются в статусе 'new'
+    и будут обработаны периодической задачей process_pending_notifications.
+    """
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def enabled(self):
+        return app_settings.BATCH_DISPATCH_ENABLED
+
+    @staticmethod
+    def _get_connection():
+        # Общий пул соединений с Redis процесса
+        return redis_queue.get_client()
+
+    def dispatch(self, notification_id):
+        """
+        Постановка одного уведомления в обработку.
+        """
+
+        # Импорт здесь, чтобы избежать циклических импортов
+        from main_wh.tasks import process_webhook_notification
+
+        if not self.enabled:
+            process_webhook_notification.delay(notification_id)
+            return
+
+        try:
+            size = self._get_connection().rpush(app_settings.BATCH_DISPATCH_KEY, notification_id)
+        except Exception as err:
+            # Без Redis отправляем уведомление в обработку по одному
+            logger.error(f"Ошибка постановки уведомления {notification_id} в пакет: {err}")
+            process_webhook_notification.delay(notification_id)
+            return
+
+        self.ensure_flusher()
+        if size >= app_settings.BATCH_DISPATCH_SIZE:
+            self._wakeup.set()
+
+    def dispatch_many(self, notification_ids, batched=None):
+        """
+        Постановка уже собранного набора уведомлений в обработку через одно соединение с брокером.
+        batched=True - пакетами независимо от BATCH_DISPATCH_ENABLED.
+        """
+
+        from main_wh.tasks import process_webhook_batch, process_webhook_notification
+
+        if self.enabled if batched is None else batched:
+            batch_size = app_settings.BATCH_DISPATCH_SIZE
+            with process_webhook_batch.app.producer_or_acquire() as producer:
+                for start in range(0, len(notification_ids), batch_size):
+                    process_webhook_batch.apply_async(args=[notification_ids[start:start + batch_size]],
+                                                      producer=producer)
+            return
+
+        with process_webhook_notification.app.producer_or_acquire() as producer:
+            for notification_id in notification_ids:
+                process_webhook_notification.apply_async(args=[notification_id], producer=producer)
+
+    def flush(self):
+        """
+        Отправка одного пакета из списка ожидающих.
+
+        Returns:
+            int: Количество уведомлений в отправленном пакете
+        """
+
+        from main_wh.tasks import process_webhook_batch
+
+        # LPOP с количеством (Redis >= 6.2) атомарно забирает пакет целиком:
+        # одно уведомление не попадёт в пакеты двух процессов
+        raw_ids = self._get_connection().lpop(app_settings.BATCH_DISPATCH_KEY, app_settings.BATCH_DISPATCH_SIZE)
+        if not raw_ids:
+            return 0
+
+        notification_ids = [int(raw_id) for raw_id in raw_ids]
+        process_webhook_batch.delay(notification_ids)
+        return len(notification_ids)
+
+    def flush_all(self):
+        """
+        Отправка всех ожидающих уведомлений (полными пакетами).
+        """
+
+        total = 0
+        while True:
+            sent = self.flush()
+            total += sent
+            if sent < app_settings.BATCH_DISPATCH_SIZE:
+                return total
+
+    def pending(self):
+        return self._get_connection().llen(app_settings.BATCH_DISPATCH_KEY)
+
+    def ensure_flusher(self):
+        """
+        Запуск фоновой отправки пакетов в текущем процессе (после fork воркера gunicorn - заново).
+        """
+
+        pid = os.getpid()
+        if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+            return
+
+        with self._flusher_lock:
+            if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+                return
+
+            self._flusher = threading.Thread(target=self._run_flusher, name='webhook-batch-dispatcher', daemon=True)
+            self._flusher_pid = pid
+            self._flusher.start()
+
+            if not self._atexit_registered:
+                atexit.register(self._flush_on_exit)
+                self._atexit_registered = True
+
+    def _flush_on_exit(self):
+        try:
+            self.flush_all()
+        except Exception as err:
+            logger.error(f"Ошибка отправки пакетов уведомлений при завершении: {err}")
+
+    def _run_flusher(self):
+        while True:
+            # Просыпаемся по таймеру или досрочно, когда набрался полный пакет
+            self._wakeup.wait(app_settings.BATCH_DISPATCH_MAX_DELAY)
+            self._wakeup.clear()
+
+            try:
+                self.flush_all()
+            except Exception as err:
+                logger.error(f"Ошибка фоновой отправки пакетов уведомлений: {err}")
+
+
+# Глобальный экземпляр процесса
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,77 @@
+import csv
+import json
+
+from main_wh.conf import app_settings
+from main_wh.fast_serializers import DETAIL_FIELDS, WebhookRequestDetailFastSerializer
+
+# Форматы выгрузки
+EXPORT_FORMAT_NDJSON = 'ndjson'
+EXPORT_FORMAT_CSV = 'csv'
+
+EXPORT_CONTENT_TYPES = {
+    EXPORT_FORMAT_NDJSON: 'application/x-ndjson; charset=utf-8',
+    EXPORT_FORMAT_CSV: 'text/csv; charset=utf-8',
+}
+
+# Поля выгрузки - те же и в том же порядке, что в ответе WebhookRequestDetailSerializer
+EXPORT_FIELDS = DETAIL_FIELDS
+
+
+def iter_export_chunks(queryset, since_id=None, limit=None, chunk_size=None, fields=EXPORT_FIELDS):
+    """
+    Записи выгрузки (поля fields) пакетами по chunk_size в порядке id.
+    Чтение через курсор на стороне сервера (QuerySet.iterator): в памяти не больше одного пакета.
+    since_id - точка продолжения: выгружаются записи с id больше него.
+    """
+
+    chunk_size = chunk_size or app_settings.EXPORT_CHUNK_SIZE
+    serializer = WebhookRequestDetailFastSerializer(fields)
+
+    queryset = queryset.order_by('id')
+    if since_id is not None:
+        queryset = queryset.filter(id__gt=since_id)
+    if limit is not None:
+        queryset = queryset[:limit]
+
+    rows = []
+    for row in serializer.prepare_queryset(queryset).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield serializer.serialize(rows)
+            rows = []
+    if rows:
+        yield serializer.serialize(rows)
+
+
+def stream_ndjson(chunks):
+    # Одна запись - одна строка JSON. Пакет отдаётся одной частью ответа
+    for chunk in chunks:
+        yield ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n' for row in chunk)
+
+
+class _LineBuffer:
+    # Приёмник для csv.writer: возвращает строку вместо записи в файл
+    def write(self, value):
+        return value
+
+
+def stream_csv(chunks, fields=EXPORT_FIELDS):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(fields)
+    for chunk in chunks:
+        yield ''.join(
+            writer.writerow([json.dumps(row[field], ensure_ascii=False) if field == 'parsed_body' else row[field]
+                             for field in fields])
+            for row in chunk
+        )
+
+
+def stream_export(queryset, export_format=EXPORT_FORMAT_NDJSON, since_id=None, limit=None, fields=EXPORT_FIELDS):
+    """
+    Генератор частей ответа выгрузки в формате export_format.
+    """
+
+    chunks = iter_export_chunks(queryset, since_id=since_id, limit=limit, fields=fields)
+    if export_format == EXPORT_FORMAT_CSV:
+        return stream_csv(chunks, fields)
+    return stream_ndjson(chunks)
@@ -0,0 +1,149 @@
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from main_wh.serializers import WebhookRequestDetailSerializer
+
+# Поля ответа - те же и в том же порядке, что у WebhookRequestDetailSerializer
+DETAIL_FIELDS = tuple(WebhookRequestDetailSerializer.Meta.fields)
+
+# Колонка values_list для каждого поля ответа (processing_time - аннотация, вычисляемая в SQL)
+DETAIL_COLUMNS = {
+    'id': 'id',
+    'inserted_at': 'inserted_at',
+    'category_id_ext': 'category__id_ext',
+    'category_name': 'category__name',
+    'status': 'status',
+    'parsed_body': 'parsed_body',
+    'content_type': 'content_type',
+    'ip_adr': 'ip_adr',
+    'processed_at': 'processed_at',
+    'business_queued_at': 'business_queued_at',
+    'business_processed_at': 'business_processed_at',
+    'business_status': 'business_status',
+    'processing_time': 'processing_time',
+    'error_description': 'error_description',
+}
+
+
+# Поля модели, загружаемые через .only() для каждого поля ответа (для сериализатора DRF)
+DETAIL_ONLY_FIELDS = {
+    'category_id_ext': ('category__id_ext',),
+    'category_name': ('category__name',),
+    'processing_time': ('processed_at', 'inserted_at'),
+}
+
+# Поля ответа из связанной Категории: с ними версия ответа включает CategoryWebhook.updated_at
+CATEGORY_FIELDS = frozenset(('category_id_ext', 'category_name'))
+
+# Параметр запроса со списком полей ответа
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def get_requested_fields(request):
+    """
+    Поля ответа из параметра fields=id,status,... (в порядке DETAIL_FIELDS).
+    Без параметра - все поля.
+
+    Returns:
+        tuple: Имена полей
+    """
+
+    value = request.query_params.get(FIELDS_QUERY_PARAM)
+    if not value:
+        return DETAIL_FIELDS
+
+    requested = {field_name.strip() for field_name in value.split(',') if field_name.strip()}
+    unknown = requested - set(DETAIL_FIELDS)
+    if unknown or not requested:
+        raise ValidationError({FIELDS_QUERY_PARAM: f"Недопустимые поля: {', '.join(sorted(unknown))}. "
+                                                   f"Допустимые: {', '.join(DETAIL_FIELDS)}"})
+    return tuple(field_name for field_name in DETAIL_FIELDS if field_name in requested)
+
+
+def get_only_fields(fields):
+    """
+    Поля модели для .only() по полям ответа: невыбранные колонки (например, JSONB parsed_body)
+    не читаются с диска.
+    """
+
+    only_fields = ['id']
+    for field_name in fields:
+        only_fields.extend(DETAIL_ONLY_FIELDS.get(field_name, (field_name,)))
+    return list(dict.fromkeys(only_fields))
+
+
+def uses_category(fields):
+    """
+    Входят ли в ответ поля Категории (нужен JOIN и её версия).
+    """
+    return bool(CATEGORY_FIELDS.intersection(fields))
+
+
+def format_datetime(value, tz=None):
+    # Как DateTimeField DRF: в текущем часовом поясе, UTC - с суффиксом Z
+    if not value:
+        return None
+    value = value.astimezone(tz or timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_duration(value, tz=None):
+    # processing_time: разница processed_at - inserted_at в секундах (как get_processing_time)
+    return value.total_seconds() if value is not None else None
+
+
+# Преобразование значений полей, которые DRF отдаёт не в том виде, в каком их возвращает БД
+FIELD_CONVERTERS = {
+    'inserted_at': format_datetime,
+    'processed_at': format_datetime,
+    'business_queued_at': format_datetime,
+    'business_processed_at': format_datetime,
+    'processing_time': format_duration,
+}
+
+
+class WebhookRequestDetailFastSerializer:
+    """
+    Быстрое формирование ответа WebhookRequestDetailSerializer из кортежей values_list
+    без создания объектов модели и полей DRF на каждую запись.
+    Результат после JSONRenderer побайтно совпадает с ответом сериализатора DRF
+    (проверка и сравнение скорости - команда bench_serializers).
+    """
+
+    def __init__(self, fields=DETAIL_FIELDS):
+        self.fields = tuple(fields)
+        self.columns = tuple(DETAIL_COLUMNS[field_name] for field_name in self.fields)
+        # Заранее вычисленные пары (поле, преобразование) - только для полей, которые нужно преобразовать
+        self._converters = tuple((field_name, FIELD_CONVERTERS[field_name]) for field_name in self.fields
+                                 if field_name in FIELD_CONVERTERS)
+
+    def prepare_queryset(self, queryset, named=False, extra_columns=()):
+        """
+        Запрос, возвращающий кортежи колонок ответа (named=True - именованные кортежи,
+        например для постраничного вывода по курсору, которому нужны inserted_at и id).
+        extra_columns - колонки, нужные вызывающему, но не попадающие в ответ
+        (добавляются в конец кортежа и отбрасываются при формировании ответа).
+        """
+        if 'processing_time' in self.fields:
+            queryset = queryset.annotate(processing_time=ExpressionWrapper(
+                F('processed_at') - F('inserted_at'), output_field=DurationField()))
+        columns = self.columns + tuple(column for column in extra_columns if column not in self.columns)
+        return queryset.values_list(*columns, named=named)
+
+    def to_representation(self, row, tz=None):
+        # Текущий часовой пояс передаётся вызывающим: получать его для каждого значения дорого
+        tz = tz or timezone.get_current_timezone()
+        # Порядок ключей задаётся zip, преобразование значения не меняет положение ключа.
+        # Дополнительные колонки в конце кортежа zip отбрасывает
+        data = dict(zip(self.fields, row))
+        for field_name, converter in self._converters:
+            data[field_name] = converter(data[field_name], tz)
+        return data
+
+    def serialize(self, rows):
+        tz = timezone.get_current_timezone()
+        to_representation = self.to_representation
+        return [to_representation(row, tz) for row in rows]
@@ -0,0 +1,555 @@
+import atexit
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from json import dumps as json_dumps, loads as json_loads
+from uuid import uuid4
+
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, transaction, close_old_connections
+from redis import from_url as redis_from_url
+
+from main_wh.conf import app_settings
+from main_wh.dispatcher import notification_dispatcher
+from main_wh.models import WebhookRequest
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Режимы подтверждения приёма уведомления
+ACK_ACCEPTED = 'accepted'
+ACK_DURABLE = 'durable'
+
+# Ошибки в данных самой записи: повтор не поможет, запись откладывается (dead letter)
+ROW_ERRORS = (DataError, IntegrityError, ValidationError, ValueError, TypeError)
+
+
+class IngestTicket:
+    """
+    Квитанция о приёме уведомления буфером.
+    В режиме 'durable' представление ждёт, пока сборщик запишет пакет в БД.
+    """
+
+    def __init__(self, resolved=False):
+        self.error = None
+        self._event = threading.Event()
+        if resolved:
+            self._event.set()
+
+    def resolve(self, error=None):
+        self.error = error
+        self._event.set()
+
+    def wait(self, timeout):
+        """
+        Ожидание записи в БД. Возвращает False, если время ожидания истекло.
+        """
+        return self._event.wait(timeout)
+
+
+class RedisIngestTicket(IngestTicket):
+    """
+    Квитанция для буфера в Redis: результат записи приходит в отдельный список-ответ,
+    так как пакет может записать сборщик из другого процесса.
+    """
+
+    def __init__(self, redis_client, ack_key):
+        super().__init__()
+        self.redis_client = redis_client
+        self.ack_key = ack_key
+
+    def wait(self, timeout):
+        reply = self.redis_client.blpop(self.ack_key, timeout=timeout)
+        if reply is None:
+            return False
+
+        _, result = reply
+        if result != 'ok':
+            self.error = result
+        return True
+
+
+def insert_batch(records):
+    """
+    Запись пакета уведомлений одной командой INSERT.
+
+    Args:
+        records (list): Словари с полями WebhookRequest.
+    Returns:
+        list: Идентификаторы созданных уведомлений
+    """
+
+    notifications = [WebhookRequest(**record) for record in records]
+
+    with transaction.atomic():
+        # PostgreSQL возвращает идентификаторы созданных строк (RETURNING id)
+        WebhookRequest.objects.bulk_create(notifications)
+
+    return [notification.id for notification in notifications]
+
+
+def insert_items(items, heartbeat=None):
+    """
+    Запись элементов буфера с поиском ошибочных записей делением пакета пополам.
+    Ошибка в данных одной записи (ROW_ERRORS) не мешает записать остальные; при любой другой ошибке
+    (БД недоступна) запись прекращается, а незаписанные элементы возвращаются вызывающему.
+    heartbeat вызывается перед каждой попыткой записи: деление пакета может занять много времени.
+
+    Returns:
+        tuple: (записанные элементы, идентификаторы, [(отклонённый элемент, ошибка)],
+                незаписанные элементы, ошибка, прервавшая запись)
+    """
+
+    written, notification_ids, rejected = [], [], []
+    # Стек частей пакета: следующей обрабатывается последняя добавленная (порядок записей сохраняется)
+    parts = [items]
+    while parts:
+        part = parts.pop()
+        if heartbeat is not None:
+            heartbeat()
+        try:
+            notification_ids.extend(insert_batch([item[0] for item in part]))
+        except ROW_ERRORS as err:
+            if len(part) == 1:
+                rejected.append((part[0], err))
+                continue
+            middle = len(part) // 2
+            parts.append(part[middle:])
+            parts.append(part[:middle])
+            continue
+        except Exception as err:
+            remaining = part + [item for rest in reversed(parts) for item in rest]
+            return written, notification_ids, rejected, remaining, err
+        written.extend(part)
+
+    return written, notification_ids, rejected, [], None
+
+
+def enqueue_notifications(notification_ids):
+    """
+    Постановка уже записанных уведомлений в обработку Celery через одно соединение с брокером.
+    Ошибка брокера не возвращает записи в буфер (они уже в БД): уведомления остаются
+    в статусе 'new' и будут обработаны досборкой process_pending_notifications.
+    """
+
+    try:
+        notification_dispatcher.dispatch_many(notification_ids)
+    except Exception as err:
+        logger.error(f"Ошибка постановки в обработку {len(notification_ids)} записанных уведомлений, "
+                     f"они будут обработаны досборкой: {err}")
+
+
+class BaseIngestBuffer(ABC):
+    """
+    Базовый буфер приёма уведомлений.
+    Сборщик (фоновый поток) записывает накопленные уведомления пакетами,
+    ограниченными по размеру (INGEST_BATCH_SIZE) и по времени (INGEST_FLUSH_INTERVAL).
+    """
+
+    def __init__(self):
+        self.batch_size = app_settings.INGEST_BATCH_SIZE
+        self.flush_interval = app_settings.INGEST_FLUSH_INTERVAL
+        self.max_size = app_settings.INGEST_BUFFER_MAX_SIZE
+
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._atexit_registered = False
+
+    @abstractmethod
+    def submit(self, record, durable=False):
+        """
+        Помещение уведомления в буфер.
+
+        Args:
+            record (dict): Поля WebhookRequest.
+            durable (bool): Требуется ли подтверждение записи в БД.
+        Returns:
+            IngestTicket | None: Квитанция или None, если буфер переполнен
+        """
+
+    @abstractmethod
+    def pending(self):
+        """
+        Количество уведомлений, ожидающих записи
+        """
+
+    @abstractmethod
+    def _take(self, limit):
+        """
+        Извлечение до limit элементов вида (record, ack, raw).
+
+        Returns:
+            tuple: (идентификатор пакета для _complete, элементы)
+        """
+
+    @abstractmethod
+    def _complete(self, batch, requeue=(), rejected=()):
+        """
+        Завершение пакета: возврат незаписанных элементов в начало буфера
+        и сохранение отклонённых ([(элемент, ошибка)]) для разбора вручную.
+        """
+
+    @abstractmethod
+    def _acknowledge(self, items, error=None):
+        """
+        Уведомление ожидающих представлений о результате записи.
+        """
+
+    def _heartbeat(self, batch):
+        """
+        Подтверждение, что пакет ещё записывается (вызывается во время записи пакета).
+        """
+
+    def dead_letters(self, limit=10):
+        """
+        Последние отклонённые записи: [{'record', 'ack', 'error'}]
+        """
+        return []
+
+    def requeue_dead_letters(self):
+        """
+        Возврат отклонённых записей в буфер (после исправления причины отклонения).
+
+        Returns:
+            int: Количество возвращённых записей
+        """
+        return 0
+
+    def stats(self):
+        """
+        Ожидающие записи и отклонённые уведомления
+        """
+        return {'pending': self.pending(), 'dead_letters': 0}
+
+    def flush(self, limit=None):
+        """
+        Запись одного пакета из буфера в БД.
+
+        Returns:
+            int: Количество записанных уведомлений
+        """
+
+        batch, items = self._take(limit or self.batch_size)
+        if not items:
+            return 0
+
+        written, notification_ids, rejected, remaining, error = insert_items(
+            items, heartbeat=lambda: self._heartbeat(batch))
+        self._heartbeat(batch)
+
+        # Записанные строки больше не возвращаются в буфер, даже если не удалось поставить их в обработку
+        if notification_ids:
+            enqueue_notifications(notification_ids)
+        self._acknowledge(written)
+
+        for item, row_error in rejected:
+            logger.error(f"Уведомление отклонено при пакетной записи: {row_error}; "
+                         f"данные: {str(item[0])[:500]}")
+            self._acknowledge([item], error=str(row_error))
+
+        requeue = []
+        if remaining:
+            logger.error(f"Ошибка пакетной записи {len(remaining)} уведомлений: {error}")
+            # Ожидающие подтверждения получат ошибку и ответят отправителю сами (он повторит запрос),
+            # остальные уведомления возвращаем в буфер для следующей попытки
+            self._acknowledge([item for item in remaining if item[1]], error=str(error))
+            requeue = [item for item in remaining if not item[1]]
+
+        self._complete(batch, requeue, rejected)
+
+        if written:
+            logger.info(f"Записан пакет из {len(written)} уведомлений")
+        return len(written)
+
+    def flush_all(self):
+        """
+        Запись всех накопленных уведомлений (полными пакетами).
+        """
+
+        total = 0
+        while True:
+            written = self.flush()
+            total += written
+            if written < self.batch_size:
+                return total
+
+    def ensure_flusher(self):
+        """
+        Запуск фонового сборщика в текущем процессе (после fork воркера gunicorn - заново).
+        """
+
+        pid = os.getpid()
+        if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+            return
+
+        with self._flusher_lock:
+            if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+                return
+
+            self._flusher = threading.Thread(target=self._run_flusher, name='webhook-ingest-flusher', daemon=True)
+            self._flusher_pid = pid
+            self._flusher.start()
+
+            # Дописываем остаток буфера при штатном завершении воркера
+            if not self._atexit_registered:
+                atexit.register(self.flush_all)
+                self._atexit_registered = True
+
+    def _run_flusher(self):
+        while True:
+            # Просыпаемся по таймеру или досрочно, когда набрался полный пакет
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                close_old_connections()
+                self.flush_all()
+            except Exception as err:
+                logger.error(f"Ошибка фонового сборщика буфера уведомлений: {err}")
+            finally:
+                close_old_connections()
+
+
+class MemoryIngestBuffer(BaseIngestBuffer):
+    """
+    Буфер в памяти процесса. Самый быстрый вариант, но при аварийном завершении
+    процесса подтверждённые в режиме 'accepted' уведомления теряются.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, record, durable=False):
+        ticket = IngestTicket(resolved=not durable)
+
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                return None
+            self._items.append((record, ticket if durable else None, None))
+            size = len(self._items)
+
+        self.ensure_flusher()
+        # При ожидании подтверждения пишем сразу: параллельные запросы соберутся в следующий пакет
+        if durable or size >= self.batch_size:
+            self._wakeup.set()
+        return ticket
+
+    def pending(self):
+        return len(self._items)
+
+    def _take(self, limit):
+        with self._lock:
+            count = min(limit, len(self._items))
+            return None, [self._items.popleft() for _ in range(count)]
+
+    def _complete(self, batch, requeue=(), rejected=()):
+        # Отклонённые записи остаются только в журнале (см. flush)
+        if requeue:
+            with self._lock:
+                self._items.extendleft(reversed(requeue))
+
+    def _acknowledge(self, items, error=None):
+        for _, ticket, _ in items:
+            if ticket is not None:
+                ticket.resolve(error)
+
+
+class RedisIngestBuffer(BaseIngestBuffer):
+    """
+    Общий буфер в Redis. Переживает перезапуск воркеров gunicorn,
+    пакеты может записывать любой процесс (в т.ч. команда flush_ingest_buffer).
+
+    Пакет не удаляется из Redis при извлечении: элементы переносятся (LMOVE) в список пакета
+    <key>:processing:<процесс>:<пакет>, который удаляется только после записи в БД.
+    Пакеты процесса, переставшего обновлять отметку <key>:owner:<процесс> (аварийное завершение),
+    возвращаются в начало буфера (recover_orphaned). Отклонённые записи - в списке <key>:dead
+    (последние INGEST_DEAD_LETTER_MAX_SIZE).
+    """
+
+    # Срок отметки процесса-сборщика: обновляется при извлечении пакета и во время его записи
+    OWNER_TTL = 60
+    # Интервал поиска пакетов аварийно завершённых процессов
+    RECOVER_INTERVAL = 30
+
+    def __init__(self):
+        super().__init__()
+        self.key = app_settings.INGEST_BUFFER_KEY
+        self.dead_key = f'{self.key}:dead'
+        self.dead_max_size = app_settings.INGEST_DEAD_LETTER_MAX_SIZE
+        self.ack_timeout = app_settings.INGEST_ACK_TIMEOUT
+        self.redis_client = redis_from_url(
+            app_settings.INGEST_BUFFER_REDIS_URL,
+            decode_responses=True,
+            # Таймаут сокета должен превышать время ожидания подтверждения (BLPOP)
+            socket_timeout=self.ack_timeout + 5,
+            socket_connect_timeout=5,
+            retry_on_timeout=True
+        )
+        self._owner = None
+        self._owner_pid = None
+        self._recovered_at = 0
+
+    def _get_owner(self):
+        # Отдельный идентификатор в каждом процессе (после fork воркера gunicorn - новый)
+        pid = os.getpid()
+        if self._owner_pid != pid:
+            self._owner = uuid4().hex
+            self._owner_pid = pid
+        return self._owner
+
+    def _owner_key(self, owner):
+        return f'{self.key}:owner:{owner}'
+
+    def submit(self, record, durable=False):
+        if self.redis_client.llen(self.key) >= self.max_size:
+            return None
+
+        ack_key = f"{self.key}:ack:{uuid4().hex}" if durable else None
+        size = self.redis_client.rpush(self.key, json_dumps({'record': record, 'ack': ack_key}, ensure_ascii=False))
+
+        self.ensure_flusher()
+        if durable or size >= self.batch_size:
+            self._wakeup.set()
+
+        if durable:
+            return RedisIngestTicket(self.redis_client, ack_key)
+        return IngestTicket(resolved=True)
+
+    def pending(self):
+        return self.redis_client.llen(self.key)
+
+    def _take(self, limit):
+        count = min(limit, self.redis_client.llen(self.key))
+        if not count:
+            return None, []
+
+        owner = self._get_owner()
+        batch_key = f'{self.key}:processing:{owner}:{uuid4().hex}'
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.set(self._owner_key(owner), 1, ex=self.OWNER_TTL)
+        # Каждый LMOVE атомарен: элемент находится либо в буфере, либо в списке пакета
+        for _ in range(count):
+            pipeline.lmove(self.key, batch_key, 'LEFT', 'RIGHT')
+        raw_items = [raw_item for raw_item in pipeline.execute()[1:] if raw_item is not None]
+
+        items = []
+        for raw_item in raw_items:
+            item = json_loads(raw_item)
+            items.append((item['record'], item['ack'], raw_item))
+        return batch_key, items
+
+    def _heartbeat(self, batch):
+        # Без обновления отметки пакет, записываемый дольше OWNER_TTL, вернул бы в буфер
+        # recover_orphaned другого процесса, и уведомления были бы записаны дважды
+        if batch is None:
+            return
+        try:
+            self.redis_client.set(self._owner_key(self._get_owner()), 1, ex=self.OWNER_TTL)
+        except Exception as err:
+            logger.error(f"Ошибка обновления отметки сборщика буфера: {err}")
+
+    def _complete(self, batch, requeue=(), rejected=()):
+        if batch is None:
+            return
+
+        pipeline = self.redis_client.pipeline(transaction=True)
+        if requeue:
+            pipeline.lpush(self.key, *reversed([raw_item for _, _, raw_item in requeue]))
+        for (record, ack, _), error in rejected:
+            pipeline.rpush(self.dead_key, json_dumps({'record': record, 'ack': ack, 'error': str(error)},
+                                                     ensure_ascii=False))
+        if rejected:
+            pipeline.ltrim(self.dead_key, -self.dead_max_size, -1)
+        pipeline.delete(batch)
+        pipeline.execute()
+
+    def dead_letters(self, limit=10):
+        return [json_loads(raw_item) for raw_item in self.redis_client.lrange(self.dead_key, -limit, -1)]
+
+    def requeue_dead_letters(self):
+        # LMOVE атомарен: запись находится либо в списке отклонённых, либо в буфере.
+        # Поле error при чтении из буфера не используется, ожидавшее подтверждения представление уже ответило
+        requeued = 0
+        while self.redis_client.lmove(self.dead_key, self.key, 'LEFT', 'RIGHT') is not None:
+            requeued += 1
+        if requeued:
+            logger.warning(f"Возвращено в буфер отклонённых уведомлений: {requeued}")
+        return requeued
+
+    def stats(self):
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.llen(self.key)
+        pipeline.llen(self.dead_key)
+        pending, dead_letters = pipeline.execute()
+        return {'pending': pending, 'dead_letters': dead_letters}
+
+    def recover_orphaned(self):
+        """
+        Возврат в начало буфера пакетов процессов, завершившихся между извлечением пакета и его записью.
+        Если процесс завершился после записи в БД, но до удаления пакета, записи будут записаны повторно.
+
+        Returns:
+            int: Количество возвращённых элементов
+        """
+
+        recovered = 0
+        for batch_key in self.redis_client.scan_iter(match=f'{self.key}:processing:*', count=100):
+            owner = batch_key[len(f'{self.key}:processing:'):].split(':', 1)[0]
+            if self.redis_client.exists(self._owner_key(owner)):
+                continue
+            # С конца пакета в начало буфера: исходный порядок сохраняется
+            while self.redis_client.lmove(batch_key, self.key, 'RIGHT', 'LEFT') is not None:
+                recovered += 1
+
+        if recovered:
+            logger.warning(f"Возвращено в буфер уведомлений из незавершённых пакетов: {recovered}")
+        return recovered
+
+    def flush_all(self):
+        now = time.monotonic()
+        if now - self._recovered_at >= self.RECOVER_INTERVAL:
+            self._recovered_at = now
+            try:
+                self.recover_orphaned()
+            except Exception as err:
+                logger.error(f"Ошибка возврата незавершённых пакетов буфера: {err}")
+        return super().flush_all()
+
+    def _acknowledge(self, items, error=None):
+        ack_keys = [ack for _, ack, _ in items if ack]
+        if not ack_keys:
+            return
+
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for ack_key in ack_keys:
+            pipeline.rpush(ack_key, error or 'ok')
+            # Ответ нужен только ожидающему представлению, не храним его дольше
+            pipeline.expire(ack_key, int(self.ack_timeout) + 60)
+        pipeline.execute()
+
+
+_ingest_buffer = None
+_ingest_buffer_lock = threading.Lock()
+
+
+def get_ingest_buffer():
+    """
+    Получение буфера приёма, выбранного в настройках INGEST_BUFFER_BACKEND.
+    """
+
+    global _ingest_buffer
+    if _ingest_buffer is None:
+        with _ingest_buffer_lock:
+            if _ingest_buffer is None:
+                if app_settings.INGEST_BUFFER_BACKEND == 'redis':
+                    _ingest_buffer = RedisIngestBuffer()
+                else:
+                    _ingest_buffer = MemoryIngestBuffer()
+    return _ingest_buffer
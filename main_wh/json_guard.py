@@ -0,0 +1,171 @@
+import re
+
+# Ограничения структуры JSON по умолчанию
+DEFAULT_MAX_KEYS = 100
+DEFAULT_MAX_ARRAY_LENGTH = 1000
+DEFAULT_MAX_NODES = 20000
+DEFAULT_MAX_STRING_CHARS = 100000
+
+# Размер тела, начиная с которого структура проверяется по тексту до json.loads.
+# Небольшие документы json.loads (на C) разбирает быстрее, чем их разбивает на лексемы re
+# (см. команду bench_json_validator)
+TEXT_SCAN_MIN_SIZE = 16384
+
+# Лексемы, влияющие на структуру: строки целиком (чтобы скобки внутри строк не учитывались)
+# и структурные символы. Числа, true/false/null и пробелы пропускаются движком re.
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\],:]')
+
+
+def check_json_structure(data, max_depth=5, max_keys=DEFAULT_MAX_KEYS, max_array_length=DEFAULT_MAX_ARRAY_LENGTH,
+                         max_nodes=DEFAULT_MAX_NODES, max_string_chars=DEFAULT_MAX_STRING_CHARS):
+    """
+    Проверка разобранного JSON (dict/list из json.loads) без рекурсии (явный стек)
+    с прерыванием при первом превышении любого ограничения.
+    Глубина считается так же, как в WebhookProcessor.is_safe_json_structure:
+    корень - глубина 0, допустимы узлы до глубины max_depth включительно.
+
+    Returns:
+        str | None: Описание превышенного ограничения или None, если структура допустима
+    """
+
+    root_type = type(data)
+    if root_type is not dict and root_type is not list:
+        if root_type is str and len(data) > max_string_chars:
+            return f"строки длиннее {max_string_chars} символов"
+        return None
+
+    nodes = 1
+    string_chars = 0
+    stack = [(data, 0)]
+    # Локальные ссылки на методы: цикл выполняется для каждого контейнера документа
+    pop = stack.pop
+    push = stack.append
+
+    while stack:
+        value, depth = pop()
+
+        if type(value) is dict:
+            if len(value) > max_keys:
+                return f"объект из {len(value)} ключей (допустимо {max_keys})"
+            if value and depth >= max_depth:
+                return f"глубина вложенности больше {max_depth}"
+
+            nodes += len(value)
+            if nodes > max_nodes:
+                return f"больше {max_nodes} элементов"
+
+            depth += 1
+            for key, child in value.items():
+                string_chars += len(key)
+                child_type = type(child)
+                if child_type is str:
+                    string_chars += len(child)
+                elif child_type is dict or child_type is list:
+                    push((child, depth))
+
+        else:
+            if len(value) > max_array_length:
+                return f"массив из {len(value)} элементов (допустимо {max_array_length})"
+            if value and depth >= max_depth:
+                return f"глубина вложенности больше {max_depth}"
+
+            nodes += len(value)
+            if nodes > max_nodes:
+                return f"больше {max_nodes} элементов"
+
+            depth += 1
+            for child in value:
+                child_type = type(child)
+                if child_type is str:
+                    string_chars += len(child)
+                elif child_type is dict or child_type is list:
+                    push((child, depth))
+
+        if string_chars > max_string_chars:
+            return f"строки длиннее {max_string_chars} символов"
+
+    return None
+
+
+def scan_json_text(text, max_depth=5, max_keys=DEFAULT_MAX_KEYS, max_array_length=DEFAULT_MAX_ARRAY_LENGTH,
+                   max_nodes=DEFAULT_MAX_NODES, max_string_chars=DEFAULT_MAX_STRING_CHARS):
+    """
+    Проверка тех же ограничений по тексту JSON до построения объектов (по мере разбора на лексемы).
+    Позволяет отклонить слишком глубокий или широкий документ, не выделяя под него память.
+    Синтаксис документа не проверяется - это делает json.loads.
+
+    Returns:
+        str | None: Описание превышенного ограничения или None, если структура допустима
+    """
+
+    nodes = 1
+    string_chars = 0
+    # Элемент стека: [открывающий символ, количество элементов, позиция последней лексемы]
+    stack = []
+
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        char = token[0]
+
+        if char == '"':
+            # Длина строки считается по тексту вместе с escape-последовательностями (оценка сверху)
+            string_chars += len(token) - 2
+            if string_chars > max_string_chars:
+                return f"строки длиннее {max_string_chars} символов"
+            if stack and stack[-1][1] == 0 and stack[-1][0] == '[':
+                # Первый элемент массива
+                stack[-1][1] = 1
+                nodes += 1
+                if len(stack) > max_depth:
+                    return f"глубина вложенности больше {max_depth}"
+
+        elif char in '{[':
+            if stack:
+                frame = stack[-1]
+                if frame[0] == '[' and frame[1] == 0:
+                    frame[1] = 1
+                    nodes += 1
+            if len(stack) > max_depth:
+                return f"глубина вложенности больше {max_depth}"
+            stack.append([char, 0, match.end()])
+
+        elif char == ':':
+            # Каждый ключ объекта - новый элемент
+            if not stack:
+                continue
+            frame = stack[-1]
+            frame[1] += 1
+            nodes += 1
+            if frame[1] > max_keys:
+                return f"объект больше {max_keys} ключей"
+            if len(stack) > max_depth:
+                return f"глубина вложенности больше {max_depth}"
+
+        elif char == ',':
+            if not stack:
+                continue
+            frame = stack[-1]
+            if frame[0] == '[':
+                # Если до запятой не было лексем, первым элементом был скаляр (число, true, false, null)
+                added = 2 if frame[1] == 0 else 1
+                frame[1] += added
+                nodes += added
+                if frame[1] > max_array_length:
+                    return f"массив больше {max_array_length} элементов"
+                if len(stack) > max_depth:
+                    return f"глубина вложенности больше {max_depth}"
+
+        else:
+            # Закрывающая скобка: массив из одного скаляра не содержит лексем, проверяем текст
+            if not stack:
+                continue
+            frame = stack.pop()
+            if frame[0] == '[' and frame[1] == 0 and text[frame[2]:match.start()].strip():
+                nodes += 1
+                if len(stack) + 1 > max_depth:
+                    return f"глубина вложенности больше {max_depth}"
+
+        if nodes > max_nodes:
+            return f"больше {max_nodes} элементов"
+
+    return None
@@ -0,0 +1,63 @@
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Сравнение синхронной (WSGI) и асинхронной (ASGI) точек приёма уведомлений под нагрузкой. '
+            'Запускать на тестовом стенде: лимиты throttling должны быть увеличены, '
+            'иначе большинство ответов будет 429.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', type=str, required=True,
+                            help='Например: http://127.0.0.1:8000/webhooks/<id_ext>')
+        parser.add_argument('--async-url', type=str, required=True,
+                            help='Например: http://127.0.0.1:8001/webhooks/async/<id_ext>')
+        parser.add_argument('--requests', type=int, default=1000, help='Количество запросов на точку')
+        parser.add_argument('--concurrency', type=int, default=50, help='Количество параллельных клиентов')
+
+    def handle(self, *args, **options):
+        payload = json.dumps({'event': 'benchmark', 'items': list(range(20))}).encode('utf-8')
+
+        for title, url in (('WSGI', options['sync_url']), ('ASGI', options['async_url'])):
+            result = self.run(url, payload, options['requests'], options['concurrency'])
+            self.stdout.write(
+                f"{title}: {result['rps']:.1f} запр/с, "
+                f"p50 {result['p50']:.1f} мс, p95 {result['p95']:.1f} мс, p99 {result['p99']:.1f} мс, "
+                f"коды ответов: {dict(result['statuses'])}"
+            )
+
+    @staticmethod
+    def send(url, payload):
+        request = Request(url, data=payload, method='POST', headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+                code = response.status
+        except HTTPError as err:
+            code = err.code
+        except OSError:
+            code = 'error'
+        return code, (time.perf_counter() - started) * 1000
+
+    def run(self, url, payload, total, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: self.send(url, payload), range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        return {
+            'rps': total / elapsed,
+            'p50': median(latencies),
+            'p95': latencies[int(len(latencies) * 0.95) - 1],
+            'p99': latencies[int(len(latencies) * 0.99) - 1],
+            'statuses': Counter(code for code, _ in results),
+        }
@@ -0,0 +1,107 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_wh.json_guard import check_json_structure, scan_json_text
+
+
+def recursive_check(data, max_depth=5, current_depth=0):
+    # Прежняя рекурсивная проверка WebhookProcessor.is_safe_json_structure (для сравнения)
+    if current_depth > max_depth:
+        return False
+
+    if isinstance(data, dict):
+        if len(data) > 100:
+            return False
+        for value in data.values():
+            if not recursive_check(value, max_depth, current_depth + 1):
+                return False
+
+    elif isinstance(data, list):
+        if len(data) > 1000:
+            return False
+        for item in data:
+            if not recursive_check(item, max_depth, current_depth + 1):
+                return False
+
+    return True
+
+
+def build_payloads():
+    """
+    Наборы данных: обычное уведомление, глубокое, широкое и вредоносные варианты.
+    """
+
+    typical = {'event': 'payment.succeeded', 'object': {'id': 'pm_1', 'amount': {'value': '100.00', 'currency': 'RUB'},
+                                                        'metadata': {'order': 42}, 'items': list(range(20))}}
+
+    deep_allowed = {}
+    node = deep_allowed
+    for _ in range(9):
+        node['child'] = {}
+        node = node['child']
+
+    # Такую вложенность json.loads не разбирает (RecursionError), проверка по тексту отклоняет её сразу
+    deep_attack_text = '[' * 5000 + ']' * 5000
+
+    wide_allowed = [{'id': i, 'name': f'item {i}'} for i in range(1000)]
+    wide_attack_text = '[' + ','.join('0' for _ in range(200000)) + ']'
+
+    # Много маленьких объектов: бюджет элементов исчерпывается раньше, чем ограничения ширины
+    nodes_attack = [[[0] * 50 for _ in range(50)] for _ in range(20)]
+
+    return [
+        ('обычное', json.dumps(typical)),
+        ('глубокое (10 уровней)', json.dumps(deep_allowed)),
+        ('широкое (1000 объектов)', json.dumps(wide_allowed)),
+        ('атака: вложенность 5000', deep_attack_text),
+        ('атака: массив 200000', wide_attack_text),
+        ('атака: 50000 элементов', json.dumps(nodes_attack)),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Сравнение проверок структуры JSON: прежняя рекурсивная, итеративная по разобранным данным '
+            'и проверка по тексту до разбора.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Количество повторов на набор данных')
+        parser.add_argument('--max-depth', type=int, default=10)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        max_depth = options['max_depth']
+
+        for title, text in build_payloads():
+            self.stdout.write(f"{title} ({len(text)} байт):")
+
+            # Время разбора учитывается: проверка по тексту позволяет его пропустить
+            results = {
+                'рекурсивная (разбор + проверка)':
+                    self.measure(lambda: recursive_check(json.loads(text), max_depth), iterations),
+                'итеративная (разбор + проверка)':
+                    self.measure(lambda: check_json_structure(json.loads(text), max_depth) is None, iterations),
+                'по тексту (проверка + разбор)':
+                    self.measure(lambda: scan_json_text(text, max_depth) is None and
+                                 check_json_structure(json.loads(text), max_depth) is None, iterations),
+            }
+
+            for name, (elapsed, outcome) in results.items():
+                self.stdout.write(f"  {name}: {elapsed * 1_000_000:.1f} мкс, результат: {outcome}")
+
+    @staticmethod
+    def measure(func, iterations):
+        # Слишком глубокий документ стандартный json не разбирает (RecursionError) - это тоже отказ,
+        # но обнаруженный только после попытки разбора
+        def run():
+            try:
+                return 'допустимо' if func() else 'отклонено'
+            except RecursionError:
+                return 'RecursionError'
+
+        outcome = run()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        return (time.perf_counter() - started) / iterations, outcome
@@ -0,0 +1,103 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+
+from main_wh.queue_codecs import (COMPRESSION_LZ4, COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD,
+                                  FORMAT_JSON, FORMAT_LEGACY, FORMAT_MSGPACK, MessageCodec, decode_message)
+
+# Сравниваемые варианты: (формат, сжатие)
+VARIANTS = [
+    (FORMAT_LEGACY, COMPRESSION_NONE),
+    (FORMAT_JSON, COMPRESSION_NONE),
+    (FORMAT_JSON, COMPRESSION_ZLIB),
+    (FORMAT_JSON, COMPRESSION_ZSTD),
+    (FORMAT_JSON, COMPRESSION_LZ4),
+    (FORMAT_MSGPACK, COMPRESSION_NONE),
+    (FORMAT_MSGPACK, COMPRESSION_ZSTD),
+    (FORMAT_MSGPACK, COMPRESSION_LZ4),
+]
+
+
+def build_samples():
+    """
+    Уведомления разного размера: короткое, типичное платёжное и крупное со списком позиций.
+    """
+
+    def webhook_data(notification_id, parsed_body):
+        return {
+            'id': notification_id,
+            'category': 'a1b2c3d4-0000-4000-8000-000000000001',
+            'parsed_body': parsed_body,
+            'created_at': '2025-01-15T10:30:00.123456+05:00',
+        }
+
+    small = {'event': 'ping', 'ok': True}
+
+    typical = {
+        'event': 'payment.succeeded',
+        'object': {
+            'id': '2e8a6f3e-000f-5000-9000-1b0f6b2f3b45', 'status': 'succeeded', 'paid': True,
+            'amount': {'value': '1500.00', 'currency': 'RUB'},
+            'description': 'Оплата заказа №10452',
+            'payment_method': {'type': 'bank_card', 'id': '2e8a6f3e', 'saved': False,
+                               'card': {'first6': '555555', 'last4': '4444', 'expiry_month': '12',
+                                        'expiry_year': '2027', 'card_type': 'MasterCard'}},
+            'metadata': {'order_id': '10452', 'customer': 'ivanov@example.ru'},
+        },
+    }
+
+    large = {
+        'event': 'order.updated',
+        'order_id': 10452,
+        'items': [{'sku': f'SKU-{i:05d}', 'name': f'Товар {i}', 'quantity': i % 5 + 1,
+                   'price': {'value': f'{100 + i}.00', 'currency': 'RUB'}} for i in range(100)],
+    }
+
+    return [
+        ('короткое', webhook_data(1, small)),
+        ('типичное', webhook_data(2, typical)),
+        ('крупное (100 позиций)', webhook_data(3, large)),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Сравнение форматов сообщений бизнес-очереди: время кодирования и декодирования '
+            'и размер сообщения в байтах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Количество повторов на сообщение')
+        parser.add_argument('--compress-min-size', type=int, default=1024,
+                            help='Размер, начиная с которого сообщение сжимается')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        codecs = []
+        for message_format, compression in VARIANTS:
+            title = f"{message_format}{'+' + compression if compression else ''}"
+            try:
+                codecs.append((title, MessageCodec(message_format, compression, options['compress_min_size'])))
+            except ImproperlyConfigured as err:
+                # Необязательный пакет не установлен
+                self.stdout.write(self.style.WARNING(f"{title}: пропущен ({err})"))
+
+        for sample_title, webhook_data in build_samples():
+            self.stdout.write(f"{sample_title}:")
+
+            for title, codec in codecs:
+                message = codec.encode(webhook_data)
+                size = len(message.encode('utf-8') if isinstance(message, str) else message)
+
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    codec.encode(webhook_data)
+                encode_time = (time.perf_counter() - started) / iterations
+
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    decode_message(message)
+                decode_time = (time.perf_counter() - started) / iterations
+
+                self.stdout.write(f"  {title:<16} {size:>6} байт, кодирование: {encode_time * 1_000_000:.1f} мкс, "
+                                  f"декодирование: {decode_time * 1_000_000:.1f} мкс")
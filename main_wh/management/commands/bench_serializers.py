@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from main_wh.fast_serializers import WebhookRequestDetailFastSerializer
+from main_wh.models import WebhookRequest
+from main_wh.serializers import WebhookRequestDetailSerializer
+
+
+class Command(BaseCommand):
+    help = ('Сравнение WebhookRequestDetailSerializer и WebhookRequestDetailFastSerializer на записях из БД: '
+            'записей в секунду (чтение + сериализация + JSONRenderer) и побайтное совпадение ответа.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Количество записей (как страница списка)')
+        parser.add_argument('--iterations', type=int, default=20, help='Количество повторов')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        iterations = options['iterations']
+        renderer = JSONRenderer()
+        fast_serializer = WebhookRequestDetailFastSerializer()
+
+        queryset = WebhookRequest.objects.select_related('category').order_by('-inserted_at', '-id')[:rows]
+
+        # queryset.all() - новый запрос на каждом повторе (без кэша результатов QuerySet)
+        def drf():
+            return renderer.render(WebhookRequestDetailSerializer(list(queryset.all()), many=True).data)
+
+        def fast():
+            return renderer.render(fast_serializer.serialize(fast_serializer.prepare_queryset(queryset.all())))
+
+        drf_output = drf()
+        fast_output = fast()
+        count = queryset.count()
+        if not count:
+            raise CommandError('В БД нет Уведомлений для сравнения')
+
+        self.stdout.write(f"Записей: {count}, ответ {len(drf_output)} байт, "
+                          f"совпадает побайтно: {'да' if drf_output == fast_output else 'НЕТ'}")
+
+        for title, func in (('WebhookRequestDetailSerializer', drf), ('WebhookRequestDetailFastSerializer', fast)):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {title}: {count * iterations / elapsed:,.0f} записей/с "
+                              f"({elapsed / iterations * 1000:.1f} мс на {count} записей)")
@@ -0,0 +1,45 @@
+from argparse import BooleanOptionalAction
+
+from django.core.management.base import BaseCommand
+
+from main_wh.conf import app_settings
+from main_wh.models import WebhookRequest
+from main_wh.retention import cleanup_expired, delete_in_chunks, get_cutoff
+
+
+class Command(BaseCommand):
+    help = ('Удаление Уведомлений старше срока хранения диапазонами id с паузами между ними '
+            '(для секционированной таблицы - сначала удаление устаревших секций)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Срок хранения (по умолчанию RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Диапазон id в одном DELETE (по умолчанию RETENTION_CHUNK_SIZE)')
+        parser.add_argument('--pause', type=float, default=None,
+                            help='Пауза между диапазонами в секундах (по умолчанию RETENTION_CHUNK_PAUSE)')
+        parser.add_argument('--max-seconds', type=int, default=None,
+                            help='Ограничение времени работы (по умолчанию RETENTION_MAX_SECONDS)')
+        parser.add_argument('--archive', action=BooleanOptionalAction, default=None,
+                            help='Архивировать записи перед удалением (по умолчанию ARCHIVE_ENABLED)')
+        parser.add_argument('--dry-run', action='store_true', help='Только подсчитать устаревшие Уведомления')
+
+    def handle(self, *args, **options):
+        cutoff = get_cutoff(options['days'])
+
+        if options['dry_run']:
+            count = WebhookRequest.objects.filter(inserted_at__lt=cutoff).count()
+            self.stdout.write(f'Уведомлений старше {cutoff:%Y-%m-%d %H:%M}: {count}')
+            return
+
+        archive = app_settings.ARCHIVE_ENABLED if options['archive'] is None else options['archive']
+        if not archive and (options['chunk_size'] or options['pause'] is not None or options['max_seconds']):
+            deleted = delete_in_chunks(cutoff, options['chunk_size'], options['pause'], options['max_seconds'])
+            self.stdout.write(self.style.SUCCESS(f'Удалено Уведомлений: {deleted}'))
+            return
+
+        result = cleanup_expired(options['days'], archive=archive)
+        if 'archived' in result:
+            self.stdout.write(f"Заархивировано Уведомлений: {result['archived']['rows']}, "
+                              f"файлов: {result['archived']['files']}")
+        self.stdout.write(self.style.SUCCESS(f"Удалено секций: {result['partitions_dropped']}, "
+                                             f"Уведомлений: {result['rows_deleted']}"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from main_wh.models import CategoryWebhook
+
+
+class Command(BaseCommand):
+    help = ('Выгрузка активных категорий в файл map для nginx '
+            '(после выгрузки выполнить nginx -s reload)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='webhook_categories.map',
+            help='Путь к файлу для директивы include в nginx.conf',
+        )
+        parser.add_argument(
+            '--variable',
+            type=str,
+            default='webhook_category_known',
+            help='Имя переменной nginx (без $)',
+        )
+
+    def handle(self, *args, **options):
+        external_ids = sorted(CategoryWebhook.get_active_categories().values_list('id_ext', flat=True))
+
+        # Точные строки в map nginx хранит в хэш-таблице, проверка выполняется за O(1)
+        lines = [
+            f"map $uri ${options['variable']} {{",
+            "    default 0;",
+        ]
+        for external_id in external_ids:
+            lines.append(f"    /webhooks/{external_id} 1;")
+            lines.append(f"    /webhooks/async/{external_id} 1;")
+        lines.append("}")
+
+        with open(options['output'], 'w', encoding='utf-8') as map_file:
+            map_file.write('\n'.join(lines) + '\n')
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Выгружено категорий: {len(external_ids)} в {options['output']}")
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main_wh.ingest import get_ingest_buffer
+
+
+class Command(BaseCommand):
+    help = 'Запись накопленных в буфере уведомлений в БД (для буфера в Redis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, записывая пакеты по мере накопления',
+        )
+        parser.add_argument(
+            '--dead-letters',
+            action='store_true',
+            help='Показать отклонённые при записи уведомления (последние 10) и выйти',
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Вернуть отклонённые уведомления в буфер (после исправления причины) и записать',
+        )
+
+    def handle(self, *args, **options):
+        ingest_buffer = get_ingest_buffer()
+
+        if options.get('dead_letters'):
+            self.stdout.write(f"Отклонённых уведомлений: {ingest_buffer.stats()['dead_letters']}")
+            for item in ingest_buffer.dead_letters():
+                self.stdout.write(f"{item['error']}: {str(item['record'])[:500]}")
+            return
+
+        if options.get('requeue_dead'):
+            self.stdout.write(f'Возвращено в буфер: {ingest_buffer.requeue_dead_letters()}')
+
+        if not options.get('loop'):
+            written = ingest_buffer.flush_all()
+            self.stdout.write(self.style.SUCCESS(f'Записано уведомлений: {written}'))
+            return
+
+        self.stdout.write(f'Сборщик буфера запущен (пакет: {ingest_buffer.batch_size}, '
+                          f'интервал: {ingest_buffer.flush_interval} с)')
+        while True:
+            close_old_connections()
+            # Если записан неполный пакет - буфер опустел, ждём следующего интервала
+            if ingest_buffer.flush_all() < ingest_buffer.batch_size:
+                time.sleep(ingest_buffer.flush_interval)
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from main_wh.conf import app_settings
+from main_wh.retention import (build_partition_conversion_sql, ensure_partitions, get_partition_start,
+                               get_partitions, is_partitioned)
+
+
+class Command(BaseCommand):
+    help = ('Секционирование таблицы Уведомлений по inserted_at (PostgreSQL): перевод существующей таблицы '
+            '(--convert, после применения всех миграций), создание секций наперёд (--ensure), '
+            'список секций (по умолчанию). '
+            'После перевода срок хранения соблюдается удалением целых секций (cleanup_old_notifications)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Перевод таблицы на секционирование (без --execute - только вывод SQL)')
+        parser.add_argument('--execute', action='store_true', help='Выполнить перевод')
+        parser.add_argument('--ensure', action='store_true', help='Создать секции на RETENTION_PARTITIONS_AHEAD вперёд')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование доступно только для PostgreSQL')
+
+        if options['convert']:
+            return self.convert(options['execute'])
+
+        if not is_partitioned():
+            self.stdout.write('Таблица Уведомлений не секционирована (перевод: --convert)')
+            return
+
+        if options['ensure']:
+            ensure_partitions()
+
+        for name, start, end in get_partitions():
+            self.stdout.write(f"  {name}: {f'{start:%Y-%m-%d}' if start else '...'} - {end:%Y-%m-%d}")
+
+    def convert(self, execute):
+        if is_partitioned():
+            raise CommandError('Таблица Уведомлений уже секционирована')
+
+        # Индексы последующих миграций у секционированной таблицы строятся с блокировкой записи
+        # (CREATE INDEX CONCURRENTLY для неё недоступен), поэтому перевод - после всех миграций
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise CommandError('Есть непримененные миграции: выполните migrate перед секционированием')
+
+        # Начало первой секции - не раньше чем через сутки: до переключения новые записи
+        # ещё попадают в исходную таблицу и должны проходить её проверочное ограничение
+        boundary = get_partition_start(timezone.now() + timedelta(days=1)) + timedelta(
+            days=app_settings.RETENTION_PARTITION_DAYS)
+        prepare, switch = build_partition_conversion_sql(boundary)
+
+        if not execute:
+            self.stdout.write('-- Подготовка (без длительной блокировки, вне транзакции)')
+            for statement in prepare:
+                self.stdout.write(f'{statement};')
+            self.stdout.write('-- Переключение (одна транзакция)\nBEGIN;')
+            for statement in switch:
+                self.stdout.write(f'{statement};')
+            self.stdout.write('COMMIT;')
+            return
+
+        with connection.cursor() as cursor:
+            for statement in prepare:
+                self.stdout.write(statement)
+                cursor.execute(statement)
+
+            with transaction.atomic():
+                for statement in switch:
+                    cursor.execute(statement)
+
+        ensure_partitions()
+        self.stdout.write(self.style.SUCCESS(f'Таблица Уведомлений секционирована, первая секция с {boundary:%Y-%m-%d}'))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from main_wh.models import WebhookRequest
+from main_wh.retry import get_retry_stats
 
 from main_wh.tasks import retry_failed_notifications
 
@@ -27,10 +28,12 @@ class Command(BaseCommand):
         elif action == 'stats':
             stats = {
                 'новый': WebhookRequest.objects.filter(status='new').count(),
+                'в обработке': WebhookRequest.objects.filter(status='processing').count(),
                 'ошибка': WebhookRequest.objects.filter(status='error').count(),
                 'завершено': WebhookRequest.objects.filter(status='complete').count(),
                 'всего': WebhookRequest.objects.count(),
             }
             self.stdout.write(f"Статистика уведомлений: {stats}")
+            self.stdout.write(f"Повторная обработка ошибок: {get_retry_stats()}")
         else:
             self.stdout.write('Используйте --action [retry_failed|stats]')
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main_wh.conf import app_settings
+from main_wh.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = ('Отправка сообщений из outbox в очередь бизнес-сервиса. '
+            'Можно запускать несколько экземпляров: строки разбираются через FOR UPDATE SKIP LOCKED')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, отправляя сообщения по мере появления',
+        )
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Сообщений в одном pipeline (по умолчанию BUSINESS_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Пауза (в секундах), когда outbox пуст')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or app_settings.BUSINESS_OUTBOX_BATCH_SIZE
+
+        if not options.get('loop'):
+            sent = drain_outbox(batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Отправлено сообщений: {sent}'))
+            return
+
+        self.stdout.write(f'Ретранслятор outbox запущен (пакет: {batch_size}, интервал: {options["interval"]} с)')
+        while True:
+            close_old_connections()
+            # Если отправлен неполный пакет - outbox опустел (или Redis недоступен), ждём
+            if drain_outbox(batch_size) < batch_size:
+                time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+import json
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_wh.archive import iter_archived, json_default, restore_records
+
+
+class Command(BaseCommand):
+    help = ('Восстановление Уведомлений из архива (по манифесту NotificationArchive) в таблицу '
+            'или вывод их в NDJSON (--output)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, action='append', dest='ids', default=[],
+                            help='Идентификатор Уведомления (можно указать несколько раз)')
+        parser.add_argument('--date-from', type=date.fromisoformat, default=None,
+                            help='Начало периода добавления (ГГГГ-ММ-ДД, UTC, включительно)')
+        parser.add_argument('--date-to', type=date.fromisoformat, default=None,
+                            help='Конец периода добавления (ГГГГ-ММ-ДД, UTC, включительно)')
+        parser.add_argument('--output', default=None,
+                            help='Записать найденные записи в файл NDJSON ("-" - в stdout) вместо восстановления')
+
+    def handle(self, *args, **options):
+        if not (options['ids'] or options['date_from'] or options['date_to']):
+            raise CommandError('Укажите --id или период --date-from / --date-to')
+
+        records = iter_archived(options['ids'], options['date_from'], options['date_to'])
+
+        if options['output']:
+            output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+            count = 0
+            try:
+                for record in records:
+                    output.write(json.dumps(record, ensure_ascii=False, default=json_default) + '\n')
+                    count += 1
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+            self.stderr.write(f'Найдено записей в архиве: {count}')
+            return
+
+        result = restore_records(records)
+        self.stdout.write(self.style.SUCCESS(f"Восстановлено Уведомлений: {result['restored']}, "
+                                             f"пропущено (уже есть в таблице или нет Категории): {result['skipped']}"))
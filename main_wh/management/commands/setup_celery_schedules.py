@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
 
+from main_wh.conf import app_settings
+
 
 class Command(BaseCommand):
     help = 'Настройка начального расписания Celery Beat'
@@ -14,32 +16,42 @@ class Command(BaseCommand):
             period=IntervalSchedule.SECONDS,
         )
 
-        # Создаем cron расписания
-        crontab_2am, _ = CrontabSchedule.objects.get_or_create(
-            hour=2, minute=0, timezone="Asia/Yekaterinburg"
+        # Шаг адаптивной досборки: сама досборка решает, запускаться ли (main_wh.sweeper)
+        interval_sweeper, _ = IntervalSchedule.objects.get_or_create(
+            every=app_settings.SWEEPER_MIN_INTERVAL,
+            period=IntervalSchedule.SECONDS,
         )
 
+        interval_30sec, _ = IntervalSchedule.objects.get_or_create(
+            every=30,
+            period=IntervalSchedule.SECONDS,
+        )
+
+        # Создаем cron расписания
         crontab_4am, _ = CrontabSchedule.objects.get_or_create(
             hour=4, minute=0, timezone="Asia/Yekaterinburg"
         )
 
         # Задачи
         tasks = [
-            ("process-pending-notifications", "main_wh.tasks.process_pending_notifications", interval_5min),
-            ("retry-failed-notifications", "main_wh.tasks.retry_failed_notifications", crontab_2am),
+            ("process-pending-notifications", "main_wh.tasks.process_pending_notifications", interval_sweeper),
+            ("retry-failed-notifications", "main_wh.tasks.retry_failed_notifications", interval_5min),
             ("cleanup-old-notifications", "main_wh.tasks.cleanup_old_notifications", crontab_4am),
+            ("relay-business-outbox", "main_wh.tasks.relay_business_outbox", interval_30sec),
         ]
 
         for name, task, schedule in tasks:
-            obj, created = PeriodicTask.objects.get_or_create(
+            # Расписание уже созданной задачи обновляется (например, при изменении интервала);
+            # у задачи должно быть ровно одно расписание
+            schedules = {"interval": None, "crontab": None}
+            schedules['crontab' if isinstance(schedule, CrontabSchedule) else 'interval'] = schedule
+            obj, created = PeriodicTask.objects.update_or_create(
                 name=name,
-                task=task,
-                schedule=schedule,
-                defaults={"enabled": True}
+                defaults={"task": task, **schedules},
             )
             if created:
                 self.stdout.write(f'Создана задача: {name}')
             else:
-                self.stdout.write(f'Задача уже создана: {name}')
+                self.stdout.write(f'Задача обновлена: {name}')
 
         self.stdout.write('Celery Beat настройка расписания завершена!')
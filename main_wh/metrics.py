@@ -0,0 +1,31 @@
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, generate_latest
+
+from main_wh.sweeper import get_state
+
+# Показатели досборки: (имя метрики, поле состояния, описание)
+SWEEPER_GAUGES = (
+    ('webhook_sweeper_backlog', 'backlog', 'Ожидающие Уведомления на момент последнего замера'),
+    ('webhook_sweeper_rate', 'rate', 'Скорость обработки одной задачей досборки, Уведомлений в секунду'),
+    ('webhook_sweeper_drain_eta_seconds', 'eta_seconds', 'Оценка времени разбора очереди, секунд'),
+    ('webhook_sweeper_batch_size', 'batch_size', 'Размер пакета досборки'),
+    ('webhook_sweeper_workers', 'workers', 'Запущено задач досборки'),
+    ('webhook_sweeper_interval_seconds', 'interval', 'Интервал до следующего замера, секунд'),
+    ('webhook_sweeper_measured_timestamp_seconds', 'measured_at', 'Время последнего замера (Unix)'),
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def render_metrics():
+    """
+    Метрики в текстовом формате Prometheus.
+    Состояние досборки читается из Redis при каждом запросе: его пишут воркеры Celery,
+    а не процесс веб-приложения. Неизвестное значение (скорость ещё не измерена) - NaN.
+    """
+
+    registry = CollectorRegistry()
+    state = get_state()
+    for name, field, description in SWEEPER_GAUGES:
+        value = state[field]
+        Gauge(name, description, registry=registry).set(float('nan') if value is None else value)
+    return generate_latest(registry)
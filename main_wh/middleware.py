@@ -0,0 +1,253 @@
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from main_wh.bloom import active_category_filter
+from main_wh.category_cache import category_cache
+from main_wh.conf import app_settings
+from main_wh.models import CategoryWebhook
+from main_wh.parsing_profile import get_parsing_config
+from main_wh.utils import get_client_ip, render_json_response
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Путь точки приёма уведомлений: /webhooks/<id_ext> или /webhooks/async/<id_ext>
+WEBHOOK_PATH_RE = re.compile(r'^/webhooks/(?:async/)?(?P<id_ext>[^/]+)$')
+
+
+class UnknownCategoryMiddleware:
+    """
+    Отсечение запросов к несуществующим категориям до маршрутизации и DRF.
+    Неизвестный id_ext отклоняется по фильтру Блума без throttling и запросов к БД
+    с тем же ответом 404, что и у WebhookRequestCreateAPIView.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Фильтр перестраивается по сбросу кэша категорий: подписка на рассылку запускается один раз
+        # при загрузке приложения в процессе (воркер gunicorn загружает его после fork),
+        # а не при обработке запросов
+        if app_settings.CATEGORY_FILTER_ENABLED:
+            category_cache.ensure_subscriber()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        external_id = self.get_external_id(request)
+        if external_id is not None:
+            if active_category_filter.is_stale():
+                self.refresh_filter()
+            if not active_category_filter.might_exist(external_id):
+                return self.not_found()
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        external_id = self.get_external_id(request)
+        if external_id is not None:
+            if active_category_filter.is_stale():
+                await sync_to_async(self.refresh_filter)()
+            if not active_category_filter.might_exist(external_id):
+                return self.not_found()
+
+        return await self.get_response(request)
+
+    @staticmethod
+    def get_external_id(request):
+        if not app_settings.CATEGORY_FILTER_ENABLED:
+            return None
+
+        match = WEBHOOK_PATH_RE.match(request.path_info)
+        return match.group('id_ext') if match else None
+
+    @staticmethod
+    def refresh_filter():
+        try:
+            active_category_filter.refresh()
+        except Exception as err:
+            # Без фильтра пропускаем запросы дальше, решение примет представление
+            logger.error(f"Ошибка построения фильтра активных категорий: {err}")
+
+    @staticmethod
+    def not_found():
+        return render_json_response({"status": "error", "message": "Not found"}, status=404)
+
+
+# Ответ на слишком большое уведомление (тот же, что у представлений)
+BODY_TOO_LARGE_MESSAGE = {"status": "error", "message": "Превышен допустимый размер данных"}
+
+
+def get_body_limit(external_id):
+    """
+    Допустимый размер тела уведомления для категории (в байтах) из её параметров разбора.
+    Для неизвестной категории - общий лимит (представление всё равно ответит 404).
+    """
+    # Категории точно нет - не обращаемся ни к кэшу, ни к БД
+    if not active_category_filter.might_exist(external_id):
+        return app_settings.WEBHOOK_MAX_BODY_SIZE
+
+    try:
+        category = CategoryWebhook.get_active_by_external_id(external_id)
+    except Exception as err:
+        logger.error(f"Ошибка получения лимита размера данных категории: {err}")
+        category = None
+
+    if category is None:
+        return app_settings.WEBHOOK_MAX_BODY_SIZE
+    return get_parsing_config(category.id, category).max_body_size
+
+
+async def aget_body_limit(external_id):
+    """
+    Асинхронный вариант get_body_limit (категория и её параметры обычно уже в кэше процесса).
+    """
+    # Категории точно нет - не обращаемся ни к кэшу, ни к БД
+    if not active_category_filter.might_exist(external_id):
+        return app_settings.WEBHOOK_MAX_BODY_SIZE
+
+    try:
+        category = await CategoryWebhook.aget_active_by_external_id(external_id)
+    except Exception as err:
+        logger.error(f"Ошибка получения лимита размера данных категории: {err}")
+        category = None
+
+    if category is None:
+        return app_settings.WEBHOOK_MAX_BODY_SIZE
+    # Категория передана, поэтому параметры разбора собираются без обращения к БД
+    return get_parsing_config(category.id, category).max_body_size
+
+
+def get_declared_length(value):
+    """
+    Значение заголовка Content-Length (None, если заголовка нет или он некорректен).
+    """
+    try:
+        length = int(value)
+    except (TypeError, ValueError):
+        return None
+    return length if length >= 0 else None
+
+
+class WebhookBodyLimitMiddleware:
+    """
+    Отклонение слишком больших уведомлений по заголовку Content-Length до чтения тела.
+    Под WSGI Django читает из сокета не больше Content-Length байт (без заголовка тело пустое),
+    поэтому проверки заголовка достаточно. Под ASGI тело читается раньше middleware,
+    там ограничение выполняет WebhookBodyLimitASGIMiddleware (см. config/asgi.py).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if self.is_too_large(request):
+            return self.too_large(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        match, declared_length = self.match_webhook_request(request)
+        if declared_length is not None and declared_length > await aget_body_limit(match.group('id_ext')):
+            return self.too_large(request)
+        return await self.get_response(request)
+
+    def is_too_large(self, request):
+        match, declared_length = self.match_webhook_request(request)
+        return declared_length is not None and declared_length > get_body_limit(match.group('id_ext'))
+
+    @staticmethod
+    def match_webhook_request(request):
+        """
+        Returns:
+            tuple: (совпадение с путём точки приёма, Content-Length) или (None, None) для остальных запросов
+        """
+        match = WEBHOOK_PATH_RE.match(request.path_info)
+        if not match:
+            return None, None
+        return match, get_declared_length(request.META.get('CONTENT_LENGTH'))
+
+    @staticmethod
+    def too_large(request):
+        logger.error(f"Превышен допустимый размер данных from IP: {get_client_ip(request)}")
+        return render_json_response(BODY_TOO_LARGE_MESSAGE, status=413)
+
+
+class WebhookBodyLimitASGIMiddleware:
+    """
+    Ограничение размера уведомления для ASGI-приложения.
+    Django под ASGI читает тело целиком до вызова middleware, поэтому тело читается здесь:
+    при Content-Length больше лимита - сразу 413, иначе чтение прекращается,
+    как только получено больше лимита (в т.ч. для chunked-запросов без Content-Length).
+    Прочитанные части передаются приложению без изменений.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        match = WEBHOOK_PATH_RE.match(scope['path'])
+        if not match:
+            return await self.app(scope, receive, send)
+
+        limit = await aget_body_limit(match.group('id_ext'))
+        headers = dict(scope.get('headers') or [])
+
+        declared_length = get_declared_length(headers.get(b'content-length'))
+        if declared_length is not None and declared_length > limit:
+            return await self.too_large(scope, headers, send)
+
+        messages = []
+        received = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message['type'] != 'http.request':
+                # Клиент отключился - приложение само обработает сообщение
+                break
+
+            received += len(message.get('body', b''))
+            if received > limit:
+                return await self.too_large(scope, headers, send)
+            if not message.get('more_body', False):
+                break
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return await self.app(scope, replay, send)
+
+    @staticmethod
+    async def too_large(scope, headers, send):
+        forwarded_for = headers.get(b'x-forwarded-for', b'').decode('latin-1')
+        client_ip = forwarded_for.split(',')[0] if forwarded_for else (scope.get('client') or (None,))[0]
+        logger.error(f"Превышен допустимый размер данных from IP: {client_ip}")
+
+        response = render_json_response(BODY_TOO_LARGE_MESSAGE, status=413)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (b'content-type', response['Content-Type'].encode('latin-1')),
+                (b'content-length', str(len(response.content)).encode('latin-1')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': response.content})
@@ -0,0 +1,40 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+
+
+def is_partitioned_table(connection, table):
+    """
+    Секционирована ли таблица (декларативное секционирование PostgreSQL, см. partition_notifications)
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+        return cursor.fetchone() is not None
+
+
+class AddIndexConcurrentlyUnlessPartitioned(AddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY, а для секционированной таблицы Уведомлений - обычный CREATE INDEX:
+    PostgreSQL не строит индекс секционированной таблицы конкурентно. Обычный индекс строится
+    по секциям с блокировкой записи, поэтому таблицу следует секционировать после применения
+    всех миграций (partition_notifications --convert это проверяет).
+    """
+
+    def _use_plain_index(self, schema_editor, model):
+        return (self.allow_migrate_model(schema_editor.connection.alias, model)
+                and is_partitioned_table(schema_editor.connection, model._meta.db_table))
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self._use_plain_index(schema_editor, model):
+            schema_editor.add_index(model, self.index)
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self._use_plain_index(schema_editor, model):
+            schema_editor.remove_index(model, self.index)
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
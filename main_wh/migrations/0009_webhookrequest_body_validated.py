@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0008_webhookrequest_business_processed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='body_validated',
+            field=models.BooleanField(default=False, verbose_name='Данные проверены при приёме'),
+        ),
+    ]
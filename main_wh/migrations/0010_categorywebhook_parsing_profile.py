@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0009_webhookrequest_body_validated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='allowed_content_types',
+            field=models.CharField(blank=True, default='', max_length=254, verbose_name='Допустимые Content-Type (через запятую)'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='max_array_length',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Максимальная длина массива'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='max_body_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Максимальный размер данных (байт)'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='max_form_params',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Максимальное количество параметров формы'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='max_json_depth',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Максимальная вложенность JSON'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='max_keys',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Максимальное количество ключей объекта'),
+        ),
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='parsing_profile',
+            field=models.CharField(choices=[('standard', 'Стандартный'), ('fast', 'Быстрый (доверенный отправитель)'), ('strict', 'Строгий (недоверенный отправитель)')], default='standard', max_length=20, verbose_name='Профиль разбора'),
+        ),
+    ]
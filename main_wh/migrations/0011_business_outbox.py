@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0010_categorywebhook_parsing_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.BigIntegerField(verbose_name='Идентификатор уведомления')),
+                ('payload', models.JSONField(verbose_name='Данные для бизнес-сервиса')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток отправки')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка отправки')),
+            ],
+            options={
+                'verbose_name': 'Сообщение для бизнес-очереди',
+                'verbose_name_plural': 'Сообщения для бизнес-очереди',
+                'ordering': ['id'],
+            },
+        ),
+    ]
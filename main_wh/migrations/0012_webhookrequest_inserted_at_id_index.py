@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+from main_wh.migration_operations import AddIndexConcurrentlyUnlessPartitioned
+
+
+class Migration(migrations.Migration):
+    # Индекс создаётся без блокировки записи в таблицу (CREATE INDEX CONCURRENTLY вне транзакции),
+    # у секционированной таблицы - обычным CREATE INDEX (см. AddIndexConcurrentlyUnlessPartitioned)
+    atomic = False
+
+    dependencies = [
+        ('main_wh', '0011_business_outbox'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyUnlessPartitioned(
+            model_name='webhookrequest',
+            index=models.Index(fields=['inserted_at', 'id'], name='main_wh_web_inserte_102ba4_idx'),
+        ),
+    ]
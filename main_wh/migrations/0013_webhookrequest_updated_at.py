@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0012_webhookrequest_inserted_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now,
+                                       verbose_name='ДатаВремя изменения'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0013_webhookrequest_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='Файл архива')),
+                ('day', models.DateField(verbose_name='День добавления записей')),
+                ('first_id', models.BigIntegerField(verbose_name='Первый идентификатор')),
+                ('last_id', models.BigIntegerField(verbose_name='Последний идентификатор')),
+                ('row_count', models.PositiveIntegerField(verbose_name='Количество записей')),
+                ('size_bytes', models.BigIntegerField(verbose_name='Размер файла')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Контрольная сумма SHA-256')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Файл архива Уведомлений',
+                'verbose_name_plural': 'Файлы архива Уведомлений',
+                'ordering': ['day', 'first_id'],
+                'indexes': [models.Index(fields=['day'], name='main_wh_not_day_213ada_idx'), models.Index(fields=['first_id', 'last_id'], name='main_wh_not_first_i_402064_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:19
+
+import datetime
+from django.db import migrations, models
+
+from main_wh.migration_operations import AddIndexConcurrentlyUnlessPartitioned
+
+
+class Migration(migrations.Migration):
+    # Индекс создаётся без блокировки записи в таблицу (CREATE INDEX CONCURRENTLY вне транзакции),
+    # у секционированной таблицы - обычным CREATE INDEX (см. AddIndexConcurrentlyUnlessPartitioned)
+    atomic = False
+
+    dependencies = [
+        ('main_wh', '0014_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Повторных попыток обработки'),
+        ),
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='error_permanent',
+            field=models.BooleanField(default=False, verbose_name='Неисправимая ошибка'),
+        ),
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='retry_after',
+            field=models.DateTimeField(default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc),
+                                       verbose_name='Повторная обработка не ранее'),
+        ),
+        AddIndexConcurrentlyUnlessPartitioned(
+            model_name='webhookrequest',
+            index=models.Index(condition=models.Q(('error_permanent', False), ('status', 'error')), fields=['retry_after'],
+                               name='main_wh_webhook_retry_idx'),
+        ),
+    ]
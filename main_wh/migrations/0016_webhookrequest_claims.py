@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:21
+
+import datetime
+from django.db import migrations, models
+
+from main_wh.migration_operations import AddIndexConcurrentlyUnlessPartitioned
+
+
+class Migration(migrations.Migration):
+    # Индекс создаётся без блокировки записи в таблицу (CREATE INDEX CONCURRENTLY вне транзакции),
+    # у секционированной таблицы - обычным CREATE INDEX (см. AddIndexConcurrentlyUnlessPartitioned)
+    atomic = False
+
+    dependencies = [
+        ('main_wh', '0015_webhookrequest_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookrequest',
+            name='claimed_until',
+            field=models.DateTimeField(default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc),
+                                       verbose_name='Захвачено для обработки до'),
+        ),
+        migrations.AlterField(
+            model_name='webhookrequest',
+            name='status',
+            field=models.CharField(choices=[('new', 'Новый'), ('processing', 'В обработке'), ('error', 'Ошибка'),
+                                            ('complete', 'Завершено')],
+                                   default='new', max_length=20, verbose_name='Статус обработки'),
+        ),
+        AddIndexConcurrentlyUnlessPartitioned(
+            model_name='webhookrequest',
+            index=models.Index(condition=models.Q(('status__in', ['new', 'processing'])), fields=['id'],
+                               name='main_wh_webhook_pending_idx'),
+        ),
+    ]
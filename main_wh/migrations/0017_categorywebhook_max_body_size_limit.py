@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:35
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0016_webhookrequest_claims'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='categorywebhook',
+            name='max_body_size',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10000)], verbose_name='Максимальный размер данных (байт)'),
+        ),
+    ]
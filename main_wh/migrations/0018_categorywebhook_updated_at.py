@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_wh', '0017_categorywebhook_max_body_size_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorywebhook',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
-from django.core.validators import MaxLengthValidator, URLValidator
+from django.core.validators import MaxLengthValidator, MaxValueValidator, MinValueValidator, URLValidator
 from django.utils import timezone
 from datetime import datetime
 
+from main_wh.category_cache import category_cache
+from main_wh.parsing_profile import MAX_STORED_BODY_SIZE, PROFILE_CHOICES, PROFILE_STANDARD
+
 NULLABLE = {'null': True, 'blank': True}
 NULL_DATE = timezone.make_aware(datetime(1970, 1, 1, 0, 0, 0))
 
@@ -27,6 +30,24 @@ class CategoryWebhook(models.Model):
     # Дата создания
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
 
+    # Дата изменения (входит в версию ответов списка и карточки Уведомления с полями категории)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    # Профиль разбора уведомлений и переопределения его лимитов (пустое значение - значение профиля)
+    parsing_profile = models.CharField(max_length=20, choices=PROFILE_CHOICES, default=PROFILE_STANDARD,
+                                       verbose_name='Профиль разбора')
+    max_body_size = models.PositiveIntegerField(**NULLABLE,
+                                                validators=[MinValueValidator(1),
+                                                            MaxValueValidator(MAX_STORED_BODY_SIZE)],
+                                                verbose_name='Максимальный размер данных (байт)')
+    max_form_params = models.PositiveSmallIntegerField(**NULLABLE,
+                                                       verbose_name='Максимальное количество параметров формы')
+    max_json_depth = models.PositiveSmallIntegerField(**NULLABLE, verbose_name='Максимальная вложенность JSON')
+    max_keys = models.PositiveSmallIntegerField(**NULLABLE, verbose_name='Максимальное количество ключей объекта')
+    max_array_length = models.PositiveIntegerField(**NULLABLE, verbose_name='Максимальная длина массива')
+    allowed_content_types = models.CharField(max_length=254, default='', blank=True,
+                                             verbose_name='Допустимые Content-Type (через запятую)')
+
     class Meta:
         verbose_name = 'Категория Уведомления'
         verbose_name_plural = 'Категории Уведомлений'
@@ -44,11 +65,44 @@ class CategoryWebhook(models.Model):
         Получить активную категорию по внешнему идентификатору
         """
 
+        # Идентификатор длиннее поля заведомо не существует - не обращаемся ни к кэшу, ни к БД
+        if not external_id or len(external_id) > cls._meta.get_field('id_ext').max_length:
+            return None
+
+        category = category_cache.lookup(external_id)
+        if category is not category_cache.MISSING:
+            return category
+
         try:
-            return cls.objects.get(id_ext=external_id, is_active=True)
+            category = cls.objects.get(id_ext=external_id, is_active=True)
         except cls.DoesNotExist:
+            category = None
+
+        # Кэшируем и отрицательный результат
+        category_cache.store(external_id, category)
+        return category
+
+    @classmethod
+    async def aget_active_by_external_id(cls, external_id):
+        """
+        Асинхронный вариант get_active_by_external_id (для ASGI-представлений)
+        """
+
+        if not external_id or len(external_id) > cls._meta.get_field('id_ext').max_length:
             return None
 
+        category = category_cache.lookup(external_id)
+        if category is not category_cache.MISSING:
+            return category
+
+        try:
+            category = await cls.objects.aget(id_ext=external_id, is_active=True)
+        except cls.DoesNotExist:
+            category = None
+
+        category_cache.store(external_id, category)
+        return category
+
     @classmethod
     def is_valid_external_id(cls, external_id):
         """
@@ -88,6 +142,7 @@ class WebhookRequest(models.Model):
 
     STATUS_REQUEST = (
         (STATUS_NEW, 'Новый'),
+        (STATUS_PROCESSING, 'В обработке'),
         (STATUS_ERROR, 'Ошибка'),
         (STATUS_COMPLETE, 'Завершено'),
     )
@@ -101,6 +156,9 @@ class WebhookRequest(models.Model):
 
     # Основные реквизиты
     inserted_at = models.DateTimeField(auto_now_add=True, verbose_name='ДатаВремя добавления')
+    # Версия записи для ETag / Last-Modified: меняется при любом изменении
+    # (для update() и bulk_update выставляется явно)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='ДатаВремя изменения')
     request_method = models.CharField(max_length=10, default='POST', verbose_name='HTTP метод запроса')
     path = models.CharField(max_length=254, default='', verbose_name='Точка вызова')
     full_url = models.URLField(max_length=500, validators=[URLValidator()], default='',
@@ -114,6 +172,8 @@ class WebhookRequest(models.Model):
                                    verbose_name='Преобразованные данные')
     data = models.TextField(max_length=10000, validators=[MaxLengthValidator(10000)], default='',
                             verbose_name='Сырые данные')
+    # Признак того, что parsed_body разобран и проверен при приёме (воркер не разбирает data повторно)
+    body_validated = models.BooleanField(default=False, verbose_name='Данные проверены при приёме')
 
     # Статус обработки
     status = models.CharField(max_length=20, choices=STATUS_REQUEST, default=STATUS_NEW,
@@ -121,6 +181,14 @@ class WebhookRequest(models.Model):
     error_description = models.TextField(max_length=5000, validators=[MaxLengthValidator(5000)], default='',
                                          verbose_name='Текст ошибки')
     processed_at = models.DateTimeField(default=NULL_DATE, verbose_name='ДатаВремя обработки')
+    # Срок аренды захвата для обработки (статус 'processing'): после него Уведомление может захватить другой процесс
+    claimed_until = models.DateTimeField(default=NULL_DATE, verbose_name='Захвачено для обработки до')
+
+    # Повторная обработка ошибок (retry_failed_notifications)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Повторных попыток обработки')
+    retry_after = models.DateTimeField(default=NULL_DATE, verbose_name='Повторная обработка не ранее')
+    # Ошибка в самих данных (размер, невалидный JSON): повторно не обрабатывается
+    error_permanent = models.BooleanField(default=False, verbose_name='Неисправимая ошибка')
 
     # Связь с категорией
     category = models.ForeignKey(CategoryWebhook, on_delete=models.PROTECT, related_name='webhook_requests',
@@ -142,6 +210,14 @@ class WebhookRequest(models.Model):
             models.Index(fields=['status', 'inserted_at']),
             models.Index(fields=['processed_at']),
             models.Index(fields=['business_status', 'business_queued_at']),
+            # Постраничный вывод по курсору (inserted_at, id)
+            models.Index(fields=['inserted_at', 'id']),
+            # Захват ожидающих Уведомлений для обработки (main_wh.claims)
+            models.Index(fields=['id'], name='main_wh_webhook_pending_idx',
+                         condition=models.Q(status__in=['new', 'processing'])),
+            # Отбор ошибок для повторной обработки (только исправимые)
+            models.Index(fields=['retry_after'], name='main_wh_webhook_retry_idx',
+                         condition=models.Q(status='error', error_permanent=False)),
         ]
 
     def __str__(self):
@@ -151,4 +227,75 @@ class WebhookRequest(models.Model):
         # При изменении статуса на "завершено" или "ошибка" фиксируем время обработки
         if self.status in [self.STATUS_ERROR, self.STATUS_COMPLETE] and not self.processed_at:
             self.processed_at = timezone.now()
+
+        # При частичном сохранении версия записи тоже обновляется
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+
         super().save(*args, **kwargs)
+
+
+class BusinessOutbox(models.Model):
+    """
+    Сообщения для очереди бизнес-сервиса, ожидающие отправки в Redis.
+    Запись создаётся в той же транзакции, что и результат разбора уведомления,
+    и удаляется только после успешной отправки (см. main_wh.outbox).
+    """
+
+    # Без внешнего ключа: удаление старых уведомлений не должно зависеть от неотправленных сообщений
+    notification_id = models.BigIntegerField(verbose_name='Идентификатор уведомления')
+
+    payload = models.JSONField(verbose_name='Данные для бизнес-сервиса')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток отправки')
+
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка отправки')
+
+    class Meta:
+        verbose_name = 'Сообщение для бизнес-очереди'
+        verbose_name_plural = 'Сообщения для бизнес-очереди'
+        # Отправка в порядке создания (по первичному ключу)
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Сообщение для уведомления {self.notification_id}"
+
+
+class NotificationArchive(models.Model):
+    """
+    Манифест архива Уведомлений: один файл NDJSON (gzip) с записями одного дня добавления
+    и диапазоном их идентификаторов. По манифесту находятся файлы для восстановления
+    записи по id или записей за период (см. main_wh.archive).
+    """
+
+    # Путь относительно ARCHIVE_DIR
+    path = models.CharField(max_length=500, unique=True, verbose_name='Файл архива')
+
+    day = models.DateField(verbose_name='День добавления записей')
+
+    first_id = models.BigIntegerField(verbose_name='Первый идентификатор')
+
+    last_id = models.BigIntegerField(verbose_name='Последний идентификатор')
+
+    row_count = models.PositiveIntegerField(verbose_name='Количество записей')
+
+    size_bytes = models.BigIntegerField(verbose_name='Размер файла')
+
+    sha256 = models.CharField(max_length=64, verbose_name='Контрольная сумма SHA-256')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')
+
+    class Meta:
+        verbose_name = 'Файл архива Уведомлений'
+        verbose_name_plural = 'Файлы архива Уведомлений'
+        ordering = ['day', 'first_id']
+        indexes = [
+            models.Index(fields=['day']),
+            models.Index(fields=['first_id', 'last_id']),
+        ]
+
+    def __str__(self):
+        return f"Архив {self.path} ({self.row_count} записей)"
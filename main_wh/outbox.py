@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from main_wh.conf import app_settings
+from main_wh.models import BusinessOutbox, WebhookRequest
+from main_wh.redis_client import redis_queue
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def build_business_data(notification):
+    """
+    Данные уведомления для бизнес-сервиса
+    """
+    return {
+        'id': notification.id,
+        'category': notification.category.id_ext if notification.category else None,
+        'parsed_body': notification.parsed_body,
+        'raw_data': notification.data[:1000],  # Первые 1000 символов
+        'created_at': notification.inserted_at.isoformat(),
+        'content_type': notification.content_type,
+        'source_ip': notification.ip_adr
+    }
+
+
+def add_to_outbox(notifications):
+    """
+    Запись сообщений для бизнес-сервиса в outbox.
+    Вызывается внутри транзакции, сохраняющей результат разбора: сообщение появляется
+    тогда и только тогда, когда зафиксирован статус 'complete'.
+
+    Returns:
+        int: Количество записанных сообщений
+    """
+
+    rows = [BusinessOutbox(notification_id=notification.id, payload=build_business_data(notification))
+            for notification in notifications]
+    if rows:
+        BusinessOutbox.objects.bulk_create(rows)
+    return len(rows)
+
+
+def relay_outbox(batch_size=None):
+    """
+    Отправка одного пакета сообщений из outbox в очередь бизнес-сервиса (один pipeline Redis).
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько ретрансляторов
+    работают параллельно, не получая одни и те же сообщения.
+    Строка удаляется в той же транзакции только после успешной отправки: при сбое процесса
+    между отправкой и фиксацией сообщение будет отправлено повторно (доставка "хотя бы один раз").
+
+    Returns:
+        int: Количество отправленных сообщений
+    """
+
+    batch_size = batch_size or app_settings.BUSINESS_OUTBOX_BATCH_SIZE
+
+    with transaction.atomic():
+        rows = list(BusinessOutbox.objects.select_for_update(skip_locked=True)
+                    .only('id', 'notification_id', 'payload').order_by('id')[:batch_size])
+        if not rows:
+            return 0
+
+        try:
+            errors = redis_queue.push_many([row.payload for row in rows])
+        except Exception as err:
+            # Redis недоступен: сообщения остаются в outbox до следующей попытки
+            logger.error(f"Ошибка отправки сообщений из outbox в Redis: {err}")
+            BusinessOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                attempts=F('attempts') + 1, last_error=str(err)[:1000])
+            return 0
+
+        sent = [row for row, error in zip(rows, errors) if error is None]
+        failed = [(row, error) for row, error in zip(rows, errors) if error is not None]
+
+        if sent:
+            now = timezone.now()
+            BusinessOutbox.objects.filter(id__in=[row.id for row in sent]).delete()
+            WebhookRequest.objects.filter(id__in={row.notification_id for row in sent}).update(
+                business_queued_at=now, updated_at=now)
+
+        for row, error in failed:
+            logger.error(f"Ошибка отправки в Redis очередь, уведомление {row.notification_id}: {error}")
+            BusinessOutbox.objects.filter(id=row.id).update(attempts=F('attempts') + 1, last_error=error[:1000])
+
+    logger.info(f"Из outbox в очередь {redis_queue.queue_name} отправлено сообщений: {len(sent)}")
+    return len(sent)
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    Отправка сообщений из outbox пакетами, пока очередной пакет не окажется неполным.
+
+    Returns:
+        int: Количество отправленных сообщений
+    """
+
+    batch_size = batch_size or app_settings.BUSINESS_OUTBOX_BATCH_SIZE
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        sent = relay_outbox(batch_size)
+        total += sent
+        batches += 1
+        if sent < batch_size:
+            break
+    return total
+
+
+def relay_after_processing():
+    """
+    Немедленная отправка после фиксации результатов разбора (в воркере Celery),
+    чтобы сообщение не ждало периодической задачи relay_business_outbox.
+    Ошибка не прерывает обработку: сообщения уже сохранены в outbox.
+    """
+
+    if not app_settings.BUSINESS_OUTBOX_RELAY_INLINE:
+        return 0
+
+    try:
+        return relay_outbox()
+    except Exception as err:
+        logger.error(f"Ошибка отправки сообщений из outbox: {err}")
+        return 0
+
+
+def get_outbox_stats():
+    """
+    Количество неотправленных сообщений и возраст самого старого из них
+    """
+
+    oldest = BusinessOutbox.objects.order_by('id').values_list('created_at', flat=True).first()
+    return {
+        'pending_messages': BusinessOutbox.objects.count(),
+        'oldest_age_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
@@ -0,0 +1,221 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Способы подсчёта общего количества записей в режиме курсора
+COUNT_NONE = 'none'  # Без подсчёта (по умолчанию)
+COUNT_ESTIMATED = 'estimated'  # Оценка по статистике PostgreSQL
+COUNT_EXACT = 'exact'  # SELECT COUNT(*) по отфильтрованному набору
+
+COUNT_CHOICES = (COUNT_NONE, COUNT_ESTIMATED, COUNT_EXACT)
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества записей без их подсчёта: для всей таблицы - pg_class.reltuples,
+    для отфильтрованного набора - оценка планировщика (EXPLAIN).
+    Точность зависит от свежести статистики (ANALYZE / autovacuum).
+
+    Returns:
+        int | None: Оценка или None, если БД не PostgreSQL или статистики ещё нет
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # До первого ANALYZE reltuples равен -1
+            return int(row[0]) if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class WebhookCursorPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (inserted_at, id) без OFFSET и без обязательного COUNT(*):
+    каждая страница - диапазонное чтение по индексу от последней записи предыдущей страницы,
+    поэтому стоимость страницы не зависит от того, насколько далеко от начала она находится.
+    Курсор - непрозрачная строка из ссылок next/previous.
+    """
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_field = 'inserted_at'
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.cursor_query_param in request.query_params or request.query_params.get('pagination') == 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_descending(self, request):
+        """
+        Направление обхода: по умолчанию от новых к старым, как в постраничном режиме.
+        """
+
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if not ordering or ordering == f'-{self.ordering_field}':
+            return True
+        if ordering == self.ordering_field:
+            return False
+        raise ValidationError({api_settings.ORDERING_PARAM: f'В режиме курсора доступна сортировка только '
+                                                            f'по {self.ordering_field}'})
+
+    def encode_cursor(self, row, reverse):
+        # row - объект модели или именованный кортеж values_list
+        position = [getattr(row, self.ordering_field).isoformat(), row.id, int(reverse)]
+        return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return datetime.fromisoformat(value), int(pk), bool(reverse)
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound('Недопустимый курсор')
+
+    def position_filter(self, value, pk, descending):
+        # Условие (inserted_at, id) < (value, pk) в виде, для которого PostgreSQL
+        # строит диапазонное чтение по индексу (inserted_at, id)
+        if descending:
+            return Q(**{f'{self.ordering_field}__lte': value}) & (
+                Q(**{f'{self.ordering_field}__lt': value}) | Q(**{self.ordering_field: value, 'pk__lt': pk}))
+        return Q(**{f'{self.ordering_field}__gte': value}) & (
+            Q(**{f'{self.ordering_field}__gt': value}) | Q(**{self.ordering_field: value, 'pk__gt': pk}))
+
+    def get_count(self, queryset, request):
+        """
+        Returns:
+            tuple: (количество или None, признак оценки)
+        """
+
+        mode = request.query_params.get(self.count_query_param, COUNT_NONE)
+        if mode not in COUNT_CHOICES:
+            raise ValidationError({self.count_query_param: f"Допустимые значения: {', '.join(COUNT_CHOICES)}"})
+
+        if mode == COUNT_EXACT:
+            return queryset.count(), False
+        if mode == COUNT_ESTIMATED:
+            return estimate_count(queryset), True
+        return None, False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count, self.count_estimated = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor[2] if cursor else False
+        # Для ссылки previous записи выбираются в обратном направлении и затем переворачиваются
+        descending = self.get_descending(request) != reverse
+
+        sign = '-' if descending else ''
+        queryset = queryset.order_by(f'{sign}{self.ordering_field}', f'{sign}pk')
+        if cursor:
+            queryset = queryset.filter(self.position_filter(cursor[0], cursor[1], descending))
+
+        # Одна лишняя запись показывает, есть ли следующая страница
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,  # None, если подсчёт не запрошен (параметр count)
+            'count_estimated': self.count_estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            'service': 'webhook_service',
+            'version': '1.0',
+            'page_size': self.page_size,
+        })
+
+
+class WebhookPagination(PageNumberPagination):
+    """
+    Модифицированная нумерация страниц с метаданными сервиса.
+    С параметром cursor (или pagination=cursor) - постраничный вывод по ключу (WebhookCursorPagination).
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    cursor_pagination_class = WebhookCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_pagination_class.is_requested(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        return Response({
+            'count': self.page.paginator.count,  # Общее количество (не только на странице!)
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            'service': 'webhook_service',
+            'version': '1.0',
+            'page': self.page.number,
+            'total_pages': self.page.paginator.num_pages,
+            'page_size': self.get_page_size(self.request)
+        })
@@ -0,0 +1,215 @@
+import threading
+from dataclasses import dataclass
+
+from main_wh.category_cache import category_cache
+from main_wh.conf import app_settings
+from main_wh.json_guard import (DEFAULT_MAX_ARRAY_LENGTH, DEFAULT_MAX_KEYS, DEFAULT_MAX_NODES, TEXT_SCAN_MIN_SIZE,
+                                check_json_structure, scan_json_text)
+
+# Профили разбора уведомлений
+PROFILE_STANDARD = 'standard'
+PROFILE_FAST = 'fast'
+PROFILE_STRICT = 'strict'
+
+PROFILE_CHOICES = (
+    (PROFILE_STANDARD, 'Стандартный'),
+    (PROFILE_FAST, 'Быстрый (доверенный отправитель)'),
+    (PROFILE_STRICT, 'Строгий (недоверенный отправитель)'),
+)
+
+# Предел размера тела для всех профилей и переопределений категорий:
+# длина поля WebhookRequest.data (MaxLengthValidator(10000))
+MAX_STORED_BODY_SIZE = 10000
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_FORM = 'application/x-www-form-urlencoded'
+
+# Значения профилей по умолчанию. Размер тела стандартного и быстрого профилей - WEBHOOK_MAX_BODY_SIZE
+PROFILE_DEFAULTS = {
+    PROFILE_STANDARD: {
+        'max_body_size': None,
+        'allowed_content_types': (CONTENT_TYPE_JSON, CONTENT_TYPE_FORM),
+        'max_form_params': 50,
+        'max_form_json_size': 5000,
+        'max_form_json_depth': 5,
+        'max_json_depth': 10,
+        'max_keys': DEFAULT_MAX_KEYS,
+        'max_array_length': DEFAULT_MAX_ARRAY_LENGTH,
+        'max_nodes': DEFAULT_MAX_NODES,
+        'validate_structure': True,
+        'text_scan_min_size': TEXT_SCAN_MIN_SIZE,
+    },
+    # Структура JSON не проверяется: разбор при приёме и никакой повторной работы в воркере
+    PROFILE_FAST: {
+        'max_body_size': None,
+        'allowed_content_types': (CONTENT_TYPE_JSON, CONTENT_TYPE_FORM),
+        'max_form_params': 50,
+        'max_form_json_size': 5000,
+        'max_form_json_depth': 5,
+        'max_json_depth': 10,
+        'max_keys': DEFAULT_MAX_KEYS,
+        'max_array_length': DEFAULT_MAX_ARRAY_LENGTH,
+        'max_nodes': DEFAULT_MAX_NODES,
+        'validate_structure': False,
+        'text_scan_min_size': None,
+    },
+    # Меньшие лимиты, проверка структуры по тексту до разбора для любого размера
+    PROFILE_STRICT: {
+        'max_body_size': 4096,
+        'allowed_content_types': (CONTENT_TYPE_JSON, CONTENT_TYPE_FORM),
+        'max_form_params': 20,
+        'max_form_json_size': 2000,
+        'max_form_json_depth': 3,
+        'max_json_depth': 5,
+        'max_keys': 50,
+        'max_array_length': 100,
+        'max_nodes': 2000,
+        'validate_structure': True,
+        'text_scan_min_size': 0,
+    },
+}
+
+# Поля CategoryWebhook, переопределяющие значения профиля (пустое значение - значение профиля)
+CATEGORY_OVERRIDE_FIELDS = ('max_body_size', 'max_form_params', 'max_json_depth', 'max_keys', 'max_array_length')
+
+
+@dataclass(frozen=True)
+class ParsingConfig:
+    """
+    Неизменяемые параметры разбора уведомлений категории.
+    Используются и при приёме (представления, middleware), и при обработке в воркере Celery.
+    """
+
+    profile: str
+    max_body_size: int
+    allowed_content_types: frozenset
+    max_form_params: int
+    max_form_json_size: int
+    max_form_json_depth: int
+    max_json_depth: int
+    max_keys: int
+    max_array_length: int
+    max_nodes: int
+    validate_structure: bool
+    # Размер тела, начиная с которого JSON проверяется по тексту до разбора (None - не проверяется)
+    text_scan_min_size: int | None
+
+    @classmethod
+    def compile(cls, category=None):
+        """
+        Сборка параметров из профиля категории и её переопределений.
+        """
+
+        profile = getattr(category, 'parsing_profile', None) or PROFILE_STANDARD
+        values = dict(PROFILE_DEFAULTS.get(profile, PROFILE_DEFAULTS[PROFILE_STANDARD]))
+
+        if values['max_body_size'] is None:
+            values['max_body_size'] = app_settings.WEBHOOK_MAX_BODY_SIZE
+
+        if category is not None:
+            for field_name in CATEGORY_OVERRIDE_FIELDS:
+                value = getattr(category, field_name, None)
+                if value is not None:
+                    values[field_name] = value
+
+            content_types = [content_type.strip().lower()
+                             for content_type in (category.allowed_content_types or '').split(',')
+                             if content_type.strip()]
+            if content_types:
+                values['allowed_content_types'] = content_types
+
+        values['max_body_size'] = min(values['max_body_size'], MAX_STORED_BODY_SIZE)
+        values['allowed_content_types'] = frozenset(values['allowed_content_types'])
+        return cls(profile=profile, **values)
+
+    def allows_content_type(self, media_type):
+        return media_type in self.allowed_content_types
+
+    def check_structure(self, data, max_depth=None):
+        """
+        Проверка разобранного JSON по лимитам профиля.
+
+        Returns:
+            str | None: Описание превышенного ограничения или None, если структура допустима
+        """
+        return check_json_structure(data, max_depth=self.max_json_depth if max_depth is None else max_depth,
+                                    max_keys=self.max_keys, max_array_length=self.max_array_length,
+                                    max_nodes=self.max_nodes)
+
+    def scan_text(self, text):
+        """
+        Проверка JSON по тексту до разбора (для достаточно больших документов).
+
+        Returns:
+            str | None: Описание превышенного ограничения или None
+        """
+        if self.text_scan_min_size is None or len(text) < self.text_scan_min_size:
+            return None
+        return self.check_text(text)
+
+    def check_text(self, text):
+        """
+        Проверка JSON по тексту по лимитам профиля (независимо от размера документа).
+
+        Returns:
+            str | None: Описание превышенного ограничения или None
+        """
+        return scan_json_text(text, max_depth=self.max_json_depth, max_keys=self.max_keys,
+                              max_array_length=self.max_array_length, max_nodes=self.max_nodes)
+
+
+class ParsingConfigCache:
+    """
+    Собранные параметры разбора по идентификатору категории (в памяти процесса).
+    Сбрасывается вместе с кэшем категорий (сигналы, действия в админке, рассылка через Redis).
+    """
+
+    def __init__(self):
+        self._configs = {}
+        self._lock = threading.Lock()
+        self._default = None
+        category_cache.add_clear_listener(self.clear)
+
+    def clear(self):
+        with self._lock:
+            self._configs.clear()
+            self._default = None
+
+    def get(self, category_id, category=None):
+        """
+        Параметры разбора категории. Категория загружается из БД, только если её нет в кэше
+        и она не передана (воркер знает лишь category_id уведомления).
+        """
+
+        if category_id is None:
+            if self._default is None:
+                self._default = ParsingConfig.compile()
+            return self._default
+
+        # Без подписки на сброс изменения профиля в админке не дошли бы до процесса
+        category_cache.ensure_subscriber()
+
+        config = self._configs.get(category_id)
+        if config is not None:
+            return config
+
+        if category is None:
+            # Импорт здесь, чтобы избежать циклических импортов
+            from main_wh.models import CategoryWebhook
+            category = CategoryWebhook.objects.filter(pk=category_id).first()
+
+        config = ParsingConfig.compile(category)
+        with self._lock:
+            self._configs[category_id] = config
+        return config
+
+
+# Глобальный кэш параметров разбора процесса
+parsing_configs = ParsingConfigCache()
+
+
+def get_parsing_config(category_id=None, category=None):
+    """
+    Параметры разбора для категории (стандартные, если категория не указана).
+    """
+    return parsing_configs.get(category_id, category)
@@ -0,0 +1,158 @@
+from redis.exceptions import ResponseError
+
+from main_wh.conf import app_settings
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Поле записи потока, в котором хранится сообщение
+STREAM_FIELD = 'message'
+
+
+class ListQueueBackend:
+    """
+    Очередь бизнес-сервиса на списке Redis (LPUSH / BRPOP на стороне потребителя).
+    """
+
+    name = 'list'
+
+    def __init__(self, queue_name):
+        self.queue_name = queue_name
+
+    def prepare(self, redis_client):
+        pass
+
+    def push(self, redis_client, message):
+        """
+        Добавление сообщения (redis_client может быть и pipeline).
+
+        Returns:
+            int: Длина очереди после добавления
+        """
+        return redis_client.lpush(self.queue_name, message)
+
+    def stats(self, redis_client):
+        return {'pending_messages': redis_client.llen(self.queue_name)}
+
+
+class StreamQueueBackend:
+    """
+    Очередь бизнес-сервиса на потоке Redis (Streams).
+    Сообщение остаётся в списке ожидающих подтверждения группы (PEL), пока потребитель
+    не выполнит XACK, поэтому сбой потребителя не приводит к потере сообщения:
+    его забирает другой потребитель группы (XAUTOCLAIM).
+    Длина потока ограничивается приблизительно (MAXLEN ~), чтобы обрезка не замедляла XADD.
+    """
+
+    name = 'stream'
+
+    def __init__(self, stream_name, group_name, maxlen):
+        self.stream_name = stream_name
+        self.group_name = group_name
+        self.maxlen = maxlen
+        self._group_ready = False
+
+    def prepare(self, redis_client):
+        """
+        Создание группы потребителей (вместе с потоком), если её ещё нет.
+        Группа создаётся до первой записи, чтобы ей достались все сообщения.
+        """
+        if self._group_ready:
+            return
+
+        try:
+            redis_client.xgroup_create(self.stream_name, self.group_name, id='0', mkstream=True)
+        except ResponseError as err:
+            # Группа уже создана другим процессом
+            if 'BUSYGROUP' not in str(err):
+                raise
+        self._group_ready = True
+
+    def push(self, redis_client, message):
+        """
+        Добавление сообщения (redis_client может быть и pipeline).
+
+        Returns:
+            str: Идентификатор записи в потоке
+        """
+        return redis_client.xadd(self.stream_name, {STREAM_FIELD: message}, maxlen=self.maxlen, approximate=True)
+
+    def stats(self, redis_client):
+        """
+        Длина потока и по каждой группе: отставание (lag), ожидающие подтверждения (pending)
+        и ожидающие подтверждения по каждому потребителю.
+        """
+
+        self.prepare(redis_client)
+
+        stream_info = redis_client.xinfo_stream(self.stream_name)
+        groups = []
+        for group in redis_client.xinfo_groups(self.stream_name):
+            consumers = redis_client.xinfo_consumers(self.stream_name, group['name'])
+            groups.append({
+                'name': group['name'],
+                # Сообщения, ещё не выданные ни одному потребителю группы (Redis >= 7.0)
+                'lag': group.get('lag'),
+                'pending': group['pending'],
+                'last_delivered_id': group['last-delivered-id'],
+                'consumers': [
+                    {'name': consumer['name'], 'pending': consumer['pending'], 'idle_ms': consumer['idle']}
+                    for consumer in consumers
+                ],
+            })
+
+        return {
+            'stream_length': stream_info['length'],
+            'last_generated_id': stream_info['last-generated-id'],
+            # Для совместимости со статистикой очереди-списка: сколько сообщений ещё не выдано группе
+            'pending_messages': groups[0]['lag'] if groups else stream_info['length'],
+            'groups': groups,
+        }
+
+    # Методы для потребителей очереди (бизнес-сервисов)
+
+    def read(self, redis_client, consumer_name, count=10, block_ms=5000):
+        """
+        Получение новых сообщений потребителем группы.
+
+        Returns:
+            list: Пары (идентификатор записи, сообщение)
+        """
+        self.prepare(redis_client)
+        response = redis_client.xreadgroup(self.group_name, consumer_name, {self.stream_name: '>'},
+                                           count=count, block=block_ms)
+        return [(entry_id, fields.get(STREAM_FIELD)) for _, entries in response or [] for entry_id, fields in entries]
+
+    def ack(self, redis_client, entry_ids):
+        """
+        Подтверждение обработки сообщений (удаляет их из списка ожидающих группы).
+        """
+        if not entry_ids:
+            return 0
+        return redis_client.xack(self.stream_name, self.group_name, *entry_ids)
+
+    def reclaim(self, redis_client, consumer_name, min_idle_ms=60000, count=100):
+        """
+        Передача потребителю сообщений, которые другие потребители получили,
+        но не подтвердили дольше min_idle_ms (например, из-за падения).
+
+        Returns:
+            list: Пары (идентификатор записи, сообщение)
+        """
+        self.prepare(redis_client)
+        response = redis_client.xautoclaim(self.stream_name, self.group_name, consumer_name,
+                                           min_idle_time=min_idle_ms, start_id='0-0', count=count)
+        # Ответ: следующий идентификатор для продолжения, записи и (Redis >= 7.0) удалённые идентификаторы
+        entries = response[1]
+        return [(entry_id, fields.get(STREAM_FIELD)) for entry_id, fields in entries if fields]
+
+
+def get_queue_backend(queue_name):
+    """
+    Бэкенд очереди бизнес-сервиса, выбранный в настройке REDIS_QUEUE_BACKEND.
+    """
+
+    if app_settings.REDIS_QUEUE_BACKEND == StreamQueueBackend.name:
+        return StreamQueueBackend(queue_name, app_settings.REDIS_QUEUE_STREAM_GROUP,
+                                  app_settings.REDIS_QUEUE_STREAM_MAXLEN)
+    return ListQueueBackend(queue_name)
@@ -0,0 +1,261 @@
+import json
+import zlib
+from functools import lru_cache
+from datetime import datetime, timezone
+
+from django.core.exceptions import ImproperlyConfigured
+
+from main_wh.conf import app_settings
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Форматы сообщений очереди бизнес-сервиса
+FORMAT_LEGACY = 'v1'  # JSON-объект с вложенным metadata (прежний формат)
+FORMAT_JSON = 'json'  # Версия 2: компактный JSON-массив значений
+FORMAT_MSGPACK = 'msgpack'  # Версия 2: тот же массив в msgpack (пакет msgpack)
+
+FORMAT_CHOICES = (FORMAT_LEGACY, FORMAT_JSON, FORMAT_MSGPACK)
+
+# Сжатие сообщений версии 2 (zstd - пакет zstandard, lz4 - пакет lz4)
+COMPRESSION_NONE = ''
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_LZ4 = 'lz4'
+
+COMPRESSION_CHOICES = (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD, COMPRESSION_LZ4)
+
+MESSAGE_SOURCE = 'webhook_service'
+LEGACY_VERSION = '1.0'
+
+# Версия 2: заголовок кадра - байт версии, байт формата и байт сжатия, затем данные.
+# Значения полей идут массивом в порядке MESSAGE_FIELDS, постоянные значения (источник)
+# вынесены в общий заголовок очереди (ключ <очередь>:format)
+FRAME_VERSION = 2
+MESSAGE_FIELDS = ('id', 'category', 'created_at', 'timestamp', 'parsed_body')
+
+_FORMAT_MARKS = {FORMAT_JSON: b'J', FORMAT_MSGPACK: b'M'}
+_COMPRESSION_MARKS = {COMPRESSION_NONE: b'N', COMPRESSION_ZLIB: b'Z', COMPRESSION_ZSTD: b'S', COMPRESSION_LZ4: b'L'}
+
+
+def format_key(queue_name):
+    # Общий заголовок очереди: текущая версия, формат, сжатие и порядок полей
+    return f'{queue_name}:format'
+
+
+def accept_key(queue_name):
+    # Максимальная версия сообщений, которую понимают все потребители очереди (выставляют потребители)
+    return f'{queue_name}:format:accept'
+
+
+@lru_cache(maxsize=None)
+def _load_serializer(message_format):
+    """
+    Функции (dumps, loads) для формата версии 2 (загружаются один раз на процесс).
+    """
+
+    if message_format == FORMAT_JSON:
+        def dumps(values):
+            return json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return dumps, json.loads
+
+    if message_format == FORMAT_MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise ImproperlyConfigured('Для формата сообщений msgpack установите пакет msgpack')
+        return msgpack.packb, msgpack.unpackb
+
+    raise ImproperlyConfigured(f'Неизвестный формат сообщений очереди: {message_format}')
+
+
+@lru_cache(maxsize=None)
+def _load_compressor(compression):
+    """
+    Функции (compress, decompress) для способа сжатия (загружаются один раз на процесс).
+    """
+
+    if compression == COMPRESSION_NONE:
+        return None, None
+
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress, zlib.decompress
+
+    if compression == COMPRESSION_ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImproperlyConfigured('Для сжатия zstd установите пакет zstandard')
+        # Функции модуля, а не общие объекты ZstdCompressor: те нельзя использовать из нескольких потоков
+        return zstandard.compress, zstandard.decompress
+
+    if compression == COMPRESSION_LZ4:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise ImproperlyConfigured('Для сжатия lz4 установите пакет lz4')
+        return lz4.frame.compress, lz4.frame.decompress
+
+    raise ImproperlyConfigured(f'Неизвестный способ сжатия сообщений очереди: {compression}')
+
+
+def build_legacy_message(webhook_data):
+    """
+    Сообщение версии 1 (JSON-строка с вложенным metadata).
+    """
+
+    # Формирование структуры сообщения для отправки в очередь
+    message = {
+        # Идентификатор Уведомления из полученных данных
+        'id': webhook_data.get('id'),
+        'category': webhook_data.get('category'),
+        'parsed_body': webhook_data.get('parsed_body', {}),
+        'created_at': webhook_data.get('created_at'),
+        'metadata': {
+            # Источник сообщения
+            'source': MESSAGE_SOURCE,
+            # Текущее время в UTC в ISO формате
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'version': LEGACY_VERSION
+        }
+    }
+
+    # Преобразование словаря в JSON-строку с сохранением кириллицы (ensure_ascii=False)
+    return json.dumps(message, ensure_ascii=False)
+
+
+class MessageCodec:
+    """
+    Кодирование сообщений очереди бизнес-сервиса в выбранном формате.
+    Сообщения версии 2 сжимаются, только если они не меньше compress_min_size байт:
+    короткие сообщения сжатие почти не уменьшает.
+    """
+
+    def __init__(self, message_format=FORMAT_LEGACY, compression=COMPRESSION_NONE, compress_min_size=1024):
+        self.message_format = message_format
+        self.compression = compression if message_format != FORMAT_LEGACY else COMPRESSION_NONE
+        self.compress_min_size = compress_min_size
+
+        if message_format != FORMAT_LEGACY:
+            self._dumps, _ = _load_serializer(message_format)
+            self._compress, _ = _load_compressor(self.compression)
+            self._prefix = bytes([FRAME_VERSION]) + _FORMAT_MARKS[message_format]
+            self._plain_mark = _COMPRESSION_MARKS[COMPRESSION_NONE]
+            self._compressed_mark = _COMPRESSION_MARKS[self.compression]
+
+    @property
+    def version(self):
+        return 1 if self.message_format == FORMAT_LEGACY else FRAME_VERSION
+
+    def header(self):
+        """
+        Общий заголовок очереди для потребителей.
+        """
+        return {
+            'version': self.version,
+            'format': self.message_format,
+            'compression': self.compression,
+            'compress_min_size': self.compress_min_size,
+            'fields': ','.join(MESSAGE_FIELDS),
+            'source': MESSAGE_SOURCE,
+        }
+
+    def encode(self, webhook_data):
+        """
+        Returns:
+            str | bytes: Сообщение для записи в Redis
+        """
+
+        if self.message_format == FORMAT_LEGACY:
+            return build_legacy_message(webhook_data)
+
+        # Время отправки - в миллисекундах от начала эпохи (короче строки ISO)
+        values = [
+            webhook_data.get('id'),
+            webhook_data.get('category'),
+            webhook_data.get('created_at'),
+            int(datetime.now(timezone.utc).timestamp() * 1000),
+            webhook_data.get('parsed_body', {}),
+        ]
+        body = self._dumps(values)
+
+        if self._compress is not None and len(body) >= self.compress_min_size:
+            return self._prefix + self._compressed_mark + self._compress(body)
+        return self._prefix + self._plain_mark + body
+
+
+def decode_message(message):
+    """
+    Декодирование сообщения любой версии (для потребителей очереди).
+    Сообщение версии 2 приводится к виду версии 1, чтобы потребитель обрабатывал их одинаково.
+    Сообщения в msgpack и сжатые читаются клиентом Redis без decode_responses.
+
+    Returns:
+        dict: Сообщение в виде версии 1
+    """
+
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+
+    if not message or message[0] != FRAME_VERSION:
+        return json.loads(message)
+
+    format_mark = message[1:2]
+    compression_mark = message[2:3]
+    message_format = next(name for name, mark in _FORMAT_MARKS.items() if mark == format_mark)
+    compression = next(name for name, mark in _COMPRESSION_MARKS.items() if mark == compression_mark)
+
+    _, loads = _load_serializer(message_format)
+    _, decompress = _load_compressor(compression)
+
+    body = message[3:]
+    if decompress is not None:
+        body = decompress(body)
+
+    values = dict(zip(MESSAGE_FIELDS, loads(body)))
+    return {
+        'id': values['id'],
+        'category': values['category'],
+        'parsed_body': values['parsed_body'],
+        'created_at': values['created_at'],
+        'metadata': {
+            'source': MESSAGE_SOURCE,
+            'timestamp': datetime.fromtimestamp(values['timestamp'] / 1000, timezone.utc).isoformat(),
+            'version': f'{FRAME_VERSION}.0',
+        },
+    }
+
+
+def get_configured_codec():
+    """
+    Кодировщик по настройкам REDIS_QUEUE_MESSAGE_FORMAT и REDIS_QUEUE_COMPRESSION.
+    """
+    return MessageCodec(app_settings.REDIS_QUEUE_MESSAGE_FORMAT, app_settings.REDIS_QUEUE_COMPRESSION,
+                        app_settings.REDIS_QUEUE_COMPRESS_MIN_SIZE)
+
+
+def negotiate_codec(redis_client, queue_name):
+    """
+    Выбор формата с учётом потребителей: версия 2 используется, только если потребители
+    подтвердили её поддержку (ключ <очередь>:format:accept), иначе сообщения пишутся в версии 1.
+    Выбранный формат публикуется в общем заголовке очереди.
+    """
+
+    codec = get_configured_codec()
+
+    if codec.version > 1:
+        accepted = redis_client.get(accept_key(queue_name))
+        if int(accepted or 1) < codec.version:
+            logger.warning(f"Потребители очереди {queue_name} не подтвердили поддержку сообщений "
+                           f"версии {codec.version}, используется версия 1")
+            codec = MessageCodec(FORMAT_LEGACY)
+
+    redis_client.hset(format_key(queue_name), mapping=codec.header())
+    return codec
+
+
+def accept_message_version(redis_client, queue_name, version=FRAME_VERSION):
+    """
+    Подтверждение потребителем поддержки версии сообщений (вызывается после обновления всех потребителей).
+    """
+    redis_client.set(accept_key(queue_name), version)
@@ -1,64 +1,132 @@
-from json import dumps as json_dumps
-from redis import from_url as redis_from_url
-from django.conf import settings
-from datetime import datetime, timezone
+import threading
+import time
+from redis import BlockingConnectionPool, Redis
 
 from main_wh.conf import app_settings
+from main_wh.queue_backends import get_queue_backend
+from main_wh.queue_codecs import build_legacy_message, format_key, negotiate_codec
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Период (в секундах) перепроверки формата сообщений, подтверждённого потребителями
+CODEC_CHECK_INTERVAL = 60
+
 
 class RedisQueue:
     """Безопасный клиент для работы с Redis очередями"""
 
     def __init__(self):
-        # Инициализация переменной для хранения подключения к Redis
-        # None означает, что подключение еще не установлено
+        # Инициализация переменных для хранения пула соединений и клиента Redis
+        # None означает, что пул еще не создан
+        self.connection_pool = None
         self.redis_client = None
+        # Блокировка создания пула (задачи Celery могут выполняться в потоках или green-потоках)
+        self._lock = threading.Lock()
 
         # Получение имени очереди из настроек Django
         # getattr получает значение REDIS_QUEUE_NAME из settings,
         # если его нет, используется значение по умолчанию 'webhook_queue'
         self.queue_name = app_settings.REDIS_QUEUE_NAME
 
+        # Способ хранения очереди (список или поток Redis), см. REDIS_QUEUE_BACKEND
+        self.backend = get_queue_backend(self.queue_name)
+
+        # Кодировщик сообщений (выбирается при первой отправке, см. get_codec)
+        self._codec = None
+        self._codec_checked_at = 0.0
+
     def _get_connection(self):
         """
-        Приватный метод для установления соединения с Redis.
-        Использует ленивую инициализацию - соединение создается только при первом вызове.
+        Приватный метод для получения клиента Redis поверх пула соединений.
+        Использует ленивую инициализацию - пул создается только при первом вызове.
+        Клиент можно использовать из нескольких потоков одновременно: каждая команда
+        берёт соединение из пула и возвращает его. После fork пул пересоздаёт соединения сам.
         """
 
-        # Проверка, было ли уже установлено соединение
+        # Проверка, был ли уже создан пул
         if self.redis_client is None:
-            # Если соединения нет, пытаемся установить
-            try:
-                # Получение URL для подключения к Redis из настроек Django
-                redis_url = app_settings.REDIS_QUEUE_URL
-
-                # Создание клиента Redis из URL с дополнительными параметрами
-                self.redis_client = redis_from_url(
-                    redis_url,
-                    # Автоматически декодировать ответы из bytes в строки
-                    decode_responses=True,
-                    # Таймаут на операции с сокетом (5 секунд)
-                    socket_timeout=5,
-                    # Таймаут на установку соединения (5 секунд)
-                    socket_connect_timeout=5,
-                    # Повторять попытку при таймауте
-                    retry_on_timeout=True
-                )
-                # Отправка тестовой команды PING для проверки работоспособности соединения
-                # Если Redis недоступен, будет выброшено исключение
-                self.redis_client.ping()
-
-            except Exception as err:
-                logger.error(f"Ошибка подключения к Redis: {err}")
-                # Сброс клиента в None, чтобы при следующем вызове была попытка переподключения
-                self.redis_client = None
-                raise
-        # Возврат клиента Redis (существующего или только что созданного)
+            with self._lock:
+                if self.redis_client is None:
+                    # Пул ограничен по размеру: при нехватке соединений команда ждёт
+                    # освободившееся соединение (до REDIS_QUEUE_POOL_TIMEOUT секунд), а не открывает новое
+                    self.connection_pool = BlockingConnectionPool.from_url(
+                        app_settings.REDIS_QUEUE_URL,
+                        max_connections=app_settings.REDIS_QUEUE_POOL_SIZE,
+                        timeout=app_settings.REDIS_QUEUE_POOL_TIMEOUT,
+                        # Автоматически декодировать ответы из bytes в строки
+                        decode_responses=True,
+                        # Таймаут на операции с сокетом (5 секунд)
+                        socket_timeout=5,
+                        # Таймаут на установку соединения (5 секунд)
+                        socket_connect_timeout=5,
+                        # Повторять попытку при таймауте
+                        retry_on_timeout=True,
+                        # Соединение, простаивавшее дольше 30 секунд, проверяется командой PING перед использованием
+                        health_check_interval=30
+                    )
+                    self.redis_client = Redis(connection_pool=self.connection_pool)
+
+        # Возврат клиента Redis. Разорванные соединения пул переподключает сам,
+        # поэтому после ошибки клиент не пересоздаётся
         return self.redis_client
 
+    def get_client(self):
+        """
+        Клиент Redis на общем пуле соединений (для других модулей, работающих с REDIS_QUEUE_URL)
+        """
+        return self._get_connection()
+
+    def health_check(self):
+        """
+        Проверка доступности Redis через соединение из пула
+
+        Returns:
+            bool: Доступен ли Redis
+        """
+        try:
+            return bool(self._get_connection().ping())
+        except Exception as err:
+            logger.error(f"Ошибка подключения к Redis: {err}")
+            return False
+
+    def get_pool_stats(self):
+        """
+        Состояние пула соединений текущего процесса
+        """
+        if self.connection_pool is None:
+            return {'max_connections': app_settings.REDIS_QUEUE_POOL_SIZE, 'created_connections': 0}
+
+        # Публичного счётчика созданных соединений в redis-py нет: читаем внутренний список пула,
+        # если он есть в установленной версии (иначе - None, значение неизвестно)
+        connections = getattr(self.connection_pool, '_connections', None)
+        return {
+            'max_connections': getattr(self.connection_pool, 'max_connections', None),
+            'created_connections': len(connections) if isinstance(connections, (list, tuple, set)) else None,
+        }
+
+    @staticmethod
+    def build_message(webhook_data):
+        """
+        Формирование сообщения версии 1 для бизнес-сервиса (JSON-строка).
+
+        Args:
+            webhook_data (dict): Данные Уведомления.
+        """
+        return build_legacy_message(webhook_data)
+
+    def get_codec(self, redis_client=None):
+        """
+        Кодировщик сообщений очереди. Формат согласуется с потребителями (см. negotiate_codec)
+        и перепроверяется не чаще раза в CODEC_CHECK_INTERVAL секунд.
+        """
+
+        now = time.monotonic()
+        if self._codec is None or now - self._codec_checked_at >= CODEC_CHECK_INTERVAL:
+            self._codec = negotiate_codec(redis_client or self._get_connection(), self.queue_name)
+            self._codec_checked_at = now
+        return self._codec
+
     def send_to_business_queue(self, webhook_data):
         """
         Отправка информации об поступившем Уведомлении в очередь для бизнес-сервиса.
@@ -71,35 +139,17 @@ class RedisQueue:
         try:
             # Получение подключения к Redis (с ленивой инициализацией)
             redis_client = self._get_connection()
-
-            # Формирование структуры сообщения для отправки в очередь
-            message = {
-                # Идентификатор Уведомления из полученных данных
-                'id': webhook_data.get('id'),
-                'category': webhook_data.get('category'),
-                'parsed_body': webhook_data.get('parsed_body', {}),
-                'created_at': webhook_data.get('created_at'),
-                'metadata': {
-                    # Источник сообщения
-                    'source': 'webhook_service',
-                    # Текущее время в UTC в ISO формате
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
-                    'version': '1.0'
-                }
-            }
+            # Для потока - создание группы потребителей (один раз за процесс)
+            self.backend.prepare(redis_client)
 
             # Отправка сообщения в очередь Redis
-            # LPUSH добавляет элемент в начало списка (очереди)
-            # Преобразование словаря в JSON-строку с сохранением кириллицы (ensure_ascii=False)
-            queue_length = redis_client.lpush(
-                self.queue_name,
-                json_dumps(message, ensure_ascii=False)
-            )
+            # LPUSH добавляет элемент в начало списка (очереди), XADD - запись в конец потока
+            result = self.backend.push(redis_client, self.get_codec(redis_client).encode(webhook_data))
 
             logger.info(
                 f"Сообщение отправлено в очередь {self.queue_name}, "
                 f"ID: {webhook_data.get('id')}, "
-                f"текущая длина очереди: {queue_length}"
+                f"{'текущая длина очереди' if self.backend.name == 'list' else 'запись потока'}: {result}"
             )
             return True
 
@@ -108,6 +158,59 @@ class RedisQueue:
             logger.error(f"Ошибка отправки в Redis очередь: {err}")
             return False
 
+    def push_many(self, webhook_data_list):
+        """
+        Отправка пакета Уведомлений одним обращением к Redis (pipeline) без перехвата ошибок соединения.
+
+        Args:
+            webhook_data_list (list): Данные Уведомлений.
+        Returns:
+            list: Для каждого Уведомления - None при успешной отправке или текст ошибки
+        """
+        if not webhook_data_list:
+            return []
+
+        redis_client = self._get_connection()
+        self.backend.prepare(redis_client)
+        codec = self.get_codec(redis_client)
+
+        # Без транзакции MULTI/EXEC: нужна только экономия на сетевых обращениях
+        pipeline = redis_client.pipeline(transaction=False)
+        for webhook_data in webhook_data_list:
+            self.backend.push(pipeline, codec.encode(webhook_data))
+        results = pipeline.execute(raise_on_error=False)
+
+        return [str(result) if isinstance(result, Exception) else None for result in results]
+
+    def send_many(self, webhook_data_list):
+        """
+        Отправка пакета Уведомлений в очередь бизнес-сервиса одним обращением к Redis (pipeline).
+        Порядок сообщений в очереди тот же, что при последовательных вызовах send_to_business_queue.
+
+        Args:
+            webhook_data_list (list): Данные Уведомлений.
+        Returns:
+            list: Идентификаторы успешно отправленных Уведомлений
+        """
+        if not webhook_data_list:
+            return []
+
+        try:
+            errors = self.push_many(webhook_data_list)
+        except Exception as err:
+            logger.error(f"Ошибка пакетной отправки в Redis очередь: {err}")
+            return []
+
+        sent_ids = []
+        for webhook_data, error in zip(webhook_data_list, errors):
+            if error is not None:
+                logger.error(f"Ошибка отправки в Redis очередь, ID: {webhook_data.get('id')}: {error}")
+            else:
+                sent_ids.append(webhook_data.get('id'))
+
+        logger.info(f"Пакет из {len(sent_ids)} сообщений отправлен в очередь {self.queue_name}")
+        return sent_ids
+
     def get_queue_stats(self):
         """
         Получение статистики очереди
@@ -116,13 +219,15 @@ class RedisQueue:
         try:
             # Получение подключения к Redis
             redis_client = self._get_connection()
-            # Получение длины очереди (количество элементов в списке)
-            # LLEN возвращает количество элементов в списке с именем queue_name
-            length = redis_client.llen(self.queue_name)
-            # Возврат статистики в виде словаря
+            # Возврат статистики в виде словаря: количество ожидающих сообщений (pending_messages),
+            # для потока - также отставание и неподтверждённые сообщения по группам потребителей
             return {
                 'queue_name': self.queue_name,  # Имя очереди
-                'pending_messages': length  # Количество ожидающих сообщений
+                'backend': self.backend.name,  # Тип очереди
+                **self.backend.stats(redis_client),
+                # Общий заголовок очереди: версия, формат и сжатие сообщений
+                'message_format': redis_client.hgetall(format_key(self.queue_name)),
+                'pool': self.get_pool_stats()  # Соединения пула текущего процесса
             }
 
         # Обработка исключений при получении статистики
@@ -131,8 +236,10 @@ class RedisQueue:
             # Возврат статистики с нулевым количеством сообщений и информацией об ошибке
             return {
                 'queue_name': self.queue_name,
+                'backend': self.backend.name,
                 # При ошибке считаем, что сообщений нет
                 'pending_messages': 0,
+                'pool': self.get_pool_stats(),
                 'error': str(err)
             }
 
@@ -0,0 +1,310 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main_wh.archive import archive_expired
+from main_wh.conf import app_settings
+from main_wh.migration_operations import is_partitioned_table
+from main_wh.models import WebhookRequest
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Секции таблицы Уведомлений: <таблица>_p<ГГГГММДД начала диапазона>,
+# <таблица>_legacy - исходная таблица (все записи до перехода), <таблица>_default - записи вне диапазонов
+PARTITION_DATE_FORMAT = '%Y%m%d'
+LEGACY_SUFFIX = '_legacy'
+DEFAULT_SUFFIX = '_default'
+
+PARTITION_BOUND_PATTERN = re.compile(r"^FOR VALUES FROM \('?([^')]+)'?\) TO \('([^']+)'\)$")
+
+
+def get_cutoff(days_old=None):
+    return timezone.now() - timedelta(days=days_old or app_settings.RETENTION_DAYS)
+
+
+def delete_in_chunks(cutoff, chunk_size=None, pause=None, max_seconds=None, max_id=None):
+    """
+    Удаление Уведомлений старше cutoff диапазонами id по chunk_size с паузой между ними.
+    Каждый диапазон удаляется отдельной короткой транзакцией одним DELETE (на WebhookRequest
+    нет внешних ключей и обработчиков удаления, поэтому Django не загружает записи),
+    поэтому объём WAL и время блокировок на одну транзакцию ограничены, а паузы дают
+    репликам, резервному копированию и autovacuum успевать за удалением.
+
+    max_id - последний id, который можно удалить (например, последний заархивированный).
+
+    Returns:
+        int: Количество удалённых записей
+    """
+
+    chunk_size = chunk_size or app_settings.RETENTION_CHUNK_SIZE
+    pause = app_settings.RETENTION_CHUNK_PAUSE if pause is None else pause
+    max_seconds = max_seconds or app_settings.RETENTION_MAX_SECONDS
+    deadline = time.monotonic() + max_seconds
+
+    expired = WebhookRequest.objects.filter(inserted_at__lt=cutoff)
+
+    # Граница - id самой поздней устаревшей записи (по индексу (inserted_at, id)).
+    # Записи, вставленные с опозданием (id больше границы), удалит один из следующих запусков
+    boundary = max_id
+    if boundary is None:
+        boundary = expired.order_by('-inserted_at', '-id').values_list('id', flat=True).first()
+    if boundary is None:
+        return 0
+
+    start_id = WebhookRequest.objects.order_by('id').values_list('id', flat=True).first()
+    total = 0
+
+    while start_id is not None and start_id <= boundary:
+        end_id = min(start_id + chunk_size, boundary + 1)
+        deleted = expired.filter(id__gte=start_id, id__lt=end_id).delete()[0]
+        total += deleted
+
+        if time.monotonic() >= deadline:
+            logger.warning(f"Очистка Уведомлений прервана по времени ({max_seconds} с), удалено: {total}")
+            break
+
+        # Следующий диапазон - от ближайшей существующей записи (пропуск пустых диапазонов id)
+        start_id = WebhookRequest.objects.filter(id__gte=end_id).order_by('id').values_list('id', flat=True).first()
+        if deleted and pause:
+            time.sleep(pause)
+
+    return total
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _legacy_name(name):
+    # Имена объектов PostgreSQL ограничены 63 байтами
+    return f'{name[:63 - len(LEGACY_SUFFIX)]}{LEGACY_SUFFIX}'
+
+
+def is_partitioned():
+    """
+    Секционирована ли таблица Уведомлений (декларативное секционирование PostgreSQL по inserted_at)
+    """
+    return is_partitioned_table(connection, WebhookRequest._meta.db_table)
+
+
+def get_partition_start(value, days=None):
+    """
+    Начало диапазона секции, в которую попадает момент value (диапазоны по days суток от 2000-01-01 UTC)
+    """
+    days = days or app_settings.RETENTION_PARTITION_DAYS
+    epoch = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+    return epoch + timedelta(days=(value - epoch).days // days * days)
+
+
+def get_partitions():
+    """
+    Секции с диапазонами (секция по умолчанию не входит).
+
+    Returns:
+        list: (имя секции, начало диапазона или None для MINVALUE, конец диапазона) по возрастанию конца
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits '
+                       'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                       'WHERE pg_inherits.inhparent = %s::regclass', [WebhookRequest._meta.db_table])
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        # FOR VALUES FROM ('2026-10-15 00:00:00+00') TO ('2026-10-22 00:00:00+00') или FROM (MINVALUE) TO (...)
+        match = PARTITION_BOUND_PATTERN.match(bound)
+        if not match:
+            continue
+        start, end = (datetime.fromisoformat(value) if value != 'MINVALUE' else None for value in match.groups())
+        partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[2])
+
+
+def create_partition_sql(start, days=None):
+    days = days or app_settings.RETENTION_PARTITION_DAYS
+    table = WebhookRequest._meta.db_table
+    name = f'{table}_p{start.strftime(PARTITION_DATE_FORMAT)}'
+    end = start + timedelta(days=days)
+    return (f"CREATE TABLE IF NOT EXISTS {_quote(name)} PARTITION OF {_quote(table)} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+
+def ensure_partitions(ahead=None):
+    """
+    Создание секций от текущей до ahead следующих (пустые секции создаются мгновенно).
+    Секция по умолчанию должна оставаться пустой: при записях в ней создание секции
+    с их диапазоном завершится ошибкой.
+
+    Returns:
+        int: Количество секций после создания
+    """
+
+    ahead = app_settings.RETENTION_PARTITIONS_AHEAD if ahead is None else ahead
+    days = app_settings.RETENTION_PARTITION_DAYS
+    start = get_partition_start(timezone.now())
+    # Конец последней секции (в том числе исходной таблицы): раньше него секции не создаются
+    partitions = get_partitions()
+    covered_until = partitions[-1][2] if partitions else None
+
+    with connection.cursor() as cursor:
+        for number in range(ahead + 1):
+            partition_start = start + timedelta(days=days * number)
+            if covered_until is not None and partition_start < covered_until:
+                continue
+            try:
+                with transaction.atomic():
+                    cursor.execute(create_partition_sql(partition_start, days))
+            except Exception as err:
+                # Например, диапазон пересекается с исходной таблицей или в секции по умолчанию есть его записи
+                logger.error(f"Не удалось создать секцию Уведомлений с {partition_start:%Y-%m-%d}: {err}")
+
+    return len(get_partitions())
+
+
+def drop_expired_partitions(cutoff):
+    """
+    Удаление секций (включая исходную таблицу), все записи которых старше cutoff:
+    DETACH + DROP вместо удаления записей.
+
+    Returns:
+        int: Количество удалённых секций
+    """
+
+    table = WebhookRequest._meta.db_table
+    dropped = 0
+    for name, start, end in get_partitions():
+        if end > cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}')
+            cursor.execute(f'DROP TABLE {_quote(name)}')
+        logger.info(f"Удалена секция Уведомлений {name} (до {end:%Y-%m-%d})")
+        dropped += 1
+    return dropped
+
+
+def cleanup_expired(days_old=None, archive=None):
+    """
+    Очистка Уведомлений старше days_old суток (по умолчанию RETENTION_DAYS).
+    С архивацией (archive, по умолчанию ARCHIVE_ENABLED) записи сначала записываются
+    в файлы архива (main_wh.archive), и удаляются только заархивированные.
+    Для секционированной таблицы целиком устаревшие секции удаляются, а остаток
+    (секция на границе срока и исходная таблица) - диапазонами id, как и без секционирования.
+
+    Returns:
+        dict: Количество удалённых секций и записей
+    """
+
+    cutoff = get_cutoff(days_old)
+    result = {'partitions_dropped': 0, 'rows_deleted': 0}
+    partitioned = is_partitioned()
+    if partitioned:
+        ensure_partitions()
+
+    if archive is None:
+        archive = app_settings.ARCHIVE_ENABLED
+
+    max_id = None
+    if archive:
+        # Удаляются только записи, уже записанные в архив и зарегистрированные в манифесте
+        archived = archive_expired(cutoff)
+        result['archived'] = archived
+        if archived['last_id'] is None:
+            return result
+        max_id = archived['last_id']
+        # Секция удаляется целиком, только если заархивированы все устаревшие записи
+        partitioned = partitioned and archived['complete']
+
+    if partitioned:
+        result['partitions_dropped'] = drop_expired_partitions(cutoff)
+
+    result['rows_deleted'] = delete_in_chunks(cutoff, max_id=max_id)
+    return result
+
+
+def build_partition_conversion_sql(boundary):
+    """
+    SQL перевода таблицы Уведомлений на секционирование по inserted_at.
+    Исходная таблица становится секцией <таблица>_legacy с диапазоном до boundary
+    (удаляется по сроку хранения диапазонами id), новые записи попадают в секции по
+    RETENTION_PARTITION_DAYS суток. Проверочное ограничение и уникальный индекс (id, inserted_at)
+    создаются заранее без долгой блокировки, поэтому сама замена таблицы выполняется быстро.
+    boundary - начало первой секции, должно быть позже момента переключения.
+
+    Returns:
+        tuple: (команды до переключения вне транзакции, команды переключения в одной транзакции)
+    """
+
+    table = WebhookRequest._meta.db_table
+    legacy = f'{table}{LEGACY_SUFFIX}'
+    check_name = f'{table}_legacy_range_check'
+    unique_name = f'{table}_legacy_id_inserted_at_uniq'
+    boundary_sql = f"'{boundary.isoformat()}'"
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s', [table])
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+        primary_key = cursor.fetchone()[0]
+        cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute("SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s",
+                       [table, check_name])
+        check_exists = cursor.fetchone() is not None
+
+    # Повторный запуск после прерванной подготовки - с другой границей ограничение пересоздаётся
+    prepare = [f'ALTER TABLE {_quote(table)} DROP CONSTRAINT {_quote(check_name)}'] if check_exists else []
+    prepare += [
+        f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(check_name)} '
+        f'CHECK (inserted_at IS NOT NULL AND inserted_at < {boundary_sql}) NOT VALID',
+        # Проверка существующих записей без блокировки записи в таблицу
+        f'ALTER TABLE {_quote(table)} VALIDATE CONSTRAINT {_quote(check_name)}',
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {_quote(unique_name)} ON {_quote(table)} (id, inserted_at)',
+    ]
+
+    switch = [
+        # Не ждать долго за выполняющимися запросами: вставки в очереди за блокировкой тоже ждут
+        "SET LOCAL lock_timeout = '5s'",
+        f'LOCK TABLE {_quote(table)} IN ACCESS EXCLUSIVE MODE',
+        f'ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}',
+        # Первичный ключ исходной таблицы - уникальный индекс (id, inserted_at): при присоединении
+        # он становится секцией первичного ключа секционированной таблицы без перестроения
+        f'ALTER TABLE {_quote(legacy)} DROP CONSTRAINT {_quote(primary_key)}',
+        f'ALTER TABLE {_quote(legacy)} ADD CONSTRAINT {_quote(_legacy_name(primary_key))} '
+        f'PRIMARY KEY USING INDEX {_quote(unique_name)}',
+        f'CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY '
+        f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE (inserted_at)',
+        # Первичный ключ секционированной таблицы должен включать ключ секционирования
+        f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(primary_key)} PRIMARY KEY (id, inserted_at)',
+        # Нумерация id продолжается с последовательности исходной таблицы
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), nextval(pg_get_serial_sequence('{legacy}', 'id')))",
+    ]
+
+    # Индексы с прежними именами (их используют миграции Django), индексы исходной таблицы
+    # переименовываются и при присоединении становятся секциями индексов без перестроения
+    for index_name, index_def in indexes:
+        if index_name in (primary_key, unique_name):
+            continue
+        switch.append(f'ALTER INDEX {_quote(index_name)} RENAME TO {_quote(_legacy_name(index_name))}')
+        # Определение ссылается на имя таблицы, которое теперь у секционированной таблицы
+        switch.append(index_def)
+
+    for constraint_name, constraint_def in foreign_keys:
+        switch.append(f'ALTER TABLE {_quote(legacy)} RENAME CONSTRAINT {_quote(constraint_name)} '
+                      f'TO {_quote(_legacy_name(constraint_name))}')
+        switch.append(f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(constraint_name)} {constraint_def}')
+
+    switch += [
+        f'ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(legacy)} '
+        f'FOR VALUES FROM (MINVALUE) TO ({boundary_sql})',
+        f'CREATE TABLE {_quote(table + DEFAULT_SUFFIX)} PARTITION OF {_quote(table)} DEFAULT',
+        create_partition_sql(boundary),
+    ]
+
+    return prepare, switch
@@ -0,0 +1,90 @@
+from django.db import connection
+from django.utils import timezone
+
+from main_wh.conf import app_settings
+from main_wh.dispatcher import notification_dispatcher
+from main_wh.models import NULL_DATE, WebhookRequest
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _claim_sql():
+    table = connection.ops.quote_name(WebhookRequest._meta.db_table)
+    # Подзапрос с SKIP LOCKED: строки, которые сейчас изменяет другой процесс, пропускаются
+    return (
+        f"UPDATE {table} SET status = %s, error_description = '', processed_at = %s, "
+        f"attempts = attempts + 1, updated_at = %s "
+        f"WHERE id IN (SELECT id FROM {table} WHERE status = %s AND NOT error_permanent "
+        f"AND attempts < %s AND retry_after <= %s ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED) "
+        f"RETURNING id"
+    )
+
+
+def claim_failed(limit):
+    """
+    Возврат в статус 'new' одной порции Уведомлений с исправимой ошибкой, у которых истекла пауза
+    до повторной попытки и не исчерпан лимит попыток. Одна короткая транзакция (UPDATE ... RETURNING).
+
+    Returns:
+        list: Идентификаторы возвращённых в обработку Уведомлений
+    """
+
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(_claim_sql(), [
+            WebhookRequest.STATUS_NEW, NULL_DATE, now,
+            WebhookRequest.STATUS_ERROR, app_settings.RETRY_MAX_ATTEMPTS, now, limit,
+        ])
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def retry_failed(chunk_size=None, max_count=None):
+    """
+    Повторная обработка Уведомлений с ошибкой порциями по chunk_size (не более max_count за запуск).
+    Каждая порция сразу уходит в обработку пакетными задачами process_webhook_batch, поэтому
+    после массового сбоя воркеры получают ограниченный поток задач, а остаток ждёт следующего запуска.
+    Если постановка в очередь не удалась, Уведомления остаются в статусе 'new'
+    и будут обработаны задачей process_pending_notifications.
+
+    Returns:
+        int: Количество Уведомлений, возвращённых в обработку
+    """
+
+    chunk_size = chunk_size or app_settings.RETRY_CHUNK_SIZE
+    max_count = max_count or app_settings.RETRY_MAX_PER_RUN
+
+    total = 0
+    while total < max_count:
+        notification_ids = claim_failed(min(chunk_size, max_count - total))
+        if not notification_ids:
+            break
+
+        total += len(notification_ids)
+        try:
+            notification_dispatcher.dispatch_many(notification_ids, batched=True)
+        except Exception as err:
+            logger.error(f"Ошибка постановки в обработку {len(notification_ids)} Уведомлений с ошибкой: {err}")
+            break
+
+        if len(notification_ids) < chunk_size:
+            break
+
+    logger.info(f"Возвращено в обработку Уведомлений с ошибкой: {total}")
+    return total
+
+
+def get_retry_stats():
+    """
+    Уведомления с ошибкой: ожидающие повторной попытки, с неисправимой ошибкой и исчерпавшие попытки
+    """
+
+    errors = WebhookRequest.objects.filter(status=WebhookRequest.STATUS_ERROR)
+    retryable = errors.filter(error_permanent=False, attempts__lt=app_settings.RETRY_MAX_ATTEMPTS)
+    now = timezone.now()
+    return {
+        'retry_ready': retryable.filter(retry_after__lte=now).count(),
+        'retry_scheduled': retryable.filter(retry_after__gt=now).count(),
+        'permanent': errors.filter(error_permanent=True).count(),
+        'exhausted': errors.filter(error_permanent=False, attempts__gte=app_settings.RETRY_MAX_ATTEMPTS).count(),
+    }
@@ -1,8 +1,13 @@
+from collections import defaultdict
+
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
 
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from main_wh.change_feed import EVENT_BUSINESS_STATUS, build_event, change_feed
+from main_wh.conf import app_settings
 from main_wh.models import WebhookRequest, CategoryWebhook, NULL_DATE
 
 import logging
@@ -49,6 +54,15 @@ class WebhookRequestDetailSerializer(serializers.ModelSerializer):
     category_id_ext = serializers.CharField(source='category.id_ext', read_only=True)
     processing_time = serializers.SerializerMethodField()
 
+    def __init__(self, *args, **kwargs):
+        # fields - ограничение набора полей ответа (параметр запроса fields=)
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     class Meta:
         model = WebhookRequest
         fields = [
@@ -124,6 +138,11 @@ class WebhookRequestUpdateSerializer(serializers.ModelSerializer):
         # Обновляем объект стандартным способом
         instance = super().update(instance, validated_data)
 
+        # Событие ленты изменений (после фиксации транзакции) с версией, записанной при сохранении.
+        # updated_at должен быть загружен (WebhookRequestUpdateAPIView.get_queryset), иначе чтение
+        # отложенного поля - лишний запрос
+        change_feed.publish([build_event(EVENT_BUSINESS_STATUS, instance, updated_at=instance.updated_at)])
+
         logger.info(
             f"Бизнес-статус Уведомления {instance.id} изменен: "
             f"{old_status} -> {new_status} "
@@ -133,6 +152,135 @@ class WebhookRequestUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
+class WebhookRequestBulkUpdateSerializer(serializers.Serializer):
+    """
+    Пакетное обновление бизнес-статуса: список {id, business_status, business_processed_at}.
+    Каждый элемент проверяется по правилам WebhookRequestUpdateSerializer, ошибка элемента
+    не мешает обновить остальные. Элементы с одинаковыми новыми значениями обновляются
+    одним UPDATE ... WHERE id IN (...), остальные - через bulk_update.
+    """
+
+    # Результаты по элементам
+    RESULT_UPDATED = 'updated'
+    RESULT_NOT_FOUND = 'not_found'
+    RESULT_INVALID = 'invalid'
+
+    UPDATE_FIELDS = ('business_status', 'business_processed_at')
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_items(self, value):
+        max_items = app_settings.BULK_UPDATE_MAX_ITEMS
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"Не больше {max_items} элементов в одном запросе")
+        return value
+
+    def validate_item(self, item, item_serializer):
+        """
+        Returns:
+            tuple: (id, проверенные значения, ошибки)
+        """
+
+        errors = {}
+        notification_id = item.get('id')
+        if isinstance(notification_id, bool) or not isinstance(notification_id, int):
+            errors['id'] = ['Ожидается целочисленный идентификатор']
+
+        # Как WebhookUpdatePermission: обновлять можно только business_* поля
+        extra_fields = set(item) - {'id', *self.UPDATE_FIELDS}
+        if extra_fields:
+            errors['non_field_errors'] = [f"Недопустимые поля: {', '.join(sorted(extra_fields))}"]
+
+        validated = {}
+        for field_name in self.UPDATE_FIELDS:
+            if field_name not in item:
+                continue
+            try:
+                value = item_serializer.fields[field_name].run_validation(item[field_name])
+                if field_name == 'business_status':
+                    value = item_serializer.validate_business_status(value)
+                validated[field_name] = value
+            except serializers.ValidationError as err:
+                errors[field_name] = err.detail
+
+        if not validated and not errors:
+            errors['non_field_errors'] = ['Не передано ни одного поля для обновления']
+
+        return notification_id, validated, errors
+
+    def save(self, **kwargs):
+        """
+        Returns:
+            list: Результаты в порядке элементов запроса
+        """
+
+        item_serializer = WebhookRequestUpdateSerializer(context=self.context)
+        results = []
+        valid = {}
+
+        for item in self.validated_data['items']:
+            notification_id, validated, errors = self.validate_item(item, item_serializer)
+            if not errors and notification_id in valid:
+                errors['id'] = ['Идентификатор повторяется в запросе']
+
+            if errors:
+                results.append({'id': notification_id, 'status': self.RESULT_INVALID, 'errors': errors})
+                continue
+
+            valid[notification_id] = validated
+            results.append({'id': notification_id, 'status': self.RESULT_UPDATED})
+
+        # Текущее время обработки нужно для правила NULL_DATE (см. WebhookRequestUpdateSerializer.update),
+        # статусы - для событий ленты изменений
+        current = {notification_id: (business_processed_at, notification_status, business_status)
+                   for notification_id, business_processed_at, notification_status, business_status
+                   in WebhookRequest.objects.filter(id__in=list(valid))
+                   .values_list('id', 'business_processed_at', 'status', 'business_status')}
+        now = timezone.now()
+        events = []
+
+        # Группы одинаковых новых значений
+        groups = defaultdict(list)
+        for notification_id, validated in valid.items():
+            if notification_id not in current:
+                continue
+            business_processed_at, notification_status, business_status = current[notification_id]
+            if validated.get('business_status') == 'complete' and business_processed_at == NULL_DATE:
+                validated = {**validated, 'business_processed_at': now}
+            groups[tuple(sorted(validated.items()))].append(notification_id)
+            events.append(build_event(EVENT_BUSINESS_STATUS, WebhookRequest(
+                id=notification_id, status=notification_status,
+                business_status=validated.get('business_status', business_status)), updated_at=now))
+
+        with transaction.atomic():
+            singles = defaultdict(list)
+            for values, ids in groups.items():
+                # updated_at выставляется явно: update() и bulk_update не обновляют auto_now поля
+                if len(ids) > 1:
+                    WebhookRequest.objects.filter(id__in=ids).update(**dict(values), updated_at=now)
+                else:
+                    # bulk_update обновляет у всех объектов одни и те же поля
+                    singles[tuple(name for name, _ in values)].append(
+                        WebhookRequest(id=ids[0], **dict(values), updated_at=now))
+
+            for field_names, objects in singles.items():
+                WebhookRequest.objects.bulk_update(objects, [*field_names, 'updated_at'], batch_size=1000)
+
+            change_feed.publish(events)
+
+        for result in results:
+            if result['status'] == self.RESULT_UPDATED and result['id'] not in current:
+                result['status'] = self.RESULT_NOT_FOUND
+
+        updated_count = sum(1 for result in results if result['status'] == self.RESULT_UPDATED)
+        logger.info(
+            f"Пакетно изменен бизнес-статус {updated_count} Уведомлений из {len(results)} "
+            f"сервисом {self.context.get('service_name', 'unknown')}"
+        )
+
+        return results
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Модифицированный сериализатор для добавления дополнительных claims в JWT токен
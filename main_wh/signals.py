@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from main_wh.models import CategoryWebhook
+from main_wh.category_cache import invalidate_category_cache
+
+
+@receiver(post_save, sender=CategoryWebhook)
+@receiver(post_delete, sender=CategoryWebhook)
+def category_changed(sender, instance, **kwargs):
+    """
+    Сброс кэша категорий во всех воркерах после изменения Категории Уведомлений.
+    """
+
+    # Сбрасываем после фиксации транзакции, иначе воркеры успеют закэшировать старые данные
+    transaction.on_commit(invalidate_category_cache)
@@ -0,0 +1,206 @@
+import math
+import time
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from main_wh.conf import app_settings
+from main_wh.models import WebhookRequest
+from main_wh.redis_client import redis_queue
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Поля хэша состояния досборки в Redis (SWEEPER_STATE_KEY)
+STATE_FIELDS = ('backlog', 'rate', 'batch_size', 'workers', 'run_seconds', 'interval', 'eta_seconds',
+                'next_run_at', 'measured_at')
+# Счётчики, которые задачи досборки увеличивают после каждого пакета (обнуляются при замере)
+PROCESSED_FIELD = 'processed'
+BUSY_FIELD = 'busy_seconds'
+
+# Вес нового замера скорости в скользящем среднем
+RATE_SMOOTHING = 0.5
+
+# Снятие блокировки только её владельцем: шаг, превысивший время жизни блокировки,
+# не должен удалить блокировку, которую уже взял следующий шаг
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _clamp(value, lower, upper):
+    return max(lower, min(upper, value))
+
+
+def _lock_key():
+    return f'{app_settings.SWEEPER_STATE_KEY}:lock'
+
+
+def _release_lock(redis_client, token):
+    try:
+        redis_client.eval(RELEASE_LOCK_SCRIPT, 1, _lock_key(), token)
+    except Exception as err:
+        # Блокировка освободится по истечении SWEEPER_MIN_INTERVAL
+        logger.error(f"Ошибка снятия блокировки досборки: {err}")
+
+
+def count_backlog():
+    """
+    Уведомления, доступные досборке: новые (старше SWEEPER_MIN_AGE) и захваченные с истёкшей арендой
+    """
+
+    now = timezone.now()
+    new = WebhookRequest.objects.filter(status=WebhookRequest.STATUS_NEW,
+                                        updated_at__lte=now - timedelta(seconds=app_settings.SWEEPER_MIN_AGE))
+    expired = WebhookRequest.objects.filter(status=WebhookRequest.STATUS_PROCESSING, claimed_until__lt=now)
+    return new.count() + expired.count()
+
+
+def record_progress(processed, busy_seconds):
+    """
+    Учёт обработанных задачей досборки Уведомлений и затраченного времени (для замера скорости).
+    Ошибка Redis не прерывает досборку.
+    """
+
+    if not processed:
+        return
+    try:
+        pipeline = redis_queue.get_client().pipeline(transaction=False)
+        pipeline.hincrby(app_settings.SWEEPER_STATE_KEY, PROCESSED_FIELD, processed)
+        pipeline.hincrbyfloat(app_settings.SWEEPER_STATE_KEY, BUSY_FIELD, busy_seconds)
+        pipeline.execute()
+    except Exception as err:
+        logger.error(f"Ошибка записи прогресса досборки: {err}")
+
+
+def _take_progress(redis_client):
+    # Чтение и обнуление счётчиков одной транзакцией (MULTI): прогресс, записанный между ними, не теряется
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.hmget(app_settings.SWEEPER_STATE_KEY, PROCESSED_FIELD, BUSY_FIELD)
+    pipeline.hset(app_settings.SWEEPER_STATE_KEY, mapping={PROCESSED_FIELD: 0, BUSY_FIELD: 0})
+    (processed, busy_seconds), _ = pipeline.execute()
+    return int(processed or 0), float(busy_seconds or 0)
+
+
+def get_state(redis_client=None):
+    """
+    Последнее состояние досборки (значения - числа, отсутствующие - None)
+    """
+
+    redis_client = redis_client or redis_queue.get_client()
+    values = redis_client.hmget(app_settings.SWEEPER_STATE_KEY, *STATE_FIELDS)
+    return {field: float(value) if value not in (None, '') else None for field, value in zip(STATE_FIELDS, values)}
+
+
+def plan(backlog, rate, previous_interval):
+    """
+    Параметры следующего запуска по размеру очереди и скорости обработки одного воркера (Уведомлений в секунду).
+
+    - воркеров: по одному на каждые SWEEPER_FANOUT_THRESHOLD Уведомлений, от 1 до SWEEPER_MAX_WORKERS;
+    - пакет: столько, сколько воркер обрабатывает за SWEEPER_TARGET_BATCH_SECONDS,
+      от SWEEPER_BATCH_SIZE до SWEEPER_MAX_BATCH_SIZE;
+    - длительность работы воркера: до разбора своей доли очереди, не более SWEEPER_MAX_SECONDS;
+    - интервал до следующего замера: при пустой очереди удваивается до SWEEPER_MAX_INTERVAL,
+      иначе - SWEEPER_MIN_INTERVAL или до окончания работы воркеров.
+
+    Returns:
+        dict: workers, batch_size, run_seconds, interval, eta_seconds (None - скорость ещё не измерена)
+    """
+
+    if backlog == 0:
+        interval = _clamp((previous_interval or app_settings.SWEEPER_MIN_INTERVAL) * 2,
+                          app_settings.SWEEPER_MIN_INTERVAL, app_settings.SWEEPER_MAX_INTERVAL)
+        return {'workers': 0, 'batch_size': 0, 'run_seconds': 0, 'interval': interval, 'eta_seconds': 0}
+
+    workers = _clamp(math.ceil(backlog / app_settings.SWEEPER_FANOUT_THRESHOLD), 1, app_settings.SWEEPER_MAX_WORKERS)
+
+    if rate:
+        batch_size = int(_clamp(rate * app_settings.SWEEPER_TARGET_BATCH_SECONDS,
+                                app_settings.SWEEPER_BATCH_SIZE, app_settings.SWEEPER_MAX_BATCH_SIZE))
+        eta_seconds = backlog / (rate * workers)
+        run_seconds = _clamp(math.ceil(eta_seconds), 1, app_settings.SWEEPER_MAX_SECONDS)
+    else:
+        batch_size = app_settings.SWEEPER_BATCH_SIZE
+        eta_seconds = None
+        run_seconds = app_settings.SWEEPER_MAX_SECONDS
+
+    interval = _clamp(run_seconds, app_settings.SWEEPER_MIN_INTERVAL, app_settings.SWEEPER_MAX_INTERVAL)
+    return {'workers': workers, 'batch_size': batch_size, 'run_seconds': run_seconds,
+            'interval': interval, 'eta_seconds': eta_seconds}
+
+
+def run_tick():
+    """
+    Шаг досборки (задача process_pending_notifications, запускается каждые SWEEPER_MIN_INTERVAL секунд):
+    если наступило время следующего запуска - замер очереди и скорости, расчёт параметров (plan)
+    и постановка задач drain_pending_notifications на нужное количество воркеров.
+    Одновременно выполняется только один шаг (блокировка в Redis); сами задачи досборки
+    работают параллельно, захватывая Уведомления через SKIP LOCKED (main_wh.claims).
+
+    Returns:
+        dict: Параметры запуска или None, если время запуска ещё не наступило
+    """
+
+    from main_wh.tasks import drain_pending_notifications
+
+    token = uuid.uuid4().hex
+    try:
+        redis_client = redis_queue.get_client()
+        if not redis_client.set(_lock_key(), token, nx=True, ex=app_settings.SWEEPER_MIN_INTERVAL):
+            return None
+    except Exception as err:
+        # Без Redis нет ни блокировки, ни замера: одна задача досборки с параметрами по умолчанию.
+        # Задача не выполняется в текущем воркере (шаг не должен занимать его на SWEEPER_MAX_SECONDS)
+        # и отбрасывается, если не начата до следующего шага
+        logger.error(f"Ошибка чтения состояния досборки, досборка с параметрами по умолчанию: {err}")
+        try:
+            drain_pending_notifications.apply_async(
+                args=[app_settings.SWEEPER_BATCH_SIZE, app_settings.SWEEPER_MAX_SECONDS],
+                expires=app_settings.SWEEPER_MIN_INTERVAL)
+        except Exception as dispatch_err:
+            logger.error(f"Ошибка постановки задачи досборки: {dispatch_err}")
+        return None
+
+    try:
+        state = get_state(redis_client)
+        now = time.time()
+        if state['next_run_at'] and now < state['next_run_at']:
+            return None
+
+        backlog = count_backlog()
+
+        processed, busy_seconds = _take_progress(redis_client)
+        rate = state['rate']
+        if processed and busy_seconds > 0:
+            sample = processed / busy_seconds
+            rate = sample if rate is None else RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * rate
+
+        parameters = plan(backlog, rate, state['interval'])
+        # Задача, не начатая до следующего шага (воркеры заняты), отбрасывается: её заменят новые
+        for _ in range(parameters['workers']):
+            drain_pending_notifications.apply_async(args=[parameters['batch_size'], parameters['run_seconds']],
+                                                    expires=parameters['interval'])
+
+        redis_client.hset(app_settings.SWEEPER_STATE_KEY, mapping={
+            'backlog': backlog,
+            'rate': '' if rate is None else rate,
+            'batch_size': parameters['batch_size'],
+            'workers': parameters['workers'],
+            'run_seconds': parameters['run_seconds'],
+            'interval': parameters['interval'],
+            'eta_seconds': '' if parameters['eta_seconds'] is None else parameters['eta_seconds'],
+            'next_run_at': now + parameters['interval'],
+            'measured_at': now,
+        })
+    finally:
+        _release_lock(redis_client, token)
+
+    if backlog:
+        eta = 'не измерена' if parameters['eta_seconds'] is None else f"{parameters['eta_seconds']:.0f} с"
+        logger.info(f"Досборка: ожидают {backlog}, воркеров {parameters['workers']}, "
+                    f"пакет {parameters['batch_size']}, оценка времени разбора: {eta}")
+    return {'backlog': backlog, 'rate': rate, **parameters}
@@ -1,12 +1,20 @@
+import time
+
 from celery import shared_task
+from django.db import transaction
 from main_wh.models import WebhookRequest
 from main_wh.utils import WebhookProcessor
 
-from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
-from datetime import timedelta
 
+from main_wh.change_feed import EVENT_PROCESSED, build_event, change_feed
+from main_wh.claims import claim_notifications, claim_pending, release_claims
+from main_wh.conf import app_settings
+from main_wh.outbox import add_to_outbox, drain_outbox, relay_after_processing
 from main_wh.redis_client import redis_queue
+from main_wh.retention import cleanup_expired
+from main_wh.retry import retry_failed
+from main_wh.sweeper import record_progress, run_tick
 
 import logging
 
@@ -22,39 +30,32 @@ def process_webhook_notification(self, notification_id):
     Задача Celery для обработки одного уведомления
     """
     try:
+        # Захват уведомления: уже обработанное или обрабатываемое другим процессом пропускается
+        if not claim_notifications([notification_id]):
+            logger.info(f"Уведомление {notification_id} не найдено, уже обработано или обрабатывается")
+            return f"Уведомление {notification_id} пропущено"
+
         try:
-            # Получаем объект уведомления из базы данных по ID
-            notification = WebhookRequest.objects.get(id=notification_id)
+            # Получаем объект уведомления из базы данных по ID (с Категорией - она нужна сообщению outbox)
+            notification = WebhookRequest.objects.select_related('category').get(id=notification_id)
+
+            # Результат разбора и сообщение для бизнес-сервиса фиксируются одной транзакцией:
+            # уведомление не может остаться 'complete' без сообщения в outbox
+            with transaction.atomic():
+                # Вызываем статический метод обработчика для парсинга и обработки уведомления
+                # Этот метод изменяет статус notification и заполняет parsed_body
+                WebhookProcessor.process_single_notification(notification)
 
-            # Вызываем статический метод обработчика для парсинга и обработки уведомления
-            # Этот метод изменяет статус notification и заполняет parsed_body
-            WebhookProcessor.process_single_notification(notification)
+                # ТОЛЬКО если парсинг успешен, сообщение для бизнес-сервиса попадает в outbox
+                if notification.status == 'complete':
+                    add_to_outbox([notification])
 
-            # Проверяем статус уведомления после обработки
-            # ТОЛЬКО если парсинг успешен, отправляем в очередь бизнес-сервиса
+                # Событие ленты изменений публикуется после фиксации транзакции
+                change_feed.publish([build_event(EVENT_PROCESSED, notification)])
+
+            # Отправка в Redis - после фиксации транзакции (сбой Redis не теряет сообщение)
             if notification.status == 'complete':
-                # Подготавливаем данные для бизнес-сервиса
-                webhook_data = {
-                    'id': notification.id,
-                    'category': notification.category.id_ext if notification.category else None,
-                    'parsed_body': notification.parsed_body,
-                    'raw_data': notification.data[:1000],  # Первые 1000 символов
-                    'created_at': notification.inserted_at.isoformat(),
-                    'content_type': notification.content_type,
-                    'source_ip': notification.ip_adr
-                }
-
-                # Отправляем подготовленные данные в Redis очередь бизнес-сервиса
-                # send_to_business_queue возвращает True при успешной отправке
-                if redis_queue.send_to_business_queue(webhook_data):
-                    # Если отправка успешна, сохраняем метку времени отправки в очередь
-                    notification.business_queued_at = timezone.now()
-                    # Частичное обновление только одного поля в базе данных
-                    notification.save(update_fields=['business_queued_at'])
-
-                    logger.info(f"Уведомление {notification_id} отправлено в бизнес-очередь")
-                else:
-                    logger.warning(f"Уведомление {notification_id} не отправлено в бизнес-очередь")
+                relay_after_processing()
 
             logger.info(f"Уведомление {notification_id} обработано через Celery")
             return f"Уведомление {notification_id} обработано успешно!"
@@ -68,6 +69,8 @@ def process_webhook_notification(self, notification_id):
         except Exception as err:
             # Повторяем задачу через 60 секунд при ошибке
             logger.error(f"Ошибка обработки уведомления {notification_id}: {str(err)}")
+            # Захват снимается, чтобы повтор задачи мог захватить уведомление снова
+            release_claims([notification_id])
             # Инициируем повторное выполнение задачи через 60 секунд
             # exc=err передает оригинальное исключение для логирования в Celery
             raise self.retry(countdown=60, exc=err)
@@ -80,47 +83,148 @@ def process_webhook_notification(self, notification_id):
         raise self.retry(countdown=60, exc=err)
 
 
+def process_claimed_batch(notification_ids):
+    """
+    Обработка пакета захваченных уведомлений:
+    один запрос на чтение, один bulk_update с записью в outbox и одно обращение к Redis (pipeline)
+
+    Returns:
+        tuple: (количество обработанных уведомлений, количество записанных в outbox)
+    """
+
+    # Категории загружаются тем же запросом (без отдельного запроса на каждое уведомление)
+    notifications = list(WebhookRequest.objects.select_related('category').filter(id__in=notification_ids))
+    if not notifications:
+        return 0, 0
+
+    # Разбор без сохранения каждого уведомления
+    for notification in notifications:
+        WebhookProcessor.process_single_notification(notification, commit=False)
+
+    # ТОЛЬКО успешно разобранные уведомления попадают в outbox бизнес-сервиса
+    completed = [notification for notification in notifications if notification.status == 'complete']
+
+    with transaction.atomic():
+        WebhookRequest.objects.bulk_update(notifications, WebhookProcessor.RESULT_FIELDS)
+        add_to_outbox(completed)
+        change_feed.publish(build_event(EVENT_PROCESSED, notification) for notification in notifications)
+
+    if completed:
+        relay_after_processing()
+
+    return len(notifications), len(completed)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_webhook_batch(self, notification_ids):
+    """
+    Задача Celery для обработки пакета уведомлений (только захваченных этой задачей)
+    """
+    claimed_ids = claim_notifications(notification_ids)
+
+    skipped_count = len(set(notification_ids)) - len(claimed_ids)
+    if skipped_count:
+        logger.info(f"Пропущено уведомлений из пакета (не найдены, уже обработаны или обрабатываются): "
+                    f"{skipped_count}")
+
+    if not claimed_ids:
+        return "Пакет уведомлений пуст"
+
+    try:
+        processed_count, completed_count = process_claimed_batch(claimed_ids)
+
+    except Exception as err:
+        logger.error(f"Ошибка обработки пакета уведомлений: {str(err)}")
+        release_claims(claimed_ids)
+        raise self.retry(countdown=60, exc=err)
+
+    logger.info(f"Пакет из {processed_count} уведомлений обработан через Celery, "
+                f"в outbox бизнес-сервиса записано: {completed_count}")
+    return f"Пакет из {processed_count} уведомлений обработан успешно!"
+
+
 @shared_task
 def process_pending_notifications():
     """
-    Обработка всех ожидающих уведомлений со статусом 'новый'
+    Шаг адаптивной досборки ожидающих уведомлений: замер очереди и скорости обработки,
+    выбор размера пакета, интервала и количества воркеров, см. main_wh.sweeper
     """
-    WebhookProcessor.process_pending_notifications()
-    return "Успешно завершена обработка ожидающих уведомлений!"
+    parameters = run_tick()
+    if parameters is None:
+        return "Досборка: время следующего замера не наступило"
+    return f"Досборка: ожидают {parameters['backlog']}, запущено задач {parameters['workers']}"
 
 
 @shared_task
-def retry_failed_notifications():
+def drain_pending_notifications(batch_size=None, max_seconds=None):
     """
-    Задача для повторной обработки уведомлений со статусом 'ошибка'
+    Досборка ожидающих уведомлений (не попавших в задачу или оставшихся от упавшего воркера):
+    порции захватываются через UPDATE ... FOR UPDATE SKIP LOCKED, поэтому несколько экземпляров
+    задачи и задачи отдельных уведомлений работают параллельно без повторной обработки
     """
-    failed_notifications = WebhookRequest.objects.filter(status='error')
+    batch_size = batch_size or app_settings.SWEEPER_BATCH_SIZE
+    max_seconds = max_seconds or app_settings.SWEEPER_MAX_SECONDS
+    started = time.monotonic()
+    deadline = started + max_seconds
+    processed_count = 0
 
-    for notification in failed_notifications:
-        notification.status = 'new'
-        notification.error_description = ''
-        notification.processed_at = None
-        notification.save()
+    while time.monotonic() < deadline:
+        claimed_ids = claim_pending(batch_size)
+        if not claimed_ids:
+            break
 
-        # Запускаем обработку в фоне
-        process_webhook_notification.delay(notification.id)
+        try:
+            processed, _ = process_claimed_batch(claimed_ids)
+        except Exception as err:
+            logger.error(f"Ошибка досборки ожидающих уведомлений: {str(err)}")
+            release_claims(claimed_ids)
+            break
+
+        processed_count += processed
+        if len(claimed_ids) < batch_size:
+            break
 
-    return f"Повторная попытка {failed_notifications.count()} обработки уведомления с ошибкой"
+    # Скорость обработки для расчёта следующего запуска досборки
+    record_progress(processed_count, time.monotonic() - started)
+
+    logger.info(f"Досборка завершена, обработано уведомлений: {processed_count}")
+    return f"Успешно завершена обработка {processed_count} ожидающих уведомлений!"
 
 
 @shared_task
-def cleanup_old_notifications(days_old=30):
+def retry_failed_notifications():
     """
-    Очистка старых уведомлений для экономии места
+    Задача для повторной обработки уведомлений со статусом 'ошибка':
+    порциями UPDATE ... RETURNING с постановкой в пакетные задачи, с учётом паузы и лимита попыток
+    (уведомления с неисправимой ошибкой не повторяются), см. main_wh.retry
     """
+    retried_count = retry_failed()
+    return f"Повторная попытка обработки {retried_count} уведомлений с ошибкой"
 
-    cutoff_date = timezone.now() - timedelta(days=days_old)
-    deleted_count = WebhookRequest.objects.filter(
-        inserted_at__lt=cutoff_date
-    ).delete()[0]
 
-    logger.info(f"Очищено {deleted_count} уведомлений старше {days_old} дней")
-    return f"Очищено {deleted_count} уведомлений старше {days_old} дней"
+@shared_task
+def cleanup_old_notifications(days_old=None):
+    """
+    Очистка старых уведомлений для экономии места: диапазонами id с паузами
+    (или удалением устаревших секций, если таблица секционирована), см. main_wh.retention
+    """
+
+    days_old = days_old or app_settings.RETENTION_DAYS
+    result = cleanup_expired(days_old)
+
+    logger.info(f"Очищено {result['rows_deleted']} уведомлений старше {days_old} дней, "
+                f"удалено секций: {result['partitions_dropped']}")
+    return f"Очищено {result['rows_deleted']} уведомлений старше {days_old} дней"
+
+
+@shared_task
+def relay_business_outbox():
+    """
+    Отправка накопившихся сообщений из outbox в очередь бизнес-сервиса
+    (например, не отправленных из-за недоступности Redis)
+    """
+    sent_count = drain_outbox()
+    return f"Из outbox отправлено {sent_count} сообщений"
 
 
 # Декоратор для создания обычной задачи Celery (без bind=True, так как не нужен доступ к self)
@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
+from django.test import RequestFactory, TestCase
+
+from main_wh import admin
+from main_wh.models import CategoryWebhook
+
+
+@mock.patch.object(admin.CategoryWebhookAdmin, 'message_user', mock.Mock())
+@mock.patch.object(admin, 'invalidate_category_cache')
+class CategoryWebhookAdminActionsTests(TestCase):
+
+    def setUp(self):
+        self.category = CategoryWebhook.objects.create(id_ext='admin', name='Admin', is_active=False)
+        self.model_admin = admin.CategoryWebhookAdmin(CategoryWebhook, AdminSite())
+        self.request = RequestFactory().post('/admin/')
+
+    def test_activate_invalidates_cache_after_commit(self, invalidate_category_cache):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.model_admin.activate_categories(self.request, CategoryWebhook.objects.all())
+            invalidate_category_cache.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        invalidate_category_cache.assert_called_once_with()
+        self.category.refresh_from_db()
+        self.assertTrue(self.category.is_active)
+
+    def test_deactivate_invalidates_cache_after_commit(self, invalidate_category_cache):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.model_admin.deactivate_categories(self.request, CategoryWebhook.objects.all())
+
+        self.assertEqual(len(callbacks), 1)
+        invalidate_category_cache.assert_not_called()
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import itertools
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from main_wh import retention
+from main_wh.archive import archive_expired, iter_archived, restore_records
+from main_wh.models import CategoryWebhook, NotificationArchive, WebhookRequest
+from main_wh.retention import cleanup_expired
+
+OLD = datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_dir = Path(directory.name)
+        settings = override_settings(ARCHIVE_DIR=directory.name, RETENTION_DAYS=30, RETENTION_CHUNK_PAUSE=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.category = CategoryWebhook.objects.create(id_ext='archive', name='Archive')
+        # Два дня добавления, внутри дня - по возрастанию id
+        self.expired = [self.create(OLD + timedelta(days=day, minutes=index))
+                        for day, index in ((0, 0), (0, 1), (1, 0), (1, 1))]
+        self.fresh = self.create(None)
+
+    def create(self, inserted_at):
+        notification = WebhookRequest.objects.create(category=self.category, path='/webhooks/archive',
+                                                     ip_adr='10.0.0.1', parsed_body={'n': 'ёж'})
+        if inserted_at:
+            # inserted_at / updated_at заполняются автоматически при создании
+            WebhookRequest.objects.filter(id=notification.id).update(
+                inserted_at=inserted_at, updated_at=inserted_at + timedelta(seconds=5))
+        return notification.id
+
+    def cutoff(self):
+        return retention.get_cutoff()
+
+    def interrupt_after(self, rows):
+        # Отметки времени: расчёт срока и проверки после первых rows - 1 записей, затем срок истёк
+        return mock.patch('main_wh.archive.time.monotonic',
+                          side_effect=itertools.chain([0] * rows, itertools.repeat(10 ** 6)))
+
+    def test_files_and_manifest(self):
+        result = archive_expired(self.cutoff())
+
+        self.assertEqual(result, {'files': 2, 'rows': 4, 'last_id': self.expired[-1], 'complete': True})
+        entries = list(NotificationArchive.objects.order_by('day'))
+        self.assertEqual([(entry.day, entry.first_id, entry.last_id, entry.row_count) for entry in entries], [
+            (OLD.date(), self.expired[0], self.expired[1], 2),
+            ((OLD + timedelta(days=1)).date(), self.expired[2], self.expired[3], 2),
+        ])
+        path = self.archive_dir / entries[0].path
+        self.assertEqual(entries[0].sha256, hashlib.sha256(path.read_bytes()).hexdigest())
+        self.assertEqual(entries[0].size_bytes, path.stat().st_size)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record['id'] for record in records], self.expired[:2])
+        self.assertEqual(records[0]['parsed_body'], {'n': 'ёж'})
+        self.assertEqual(records[0]['inserted_at'], OLD.isoformat())
+        # Временные файлы не остаются
+        self.assertEqual(list(self.archive_dir.rglob('*.tmp')), [])
+        # Записи не удаляются до очистки
+        self.assertEqual(WebhookRequest.objects.count(), 5)
+
+    def test_nothing_to_archive(self):
+        WebhookRequest.objects.filter(id__in=self.expired).delete()
+
+        self.assertEqual(archive_expired(self.cutoff()), {'files': 0, 'rows': 0, 'last_id': None, 'complete': True})
+        self.assertFalse(NotificationArchive.objects.exists())
+
+    def test_cleanup_deletes_only_archived_rows(self):
+        with self.interrupt_after(2):
+            archived = archive_expired(self.cutoff(), max_seconds=60)
+
+        self.assertEqual((archived['rows'], archived['last_id'], archived['complete']), (2, self.expired[1], False))
+        self.assertEqual(sum(NotificationArchive.objects.values_list('row_count', flat=True)), 2)
+
+        with mock.patch.object(retention, 'archive_expired', return_value=archived):
+            result = cleanup_expired(archive=True)
+
+        self.assertEqual(result['rows_deleted'], 2)
+        self.assertEqual(sorted(WebhookRequest.objects.values_list('id', flat=True)),
+                         sorted(self.expired[2:] + [self.fresh]))
+
+    def test_interrupted_archive_does_not_drop_partitions(self):
+        with mock.patch.object(retention, 'is_partitioned', return_value=True), \
+                mock.patch.object(retention, 'ensure_partitions'), \
+                mock.patch.object(retention, 'drop_expired_partitions', return_value=0) as drop, \
+                self.interrupt_after(2):
+            result = cleanup_expired(archive=True)
+
+        self.assertFalse(result['archived']['complete'])
+        drop.assert_not_called()
+        self.assertEqual(result['rows_deleted'], 2)
+
+    def test_complete_archive_drops_partitions(self):
+        with mock.patch.object(retention, 'is_partitioned', return_value=True), \
+                mock.patch.object(retention, 'ensure_partitions'), \
+                mock.patch.object(retention, 'drop_expired_partitions', return_value=0) as drop:
+            result = cleanup_expired(archive=True)
+
+        drop.assert_called_once()
+        self.assertEqual(result['rows_deleted'], 4)
+
+    def test_restore_round_trip(self):
+        original = {row['id']: row for row in WebhookRequest.objects.filter(id__in=self.expired).values()}
+        cleanup_expired(archive=True)
+        self.assertFalse(WebhookRequest.objects.filter(id__in=self.expired).exists())
+
+        result = restore_records(iter_archived(ids=self.expired[1:3]))
+
+        self.assertEqual(result, {'restored': 2, 'skipped': 0})
+        restored = {row['id']: row for row in WebhookRequest.objects.filter(id__in=self.expired).values()}
+        self.assertEqual(sorted(restored), self.expired[1:3])
+        for notification_id, row in restored.items():
+            self.assertEqual(row, original[notification_id])
+
+        # Повторное восстановление пропускает уже присутствующие записи
+        self.assertEqual(restore_records(iter_archived(ids=self.expired)), {'restored': 2, 'skipped': 2})
+
+    def test_restore_skips_deleted_category(self):
+        archive_expired(self.cutoff())
+        records = list(iter_archived())
+        WebhookRequest.objects.all().delete()
+        CategoryWebhook.objects.filter(id=self.category.id).delete()
+
+        self.assertEqual(restore_records(records), {'restored': 0, 'skipped': 4})
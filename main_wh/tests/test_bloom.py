@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from main_wh.bloom import ActiveCategoryFilter, BloomFilter
+from main_wh.models import CategoryWebhook
+
+
+class BloomFilterTests(TestCase):
+
+    def test_no_false_negatives(self):
+        bloom_filter = BloomFilter(100)
+        items = [f'category-{number}' for number in range(100)]
+        for item in items:
+            bloom_filter.add(item)
+        self.assertTrue(all(item in bloom_filter for item in items))
+
+
+class ActiveCategoryFilterTests(TestCase):
+
+    def setUp(self):
+        CategoryWebhook.objects.create(id_ext='existing', name='Existing')
+        self.category_filter = ActiveCategoryFilter()
+
+    def test_refresh_builds_filter(self):
+        self.category_filter.refresh()
+        self.assertFalse(self.category_filter.is_stale())
+        self.assertTrue(self.category_filter.might_exist('existing'))
+
+    def test_invalidate_during_refresh_requeries(self):
+        original = CategoryWebhook.get_active_categories
+        calls = []
+
+        def get_active_categories():
+            queryset = original()
+            if not calls:
+                # Результат первого запроса уже получен, затем категорию создают и кэш сбрасывается
+                queryset = list(queryset.values_list('id_ext', flat=True))
+                CategoryWebhook.objects.create(id_ext='created', name='Created')
+                self.category_filter.invalidate()
+                calls.append(1)
+                return mock.Mock(values_list=mock.Mock(return_value=queryset))
+            calls.append(1)
+            return queryset
+
+        with mock.patch.object(CategoryWebhook, 'get_active_categories', side_effect=get_active_categories):
+            self.category_filter.refresh()
+
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(self.category_filter.might_exist('created'))
+
+    def test_continuous_invalidation_leaves_filter_open(self):
+        original = CategoryWebhook.get_active_categories
+
+        def get_active_categories():
+            self.category_filter.invalidate()
+            return original()
+
+        with mock.patch.object(CategoryWebhook, 'get_active_categories', side_effect=get_active_categories):
+            self.category_filter.refresh()
+
+        # Фильтр не построен: запросы не отклоняются
+        self.assertTrue(self.category_filter.is_stale())
+        self.assertTrue(self.category_filter.might_exist('unknown'))
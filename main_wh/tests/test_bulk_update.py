@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from main_wh.models import NULL_DATE, CategoryWebhook, WebhookRequest
+from main_wh.serializers import WebhookRequestBulkUpdateSerializer
+from main_wh.views import WebhookRequestBulkUpdateAPIView, WebhookRequestUpdateAPIView
+
+
+@mock.patch('main_wh.serializers.change_feed.publish')
+class WebhookRequestBulkUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='bulk', name='Bulk')
+        cls.first, cls.second, cls.third = (
+            WebhookRequest.objects.create(category=category, path='/webhooks/bulk', ip_adr='10.0.0.1')
+            for _ in range(3))
+        cls.missing_id = cls.third.id + 1000
+
+    def patch(self, items):
+        request = APIRequestFactory().patch('/api/internal/webhooks/bulk-update/', items, format='json')
+        force_authenticate(request, user=User(username='business_service'))
+        return WebhookRequestBulkUpdateAPIView.as_view()(request)
+
+    def test_partial_not_found(self, publish):
+        response = self.patch([
+            {'id': self.first.id, 'business_status': 'complete'},
+            {'id': self.missing_id, 'business_status': 'complete'},
+            {'id': self.second.id, 'business_status': 'complete'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['not_found'], response.data['invalid']), (2, 1, 0))
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['updated', 'not_found', 'updated'])
+        self.assertEqual(response.data['results'][1]['id'], self.missing_id)
+
+        updated = WebhookRequest.objects.filter(business_status='complete')
+        self.assertEqual(set(updated.values_list('id', flat=True)), {self.first.id, self.second.id})
+        # Для статуса complete без переданного времени обработки выставляется текущее
+        self.assertFalse(updated.filter(business_processed_at=NULL_DATE).exists())
+        self.assertEqual(len(publish.call_args.args[0]), 2)
+
+    def test_invalid_items_do_not_block_valid_ones(self, publish):
+        response = self.patch({'items': [
+            {'id': self.first.id, 'business_status': 'unknown'},
+            {'id': self.second.id, 'status': 'complete'},
+            {'id': 'x', 'business_status': 'failed'},
+            {'id': self.third.id, 'business_status': 'failed'},
+            {'id': self.third.id, 'business_status': 'complete'},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['invalid', 'invalid', 'invalid', 'updated', 'invalid'])
+        self.assertIn('business_status', response.data['results'][0]['errors'])
+        self.assertIn('id', response.data['results'][4]['errors'])
+        self.assertEqual(WebhookRequest.objects.get(id=self.third.id).business_status, 'failed')
+        self.assertEqual(WebhookRequest.objects.get(id=self.first.id).business_status, 'pending')
+
+    def test_all_not_found(self, publish):
+        response = self.patch([{'id': self.missing_id, 'business_status': 'processing'}])
+
+        self.assertEqual((response.data['updated'], response.data['not_found']), (0, 1))
+        self.assertFalse(WebhookRequest.objects.filter(business_status='processing').exists())
+
+    def test_item_limit(self, publish):
+        with self.settings(BULK_UPDATE_MAX_ITEMS=2):
+            serializer = WebhookRequestBulkUpdateSerializer(data={'items': [{'id': 1}] * 3})
+
+            self.assertFalse(serializer.is_valid())
+        self.assertIn('items', serializer.errors)
+
+
+@mock.patch('main_wh.serializers.change_feed.publish')
+class WebhookRequestUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='update', name='Update')
+        cls.notification = WebhookRequest.objects.create(category=category, path='/webhooks/update',
+                                                         ip_adr='10.0.0.1')
+
+    def patch(self, data):
+        request = APIRequestFactory().patch(f'/api/internal/webhooks/{self.notification.id}/update/',
+                                            data, format='json')
+        force_authenticate(request, user=User(username='business_service'))
+        return WebhookRequestUpdateAPIView.as_view()(request, id=self.notification.id)
+
+    def test_event_carries_saved_version_without_extra_query(self, publish):
+        # SELECT и UPDATE: отложенные поля не догружаются
+        with self.assertNumQueries(2):
+            response = self.patch({'business_status': 'complete'})
+
+        self.assertEqual(response.status_code, 200)
+        saved = WebhookRequest.objects.get(id=self.notification.id)
+        self.assertGreater(saved.updated_at, self.notification.updated_at)
+        self.assertNotEqual(saved.business_processed_at, NULL_DATE)
+        (event,), = publish.call_args.args
+        self.assertEqual((event['business_status'], event['updated_at']), ('complete', saved.updated_at.isoformat()))
@@ -0,0 +1,99 @@
+import json
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from main_wh.change_feed import change_feed
+from main_wh.views import WebhookChangeFeedAPIView
+
+try:
+    import fakeredis
+    from fakeredis import aioredis
+except ImportError:
+    fakeredis = None
+
+URL = '/api/internal/webhooks/changes/'
+
+
+@skipUnless(fakeredis, 'fakeredis не установлен')
+@override_settings(CHANGE_FEED_ENABLED=True, CHANGE_FEED_MAX_WAIT=1, CHANGE_FEED_SSE_DURATION=1)
+@mock.patch.object(WebhookChangeFeedAPIView, 'authentication_classes', [])
+@mock.patch.object(WebhookChangeFeedAPIView, 'permission_classes', [])
+class WebhookChangeFeedTests(SimpleTestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        patchers = [
+            mock.patch('main_wh.change_feed.redis_queue.get_client', return_value=self.redis),
+            mock.patch.object(change_feed, 'get_reader_client',
+                              side_effect=lambda: aioredis.FakeRedis(server=server, decode_responses=True)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add_event(self, notification_id):
+        change_feed._write([{'type': 'processed', 'id': notification_id, 'status': 'complete'}])
+
+    def async_get(self, url):
+        return async_to_sync(self.async_client.get)(url)
+
+    def test_disabled_feed_is_not_found(self):
+        with override_settings(CHANGE_FEED_ENABLED=False):
+            self.assertEqual(self.client.get(URL).status_code, 404)
+            self.assertEqual(self.async_get(URL).status_code, 404)
+
+    def test_events_after_cursor(self):
+        self.add_event(1)
+        self.add_event(2)
+
+        response = self.async_get(f'{URL}?cursor=0-0&timeout=0')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([event['id'] for event in data['events']], [1, 2])
+        self.assertEqual(data['cursor'], data['events'][-1]['cursor'])
+        self.assertFalse(data['truncated'])
+
+        # Курсор ответа - продолжение чтения: новых событий нет
+        self.assertEqual(self.async_get(f"{URL}?cursor={data['cursor']}&timeout=0").json()['events'], [])
+
+    def test_long_poll_returns_empty_after_timeout(self):
+        self.add_event(1)
+
+        data = self.async_get(f'{URL}?timeout=1').json()
+
+        self.assertEqual(data['events'], [])
+        self.assertTrue(data['cursor'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.async_get(f'{URL}?cursor=abc').status_code, 400)
+
+    def test_wsgi_serves_only_polling_without_wait(self):
+        self.add_event(1)
+
+        polled = self.client.get(f'{URL}?cursor=0-0')
+        self.assertEqual(polled.status_code, 200)
+        self.assertEqual([event['id'] for event in polled.json()['events']], [1])
+
+        self.assertEqual(self.client.get(f'{URL}?timeout=5').status_code, 400)
+        self.assertEqual(self.client.get(URL, HTTP_ACCEPT='text/event-stream').status_code, 406)
+
+    def test_server_sent_events(self):
+        self.add_event(7)
+
+        async def read_stream():
+            response = await self.async_client.get(URL, headers={'Accept': 'text/event-stream',
+                                                                  'Last-Event-ID': '0-0'})
+            chunks = [chunk async for chunk in response.streaming_content]
+            return response, b''.join(chunks).decode()
+
+        response, body = async_to_sync(read_stream)()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(body.startswith('retry: 1000\n\n'))
+        data_line = next(line for line in body.splitlines() if line.startswith('data: '))
+        self.assertEqual(json.loads(data_line[len('data: '):])['id'], 7)
+        self.assertIn('event: processed', body)
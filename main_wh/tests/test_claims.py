@@ -0,0 +1,103 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from main_wh.claims import _claim_sql, claim_notifications, claim_pending, get_claim_stats, release_claims
+from main_wh.models import NULL_DATE, CategoryWebhook, WebhookRequest
+
+
+def create_notification(category, status=WebhookRequest.STATUS_NEW, age=0, **fields):
+    notification = WebhookRequest.objects.create(category=category, path='/webhooks/claims', ip_adr='10.0.0.1',
+                                                 status=status, **fields)
+    if age:
+        # updated_at заполняется автоматически при сохранении
+        WebhookRequest.objects.filter(id=notification.id).update(updated_at=timezone.now() - timedelta(seconds=age))
+    return notification.id
+
+
+class ClaimTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryWebhook.objects.create(id_ext='claims', name='Claims')
+        cls.new = create_notification(cls.category, age=600)
+        cls.fresh = create_notification(cls.category)
+        cls.leased = create_notification(cls.category, WebhookRequest.STATUS_PROCESSING, age=600,
+                                         claimed_until=timezone.now() + timedelta(minutes=5))
+        cls.expired = create_notification(cls.category, WebhookRequest.STATUS_PROCESSING, age=600,
+                                          claimed_until=timezone.now() - timedelta(minutes=5))
+        cls.complete = create_notification(cls.category, 'complete', age=600)
+
+    def test_claims_new_and_expired_only(self):
+        ids = [self.new, self.fresh, self.leased, self.expired, self.complete]
+
+        claimed = claim_notifications(ids + [self.new], lease_seconds=30)
+
+        self.assertEqual(claimed, sorted([self.new, self.fresh, self.expired]))
+        for notification in WebhookRequest.objects.filter(id__in=claimed):
+            self.assertEqual(notification.status, WebhookRequest.STATUS_PROCESSING)
+            self.assertGreater(notification.claimed_until, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(WebhookRequest.objects.get(id=self.complete).status, 'complete')
+
+    def test_claimed_rows_are_not_claimed_again(self):
+        claim_notifications([self.new], lease_seconds=30)
+
+        self.assertEqual(claim_notifications([self.new], lease_seconds=30), [])
+
+    def test_empty_ids(self):
+        self.assertEqual(claim_notifications([]), [])
+
+    def test_claim_pending_respects_min_age(self):
+        self.assertEqual(claim_pending(10, lease_seconds=30, min_age=60), [self.new, self.expired])
+        self.assertEqual(claim_pending(10, lease_seconds=30, min_age=0), [self.fresh])
+
+    def test_claim_pending_limit(self):
+        self.assertEqual(claim_pending(1, lease_seconds=30, min_age=60), [self.new])
+
+    def test_release_returns_only_processing_rows(self):
+        claim_notifications([self.new], lease_seconds=30)
+
+        release_claims([self.new, self.complete])
+
+        released = WebhookRequest.objects.get(id=self.new)
+        self.assertEqual((released.status, released.claimed_until), (WebhookRequest.STATUS_NEW, NULL_DATE))
+        self.assertEqual(WebhookRequest.objects.get(id=self.complete).status, 'complete')
+        self.assertEqual(claim_notifications([self.new], lease_seconds=30), [self.new])
+
+    def test_stats(self):
+        self.assertEqual(get_claim_stats(), {'pending': 2, 'processing': 2, 'expired_claims': 1})
+
+    def test_sql_skips_locked_rows(self):
+        sql = _claim_sql('id = ANY(%s)')
+
+        self.assertIn('FOR UPDATE SKIP LOCKED', sql)
+        self.assertIn('ORDER BY id LIMIT %s', sql)
+        self.assertTrue(sql.endswith('RETURNING id'))
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Строка, заблокированная другой транзакцией, пропускается без ожидания"""
+
+    def test_locked_row_is_skipped(self):
+        category = CategoryWebhook.objects.create(id_ext='claims', name='Claims')
+        locked, free = (create_notification(category, age=600) for _ in range(2))
+        claimed = []
+
+        def claim_in_other_connection():
+            try:
+                claimed.extend(claim_pending(10, lease_seconds=30, min_age=60))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            WebhookRequest.objects.select_for_update().get(id=locked)
+            worker = threading.Thread(target=claim_in_other_connection)
+            worker.start()
+            worker.join(timeout=10)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(claimed, [free])
+        self.assertEqual(WebhookRequest.objects.get(id=locked).status, WebhookRequest.STATUS_NEW)
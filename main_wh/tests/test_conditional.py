@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from main_wh.models import CategoryWebhook, WebhookRequest
+from main_wh.views import (WebhookRequestListAPIView, WebhookRequestRetrieveAPIView,
+                           WebhookRequestUpdateAPIView)
+
+
+class ConditionalResponsesTests(TestCase):
+    """ETag и ответ 304 для списка и карточки Уведомления"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryWebhook.objects.create(id_ext='etag', name='ETag')
+        cls.notification = WebhookRequest.objects.create(category=cls.category, path='/webhooks/etag',
+                                                         ip_adr='10.0.0.1', parsed_body={'a': 1})
+
+    def get(self, view, url, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = APIRequestFactory().get(url, **headers)
+        force_authenticate(request, user=User(username='business_service'))
+        return view.as_view()(request, **kwargs)
+
+    def get_detail(self, query='', etag=None):
+        return self.get(WebhookRequestRetrieveAPIView, f'/api/internal/webhooks/{self.notification.id}/{query}',
+                        etag, id=self.notification.id)
+
+    def get_list(self, query='', etag=None):
+        return self.get(WebhookRequestListAPIView, f'/api/internal/webhooks/{query}', etag)
+
+    def test_detail_not_modified(self):
+        response = self.get_detail()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category_name'], 'ETag')
+        self.assertIn('Last-Modified', response)
+
+        not_modified = self.get_detail(etag=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_detail_is_read_with_one_query(self):
+        etag = self.get_detail()['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_detail().status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_detail(etag=etag).status_code, 304)
+
+    def test_detail_etag_changes_with_record_and_category(self):
+        etag = self.get_detail()['ETag']
+
+        WebhookRequest.objects.get(id=self.notification.id).save()
+        changed_record = self.get_detail(etag=etag)
+        self.assertEqual(changed_record.status_code, 200)
+
+        self.category.name = 'Renamed'
+        self.category.save()
+        renamed = self.get_detail(etag=changed_record['ETag'])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(renamed.data['category_name'], 'Renamed')
+
+    @mock.patch('main_wh.serializers.change_feed.publish')
+    def test_business_status_update_changes_etags(self, publish):
+        detail = self.get_detail()['ETag']
+        listing = self.get_list()['ETag']
+
+        request = APIRequestFactory().patch(f'/api/internal/webhooks/{self.notification.id}/update/',
+                                            {'business_status': 'complete'}, format='json')
+        force_authenticate(request, user=User(username='business_service'))
+        response = WebhookRequestUpdateAPIView.as_view()(request, id=self.notification.id)
+        self.assertEqual(response.status_code, 200)
+
+        changed = self.get_detail(etag=detail)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['business_status'], 'complete')
+        self.assertEqual(self.get_list(etag=listing).status_code, 200)
+
+    def test_detail_without_category_fields_ignores_category(self):
+        etag = self.get_detail('?fields=id,status')['ETag']
+
+        self.category.save()
+
+        self.assertEqual(self.get_detail('?fields=id,status', etag=etag).status_code, 304)
+
+    def test_detail_not_found(self):
+        response = self.get(WebhookRequestRetrieveAPIView, '/api/internal/webhooks/0/', id=0)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_not_modified_until_category_renamed(self):
+        response = self.get_list()
+        response.render()
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get_list(etag=response['ETag']).status_code, 304)
+
+        self.category.name = 'Renamed'
+        self.category.save()
+        renamed = self.get_list(etag=response['ETag'])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(renamed.data['results'][0]['category_name'], 'Renamed')
+
+    def test_list_etag_depends_on_fields(self):
+        full = self.get_list()['ETag']
+
+        self.assertEqual(self.get_list('?fields=id,status', etag=full).status_code, 200)
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from main_wh.export import EXPORT_FIELDS
+from main_wh.models import CategoryWebhook, WebhookRequest
+from main_wh.views import WebhookRequestExportAPIView
+
+
+class WebhookRequestExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        first = CategoryWebhook.objects.create(id_ext='export', name='Export')
+        second = CategoryWebhook.objects.create(id_ext='other', name='Other')
+        cls.ids = [
+            WebhookRequest.objects.create(category=category, path='/webhooks/export', ip_adr='10.0.0.1',
+                                          status=status, parsed_body={'n': index, 'text': 'ёж, "кавычки"'}).id
+            for index, (category, status) in enumerate([(first, 'new'), (first, 'complete'),
+                                                         (second, 'complete'), (first, 'complete')])
+        ]
+
+    def export(self, query=''):
+        request = APIRequestFactory().get(f'/api/internal/webhooks/export/{query}')
+        force_authenticate(request, user=User(username='business_service'))
+        response = WebhookRequestExportAPIView.as_view()(request)
+        content = b''.join(response.streaming_content).decode() if response.streaming else None
+        return response, content
+
+    def export_ndjson(self, query=''):
+        response, content = self.export(query)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_ndjson(self):
+        response, content = self.export()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.ids)
+        self.assertEqual(tuple(rows[0]), EXPORT_FIELDS)
+        self.assertEqual(rows[2]['category_id_ext'], 'other')
+        self.assertEqual(rows[0]['parsed_body'], {'n': 0, 'text': 'ёж, "кавычки"'})
+
+    def test_csv_encodes_parsed_body_as_json(self):
+        response, content = self.export('?output=csv&fields=id,status,parsed_body')
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment', response['Content-Disposition'])
+        header, *rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(header, ['id', 'status', 'parsed_body'])
+        self.assertEqual([int(row[0]) for row in rows], self.ids)
+        self.assertEqual(json.loads(rows[1][2]), {'n': 1, 'text': 'ёж, "кавычки"'})
+
+    def test_since_id_and_limit(self):
+        rows = self.export_ndjson(f'?since_id={self.ids[0]}&limit=2&fields=id')
+
+        self.assertEqual(rows, [{'id': self.ids[1]}, {'id': self.ids[2]}])
+        # Продолжение с последнего полученного id
+        self.assertEqual(self.export_ndjson(f'?since_id={self.ids[2]}&fields=id'), [{'id': self.ids[3]}])
+
+    def test_list_filters_are_applied(self):
+        rows = self.export_ndjson('?status=complete&category__id_ext=export&fields=id,status')
+
+        self.assertEqual(rows, [{'id': self.ids[1], 'status': 'complete'}, {'id': self.ids[3], 'status': 'complete'}])
+
+    def test_invalid_parameters(self):
+        for query in ('?output=xml', '?since_id=abc', '?limit=-1', '?fields=id,secret'):
+            with self.subTest(query=query):
+                self.assertEqual(self.export(query)[0].status_code, 400)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from main_wh.fast_serializers import DETAIL_FIELDS, WebhookRequestDetailFastSerializer, get_only_fields
+from main_wh.models import NULL_DATE, CategoryWebhook, WebhookRequest
+from main_wh.serializers import WebhookRequestDetailSerializer
+
+
+class WebhookRequestDetailFastSerializerTests(TestCase):
+    """Ответ быстрого сериализатора после JSONRenderer побайтно совпадает с ответом DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='fast', name='Быстрый "сериализатор"')
+        now = timezone.now()
+        fields = dict(category=category, path='/webhooks/fast', ip_adr='10.0.0.1', content_type='application/json')
+        # Не обработано: processed_at = NULL_DATE, время обработки отрицательное
+        WebhookRequest.objects.create(**fields)
+        WebhookRequest.objects.create(**fields, status='complete', processed_at=now,
+                                      parsed_body={'a': [1, 2.5, None], 'текст': 'ёж'},
+                                      business_status='complete', business_queued_at=now,
+                                      business_processed_at=now + timedelta(microseconds=1500))
+        WebhookRequest.objects.create(**fields, status='error', error_description='Ошибка <разбора>',
+                                      processed_at=now - timedelta(days=400))
+        cls.queryset = WebhookRequest.objects.select_related('category').order_by('id')
+
+    def render_both(self, fields=None):
+        renderer = JSONRenderer()
+        kwargs = {} if fields is None else {'fields': fields}
+        drf = renderer.render(WebhookRequestDetailSerializer(list(self.queryset), many=True, **kwargs).data)
+        serializer = WebhookRequestDetailFastSerializer(fields or DETAIL_FIELDS)
+        fast = renderer.render(serializer.serialize(serializer.prepare_queryset(self.queryset)))
+        return drf, fast
+
+    def test_all_fields(self):
+        drf, fast = self.render_both()
+
+        self.assertEqual(fast, drf)
+        self.assertEqual(WebhookRequest.objects.filter(processed_at=NULL_DATE).count(), 1)
+
+    def test_field_subsets(self):
+        for fields in (('id',), ('id', 'status', 'processing_time'), ('category_name', 'parsed_body'),
+                       ('inserted_at', 'business_processed_at', 'error_description')):
+            with self.subTest(fields=fields):
+                drf, fast = self.render_both(fields)
+                self.assertEqual(fast, drf)
+
+    def test_other_time_zone(self):
+        with timezone.override('Europe/Moscow'):
+            drf, fast = self.render_both()
+
+        self.assertEqual(fast, drf)
+        self.assertIn(b'+03:00', fast)
+
+    def test_only_fields_are_enough_for_drf(self):
+        fields = ('id', 'category_id_ext', 'processing_time')
+
+        queryset = self.queryset.only(*get_only_fields(fields))
+        with self.assertNumQueries(1):
+            WebhookRequestDetailSerializer(list(queryset), many=True, fields=fields).data
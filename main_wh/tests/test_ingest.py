@@ -0,0 +1,195 @@
+from unittest import mock, skipUnless
+
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from main_wh import ingest
+from main_wh.ingest import BaseIngestBuffer, MemoryIngestBuffer, RedisIngestBuffer
+from main_wh.models import CategoryWebhook, WebhookRequest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def make_record(category, **fields):
+    record = {
+        'path': '/webhooks/test', 'data': '{"a": 1}', 'parsed_body': {'a': 1}, 'status': 'new',
+        'content_type': 'application/json', 'category_id': category.id, 'ip_adr': '10.0.0.1',
+    }
+    record.update(fields)
+    return record
+
+
+class BaseIngestBufferTests(SimpleTestCase):
+
+    def test_buffer_must_implement_storage_methods(self):
+        class IncompleteBuffer(BaseIngestBuffer):
+            def submit(self, record, durable=False):
+                return None
+
+        with self.assertRaisesMessage(TypeError, '_take'):
+            IncompleteBuffer()
+
+
+@mock.patch.object(ingest.notification_dispatcher, 'dispatch_many')
+@mock.patch.object(MemoryIngestBuffer, 'ensure_flusher')
+class MemoryIngestBufferFlushTests(TestCase):
+
+    def setUp(self):
+        self.category = CategoryWebhook.objects.create(id_ext='ingest', name='Ingest')
+        self.buffer = MemoryIngestBuffer()
+
+    def test_flush_writes_batch_and_acknowledges(self, ensure_flusher, dispatch_many):
+        ticket = self.buffer.submit(make_record(self.category), durable=True)
+        self.buffer.submit(make_record(self.category))
+
+        self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(WebhookRequest.objects.count(), 2)
+        self.assertTrue(ticket.wait(0))
+        self.assertIsNone(ticket.error)
+        dispatch_many.assert_called_once()
+        self.assertEqual(sorted(dispatch_many.call_args.args[0]),
+                         sorted(WebhookRequest.objects.values_list('id', flat=True)))
+
+    def test_enqueue_failure_does_not_requeue_committed_rows(self, ensure_flusher, dispatch_many):
+        dispatch_many.side_effect = ConnectionError('broker down')
+        ticket = self.buffer.submit(make_record(self.category), durable=True)
+        self.buffer.submit(make_record(self.category))
+
+        self.assertEqual(self.buffer.flush(), 2)
+
+        # Записи в БД и подтверждены, в буфере ничего не осталось: повторной вставки не будет
+        self.assertEqual(WebhookRequest.objects.filter(status='new').count(), 2)
+        self.assertIsNone(ticket.error)
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(WebhookRequest.objects.count(), 2)
+
+    def test_bad_row_is_rejected_and_rest_written(self, ensure_flusher, dispatch_many):
+        for _ in range(3):
+            self.buffer.submit(make_record(self.category))
+        bad_ticket = self.buffer.submit(make_record(self.category, ip_adr='not-an-ip'), durable=True)
+        for _ in range(3):
+            self.buffer.submit(make_record(self.category))
+
+        self.assertEqual(self.buffer.flush(), 6)
+
+        self.assertEqual(WebhookRequest.objects.count(), 6)
+        self.assertIsNotNone(bad_ticket.error)
+        # Ошибочная запись не возвращается в буфер и не блокирует следующие
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_database_error_requeues_only_unwritten_records(self, ensure_flusher, dispatch_many):
+        durable_ticket = self.buffer.submit(make_record(self.category), durable=True)
+        self.buffer.submit(make_record(self.category, path='/first'))
+        self.buffer.submit(make_record(self.category, path='/second'))
+
+        with mock.patch.object(ingest, 'insert_batch', side_effect=OperationalError('connection lost')):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertIsNotNone(durable_ticket.error)
+        # Ожидавший подтверждения получил ошибку (отправитель повторит), остальные - в начале буфера по порядку
+        _, items = self.buffer._take(10)
+        self.assertEqual([item[0]['path'] for item in items], ['/first', '/second'])
+        dispatch_many.assert_not_called()
+
+
+@skipUnless(fakeredis, 'требуется fakeredis')
+@mock.patch.object(ingest.notification_dispatcher, 'dispatch_many')
+@mock.patch.object(RedisIngestBuffer, 'ensure_flusher')
+class RedisIngestBufferFlushTests(TestCase):
+
+    def setUp(self):
+        self.category = CategoryWebhook.objects.create(id_ext='ingest', name='Ingest')
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+        redis_client.flushall()
+        with mock.patch.object(ingest, 'redis_from_url', return_value=redis_client):
+            self.buffer = RedisIngestBuffer()
+        self.redis = redis_client
+
+    def processing_keys(self):
+        return list(self.redis.scan_iter(match=f'{self.buffer.key}:processing:*'))
+
+    def test_batch_removed_only_after_commit(self, ensure_flusher, dispatch_many):
+        self.buffer.submit(make_record(self.category))
+        self.buffer.submit(make_record(self.category, ip_adr='not-an-ip'))
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(self.processing_keys(), [])
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.redis.llen(self.buffer.dead_key), 1)
+
+    def test_orphaned_batch_is_recovered(self, ensure_flusher, dispatch_many):
+        self.buffer.submit(make_record(self.category, path='/first'))
+        self.buffer.submit(make_record(self.category, path='/second'))
+
+        # Процесс забрал пакет и завершился до записи
+        batch_key, items = self.buffer._take(10)
+        self.assertEqual(len(items), 2)
+        self.assertEqual(self.buffer.pending(), 0)
+        self.redis.delete(self.buffer._owner_key(self.buffer._get_owner()))
+
+        self.assertEqual(self.buffer.recover_orphaned(), 2)
+        self.assertEqual(self.processing_keys(), [])
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(WebhookRequest.objects.order_by('id').values_list('path', flat=True)),
+                         ['/first', '/second'])
+
+    def test_live_owner_batch_is_not_recovered(self, ensure_flusher, dispatch_many):
+        self.buffer.submit(make_record(self.category))
+        self.buffer._take(10)
+
+        self.assertEqual(self.buffer.recover_orphaned(), 0)
+
+    def test_slow_flush_is_not_recovered_by_other_process(self, ensure_flusher, dispatch_many):
+        self.buffer.submit(make_record(self.category, path='/first'))
+        self.buffer.submit(make_record(self.category, ip_adr='not-an-ip'))
+        self.buffer.submit(make_record(self.category, path='/third'))
+        with mock.patch.object(ingest, 'redis_from_url', return_value=self.redis):
+            other = RedisIngestBuffer()
+        owner_key = self.buffer._owner_key(self.buffer._get_owner())
+        insert_batch = ingest.insert_batch
+        recovered = []
+
+        def slow_insert_batch(records):
+            # Другой процесс ищет незавершённые пакеты, пока этот записывает свой
+            recovered.append(other.recover_orphaned())
+            try:
+                return insert_batch(records)
+            finally:
+                # Шаг записи длился дольше OWNER_TTL
+                self.redis.delete(owner_key)
+
+        dispatch_many.side_effect = lambda ids: recovered.append(other.recover_orphaned())
+        with mock.patch.object(ingest, 'insert_batch', side_effect=slow_insert_batch) as insert:
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertGreater(insert.call_count, 1)
+        self.assertEqual(set(recovered), {0})
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.processing_keys(), [])
+        self.assertEqual(sorted(WebhookRequest.objects.values_list('path', flat=True)), ['/first', '/third'])
+
+    def test_dead_letters_are_capped_reported_and_requeued(self, ensure_flusher, dispatch_many):
+        self.buffer.dead_max_size = 2
+        for path in ('/first', '/second', '/third'):
+            self.buffer.submit(make_record(self.category, path=path, ip_adr='not-an-ip'))
+            self.buffer.flush()
+
+        self.assertEqual(self.buffer.stats(), {'pending': 0, 'dead_letters': 2})
+        self.assertEqual([item['record']['path'] for item in self.buffer.dead_letters()], ['/second', '/third'])
+
+        # Причина отклонения устранена - записи возвращаются в буфер
+        self.redis.delete(self.buffer.dead_key)
+        self.buffer.submit(make_record(self.category, path='/fixed', ip_adr='not-an-ip'))
+        self.buffer.flush()
+        with mock.patch.object(ingest, 'insert_batch', return_value=[1]) as insert_batch:
+            self.assertEqual(self.buffer.requeue_dead_letters(), 1)
+            self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(insert_batch.call_args.args[0][0]['path'], '/fixed')
+        self.assertEqual(self.buffer.stats(), {'pending': 0, 'dead_letters': 0})
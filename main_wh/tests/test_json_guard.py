@@ -0,0 +1,92 @@
+import json
+import random
+
+from django.test import SimpleTestCase
+
+from main_wh.json_guard import check_json_structure, scan_json_text
+
+
+def is_safe_json_structure(data, max_depth=5, current_depth=0):
+    """Прежняя рекурсивная проверка (WebhookProcessor.is_safe_json_structure до json_guard)"""
+    if current_depth > max_depth:
+        return False
+
+    if isinstance(data, dict):
+        if len(data) > 100:
+            return False
+        for value in data.values():
+            if not is_safe_json_structure(value, max_depth, current_depth + 1):
+                return False
+
+    elif isinstance(data, list):
+        if len(data) > 1000:
+            return False
+        for item in data:
+            if not is_safe_json_structure(item, max_depth, current_depth + 1):
+                return False
+
+    return True
+
+
+def nested(depth, leaf=1):
+    data = leaf
+    for level in range(depth):
+        data = {'k': data} if level % 2 else [data]
+    return data
+
+
+def random_document(rng, depth=0):
+    kind = rng.random()
+    if depth > 7 or kind < 0.3:
+        return rng.choice([1, 2.5, 'text', 'скобки {[', True, None])
+    if kind < 0.65:
+        return [random_document(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f'key{index}': random_document(rng, depth + 1) for index in range(rng.randint(0, 4))}
+
+
+class CheckJsonStructureTests(SimpleTestCase):
+    """check_json_structure и scan_json_text дают тот же результат, что прежняя рекурсивная проверка"""
+
+    def assertSameVerdict(self, data, max_depth=5):
+        expected = is_safe_json_structure(data, max_depth)
+        self.assertEqual(check_json_structure(data, max_depth=max_depth) is None, expected, data)
+        self.assertEqual(scan_json_text(json.dumps(data, ensure_ascii=False), max_depth=max_depth) is None,
+                         expected, data)
+
+    def test_depth_boundary(self):
+        for max_depth in (0, 1, 2, 5):
+            for depth in range(max_depth + 3):
+                with self.subTest(max_depth=max_depth, depth=depth):
+                    self.assertSameVerdict(nested(depth), max_depth)
+                    self.assertSameVerdict(nested(depth, leaf=[]), max_depth)
+                    self.assertSameVerdict(nested(depth, leaf={}), max_depth)
+
+    def test_key_and_array_limits(self):
+        for size in (99, 100, 101):
+            self.assertSameVerdict({f'k{index}': index for index in range(size)})
+        for size in (999, 1000, 1001):
+            self.assertSameVerdict(list(range(size)))
+            self.assertSameVerdict({'items': [{'id': index} for index in range(size)]})
+
+    def test_scalars_and_single_element_arrays(self):
+        for data in (1, 'text', None, [1], [[1]], [[[[[[1]]]]]], {'a': [1]}, [], {}):
+            self.assertSameVerdict(data)
+
+    def test_random_documents(self):
+        rng = random.Random(6)
+        for _ in range(500):
+            self.assertSameVerdict(random_document(rng))
+
+    def test_deep_document_does_not_recurse(self):
+        data = nested(50000)
+
+        self.assertIsNotNone(check_json_structure(data, max_depth=5))
+        self.assertIsNotNone(scan_json_text('[' * 50000 + ']' * 50000, max_depth=5))
+
+    def test_node_and_string_limits(self):
+        self.assertIsNotNone(check_json_structure([[0] * 1000] * 30, max_nodes=20000))
+        self.assertIsNotNone(check_json_structure(['x' * 60000, 'y' * 60000], max_string_chars=100000))
+        self.assertIsNotNone(scan_json_text(json.dumps(['x' * 60000, 'y' * 60000]), max_string_chars=100000))
+
+    def test_brackets_inside_strings_are_ignored(self):
+        self.assertIsNone(scan_json_text(json.dumps({'a': '[[[[[[[[{{{{{{'}), max_depth=1))
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase
+
+from main_wh import migration_operations
+from main_wh.migration_operations import is_partitioned_table
+
+
+class IsPartitionedTableTests(TestCase):
+
+    def test_detects_declarative_partitioning(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE partition_probe (id int, inserted_at timestamptz) '
+                           'PARTITION BY RANGE (inserted_at)')
+            cursor.execute('CREATE TABLE plain_probe (id int)')
+
+        self.assertTrue(is_partitioned_table(connection, 'partition_probe'))
+        self.assertFalse(is_partitioned_table(connection, 'plain_probe'))
+        self.assertFalse(is_partitioned_table(connection, 'missing_probe'))
+
+
+class AddIndexConcurrentlyUnlessPartitionedTests(SimpleTestCase):
+    """SQL операции миграции 0016 для обычной и секционированной таблицы (без выполнения)"""
+
+    # Соединение нужно для подстановки параметров в SQL, транзакция - нет (CONCURRENTLY)
+    databases = {'default'}
+
+    def collect_sql(self, partitioned, backwards=False):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        migration = loader.get_migration('main_wh', '0016_webhookrequest_claims')
+        operation = migration.operations[-1]
+        from_state = loader.project_state(('main_wh', '0015_webhookrequest_retry'))
+        to_state = from_state.clone()
+        for previous in migration.operations:
+            previous.state_forwards('main_wh', to_state)
+
+        with mock.patch.object(migration_operations, 'is_partitioned_table', return_value=partitioned), \
+                connection.schema_editor(collect_sql=True, atomic=False) as editor:
+            if backwards:
+                operation.database_backwards('main_wh', editor, to_state, from_state)
+            else:
+                operation.database_forwards('main_wh', editor, from_state, to_state)
+        return ' '.join(editor.collected_sql)
+
+    def test_plain_table_uses_concurrent_index(self):
+        self.assertIn('CREATE INDEX CONCURRENTLY', self.collect_sql(partitioned=False))
+        self.assertIn('DROP INDEX CONCURRENTLY', self.collect_sql(partitioned=False, backwards=True))
+
+    def test_partitioned_table_falls_back_to_plain_index(self):
+        sql = self.collect_sql(partitioned=True)
+
+        self.assertIn('CREATE INDEX', sql)
+        self.assertIn('main_wh_webhook_pending_idx', sql)
+        self.assertNotIn('CONCURRENTLY', sql)
+        self.assertNotIn('CONCURRENTLY', self.collect_sql(partitioned=True, backwards=True))
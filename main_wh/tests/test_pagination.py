@@ -0,0 +1,94 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from main_wh.models import CategoryWebhook, WebhookRequest
+from main_wh.pagination import WebhookCursorPagination
+
+
+class WebhookCursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='pages', name='Pages')
+        WebhookRequest.objects.bulk_create(
+            WebhookRequest(category=category, path='/webhooks/pages', ip_adr='10.0.0.1') for _ in range(23))
+
+        # Моменты вставки повторяются группами: порядок внутри группы задаёт только id
+        base = timezone.now()
+        for index, pk in enumerate(WebhookRequest.objects.order_by('pk').values_list('pk', flat=True)):
+            WebhookRequest.objects.filter(pk=pk).update(inserted_at=base - timedelta(seconds=index % 4))
+
+        cls.newest_first = list(WebhookRequest.objects.order_by('-inserted_at', '-pk').values_list('pk', flat=True))
+
+    def paginate(self, url):
+        request = Request(APIRequestFactory().get(url))
+        paginator = WebhookCursorPagination()
+        page = paginator.paginate_queryset(WebhookRequest.objects.values_list('id', 'inserted_at', named=True),
+                                           request)
+        return [row.id for row in page], paginator
+
+    @staticmethod
+    def relative(link):
+        if link is None:
+            return None
+        parsed = urlparse(link)
+        return f'{parsed.path}?{parsed.query}'
+
+    def walk(self, url, link_name):
+        pages = []
+        while url:
+            ids, paginator = self.paginate(url)
+            pages.append(ids)
+            url = self.relative(getattr(paginator, link_name)())
+        return pages
+
+    def test_forward_walk_visits_every_row_once_in_key_order(self):
+        pages = self.walk('/list/?pagination=cursor&page_size=5', 'get_next_link')
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual(sum(pages, []), self.newest_first)
+
+    def test_backward_walk_returns_the_same_pages(self):
+        forward = self.walk('/list/?pagination=cursor&page_size=5', 'get_next_link')
+
+        # Ссылка previous последней страницы и далее к началу
+        url = '/list/?pagination=cursor&page_size=5'
+        for _ in forward[:-1]:
+            _, paginator = self.paginate(url)
+            url = self.relative(paginator.get_next_link())
+        _, last = self.paginate(url)
+        backward = self.walk(self.relative(last.get_previous_link()), 'get_previous_link')
+
+        self.assertEqual(backward, list(reversed(forward[:-1])))
+
+    def test_ascending_order_breaks_ties_by_id(self):
+        pages = self.walk('/list/?pagination=cursor&page_size=4&ordering=inserted_at', 'get_next_link')
+
+        self.assertEqual(sum(pages, []), list(reversed(self.newest_first)))
+
+    def test_cursor_round_trip(self):
+        row = WebhookRequest.objects.values_list('id', 'inserted_at', named=True).first()
+        paginator = WebhookCursorPagination()
+        cursor = paginator.encode_cursor(row, True)
+
+        request = Request(APIRequestFactory().get('/list/', {'cursor': cursor}))
+
+        self.assertEqual(paginator.decode_cursor(request), (row.inserted_at, row.id, True))
+
+    def test_invalid_cursor_is_not_found(self):
+        with self.assertRaises(NotFound):
+            self.paginate('/list/?cursor=not-a-cursor')
+
+    def test_links_of_single_page(self):
+        ids, paginator = self.paginate('/list/?pagination=cursor&page_size=100')
+
+        self.assertEqual(ids, self.newest_first)
+        self.assertIsNone(paginator.get_next_link())
+        self.assertIsNone(paginator.get_previous_link())
+        self.assertNotIn('cursor', parse_qs(urlparse(paginator.base_url).query))
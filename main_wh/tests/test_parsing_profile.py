@@ -0,0 +1,33 @@
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+
+from main_wh.models import CategoryWebhook
+from main_wh.parsing_profile import MAX_STORED_BODY_SIZE, PROFILE_STRICT, ParsingConfig
+
+
+class ParsingConfigMaxBodySizeTests(SimpleTestCase):
+
+    def test_category_override_is_used(self):
+        config = ParsingConfig.compile(CategoryWebhook(id_ext='size', name='Size', max_body_size=2048))
+
+        self.assertEqual(config.max_body_size, 2048)
+
+    def test_override_is_clamped_to_stored_body_size(self):
+        config = ParsingConfig.compile(CategoryWebhook(id_ext='size', name='Size', max_body_size=50000))
+
+        self.assertEqual(config.max_body_size, MAX_STORED_BODY_SIZE)
+
+    @override_settings(WEBHOOK_MAX_BODY_SIZE=50000)
+    def test_setting_is_clamped_to_stored_body_size(self):
+        self.assertEqual(ParsingConfig.compile().max_body_size, MAX_STORED_BODY_SIZE)
+        self.assertEqual(ParsingConfig.compile(CategoryWebhook(parsing_profile=PROFILE_STRICT)).max_body_size, 4096)
+
+    def test_model_validation_rejects_oversized_override(self):
+        category = CategoryWebhook(id_ext='size', name='Size', description='-', max_body_size=MAX_STORED_BODY_SIZE + 1)
+
+        with self.assertRaises(ValidationError) as context:
+            category.clean_fields()
+        self.assertIn('max_body_size', context.exception.message_dict)
+
+        category.max_body_size = MAX_STORED_BODY_SIZE
+        category.clean_fields()
@@ -0,0 +1,89 @@
+import json
+from unittest import skipUnless
+
+from django.test import SimpleTestCase, override_settings
+
+from main_wh.queue_codecs import (COMPRESSION_CHOICES, COMPRESSION_NONE, COMPRESSION_ZSTD, FORMAT_JSON,
+                                  FORMAT_LEGACY, FORMAT_MSGPACK, MessageCodec, accept_message_version,
+                                  decode_message, format_key, negotiate_codec)
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+WEBHOOK_DATA = {
+    'id': 42,
+    'category': 'payments',
+    'created_at': '2026-10-17T03:00:00+00:00',
+    'parsed_body': {'event': 'paid', 'comment': 'Оплата ' * 300},
+}
+
+
+class MessageCodecTests(SimpleTestCase):
+
+    def assertDecodesToSource(self, message, version):
+        decoded = decode_message(message)
+
+        for field in ('id', 'category', 'created_at', 'parsed_body'):
+            self.assertEqual(decoded[field], WEBHOOK_DATA[field])
+        self.assertEqual(decoded['metadata']['version'], version)
+        self.assertEqual(decoded['metadata']['source'], 'webhook_service')
+
+    def test_legacy_round_trip(self):
+        message = MessageCodec(FORMAT_LEGACY).encode(WEBHOOK_DATA)
+
+        self.assertIsInstance(message, str)
+        self.assertEqual(json.loads(message)['metadata']['version'], '1.0')
+        self.assertDecodesToSource(message, '1.0')
+
+    def test_v2_round_trip_for_every_format_and_compression(self):
+        for message_format in (FORMAT_JSON, FORMAT_MSGPACK):
+            for compression in COMPRESSION_CHOICES:
+                with self.subTest(message_format=message_format, compression=compression):
+                    codec = MessageCodec(message_format, compression, compress_min_size=64)
+                    message = codec.encode(WEBHOOK_DATA)
+
+                    self.assertEqual(message[0], 2)
+                    self.assertEqual(message[2:3], b'N' if compression == COMPRESSION_NONE else
+                                     {'zlib': b'Z', 'zstd': b'S', 'lz4': b'L'}[compression])
+                    self.assertDecodesToSource(message, '2.0')
+
+    def test_short_message_is_not_compressed(self):
+        codec = MessageCodec(FORMAT_JSON, COMPRESSION_ZSTD, compress_min_size=1 << 20)
+
+        message = codec.encode(WEBHOOK_DATA)
+
+        self.assertEqual(message[2:3], b'N')
+        self.assertDecodesToSource(message, '2.0')
+
+    def test_legacy_format_ignores_compression(self):
+        self.assertEqual(MessageCodec(FORMAT_LEGACY, COMPRESSION_ZSTD).compression, COMPRESSION_NONE)
+
+
+@skipUnless(fakeredis, 'fakeredis не установлен')
+@override_settings(REDIS_QUEUE_MESSAGE_FORMAT=FORMAT_MSGPACK, REDIS_QUEUE_COMPRESSION=COMPRESSION_ZSTD)
+class NegotiateCodecTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def test_falls_back_to_legacy_until_consumers_accept_v2(self):
+        codec = negotiate_codec(self.redis, 'business')
+
+        self.assertEqual(codec.version, 1)
+        self.assertEqual(self.redis.hget(format_key('business'), 'format'), FORMAT_LEGACY.encode())
+
+    def test_uses_v2_after_consumers_accept(self):
+        accept_message_version(self.redis, 'business')
+
+        codec = negotiate_codec(self.redis, 'business')
+
+        self.assertEqual((codec.message_format, codec.compression), (FORMAT_MSGPACK, COMPRESSION_ZSTD))
+        header = self.redis.hgetall(format_key('business'))
+        self.assertEqual(header[b'version'], b'2')
+        self.assertEqual(header[b'compression'], COMPRESSION_ZSTD.encode())
+
+    @override_settings(REDIS_QUEUE_MESSAGE_FORMAT=FORMAT_LEGACY)
+    def test_legacy_setting_needs_no_acceptance(self):
+        self.assertEqual(negotiate_codec(self.redis, 'business').version, 1)
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from redis import BlockingConnectionPool
+
+from main_wh.redis_client import RedisQueue
+
+
+class PoolStatsTests(SimpleTestCase):
+
+    def test_pool_not_created(self):
+        stats = RedisQueue().get_pool_stats()
+
+        self.assertEqual(stats['created_connections'], 0)
+
+    def test_blocking_pool(self):
+        queue = RedisQueue()
+        queue.connection_pool = BlockingConnectionPool(max_connections=7)
+
+        self.assertEqual(queue.get_pool_stats(), {'max_connections': 7, 'created_connections': 0})
+
+    def test_pool_without_internal_counters(self):
+        queue = RedisQueue()
+        queue.connection_pool = SimpleNamespace()
+
+        self.assertEqual(queue.get_pool_stats(), {'max_connections': None, 'created_connections': None})
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main_wh import retry
+from main_wh.models import NULL_DATE, CategoryWebhook, WebhookRequest
+from main_wh.retry import claim_failed, get_retry_stats, retry_failed
+from main_wh.utils import WebhookProcessor
+
+
+@override_settings(RETRY_BACKOFF_BASE=60, RETRY_BACKOFF_MAX=3600, RETRY_MAX_ATTEMPTS=5)
+class SetErrorTests(TestCase):
+
+    def setUp(self):
+        self.category = CategoryWebhook.objects.create(id_ext='retry', name='Retry')
+
+    def make_notification(self, **fields):
+        return WebhookRequest.objects.create(category=self.category, path='/webhooks/retry', ip_adr='10.0.0.1',
+                                             content_type='application/json', **fields)
+
+    def test_backoff_grows_exponentially_up_to_maximum(self):
+        for attempts, delay in ((0, 60), (1, 120), (3, 480), (6, 3600), (20, 3600)):
+            with self.subTest(attempts=attempts):
+                notification = WebhookRequest(attempts=attempts)
+                before = timezone.now()
+
+                WebhookProcessor.set_error(notification, 'timeout', permanent=False)
+
+                self.assertFalse(notification.error_permanent)
+                self.assertEqual(notification.status, 'error')
+                self.assertGreaterEqual(notification.retry_after, before + timedelta(seconds=delay))
+                self.assertLessEqual(notification.retry_after, timezone.now() + timedelta(seconds=delay))
+
+    def test_permanent_error_is_not_scheduled(self):
+        notification = WebhookRequest(attempts=2)
+
+        WebhookProcessor.set_error(notification, 'bad data')
+
+        self.assertTrue(notification.error_permanent)
+        self.assertEqual(notification.retry_after, NULL_DATE)
+
+    def test_data_errors_are_permanent(self):
+        invalid_json = self.make_notification(data='{"a": ')
+        wrong_type = self.make_notification(data='a=1')
+        wrong_type.content_type = 'text/csv'
+
+        for notification in (invalid_json, wrong_type):
+            WebhookProcessor.process_single_notification(notification)
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.error_permanent), ('error', True))
+
+    def test_processing_failure_is_retryable(self):
+        notification = self.make_notification(data='{"a": 1}')
+
+        with mock.patch('main_wh.utils.get_parsing_config', side_effect=RuntimeError('cache down')):
+            WebhookProcessor.process_single_notification(notification)
+
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.error_permanent), ('error', False))
+        self.assertGreater(notification.retry_after, timezone.now())
+
+
+@override_settings(RETRY_MAX_ATTEMPTS=3)
+@mock.patch.object(retry.notification_dispatcher, 'dispatch_many')
+class RetryFailedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='retry', name='Retry')
+        past = timezone.now() - timedelta(minutes=1)
+        future = timezone.now() + timedelta(hours=1)
+
+        def create(**fields):
+            return WebhookRequest.objects.create(category=category, path='/webhooks/retry', ip_adr='10.0.0.1',
+                                                 status='error', **fields).id
+
+        cls.ready = [create(retry_after=past, attempts=attempts) for attempts in (0, 1, 2, 0, 1)]
+        cls.scheduled = create(retry_after=future)
+        cls.permanent = create(retry_after=NULL_DATE, error_permanent=True)
+        cls.exhausted = create(retry_after=past, attempts=3)
+        cls.complete = WebhookRequest.objects.create(category=category, path='/webhooks/retry', ip_adr='10.0.0.1',
+                                                     status='complete').id
+
+    def test_claims_only_ready_retryable_errors(self, dispatch_many):
+        claimed = claim_failed(100)
+
+        self.assertEqual(claimed, sorted(self.ready))
+        rows = WebhookRequest.objects.filter(id__in=claimed)
+        self.assertFalse(rows.exclude(status='new').exists())
+        self.assertEqual(sorted(rows.values_list('attempts', flat=True)), [1, 1, 2, 2, 3])
+        self.assertFalse(rows.exclude(error_description='').exists())
+        self.assertEqual(WebhookRequest.objects.get(id=self.scheduled).status, 'error')
+        self.assertEqual(WebhookRequest.objects.get(id=self.permanent).status, 'error')
+        self.assertEqual(WebhookRequest.objects.get(id=self.exhausted).status, 'error')
+
+    def test_retry_in_chunks_with_run_limit(self, dispatch_many):
+        self.assertEqual(retry_failed(chunk_size=2, max_count=4), 4)
+
+        self.assertEqual([len(call.args[0]) for call in dispatch_many.call_args_list], [2, 2])
+        self.assertTrue(all(call.kwargs == {'batched': True} for call in dispatch_many.call_args_list))
+
+        # Остаток - при следующем запуске
+        self.assertEqual(retry_failed(chunk_size=2, max_count=4), 1)
+        self.assertEqual(retry_failed(chunk_size=2, max_count=4), 0)
+
+    def test_dispatch_failure_stops_run_and_leaves_rows_new(self, dispatch_many):
+        dispatch_many.side_effect = ConnectionError('broker down')
+
+        self.assertEqual(retry_failed(chunk_size=2, max_count=10), 2)
+
+        self.assertEqual(dispatch_many.call_count, 1)
+        self.assertEqual(WebhookRequest.objects.filter(id__in=self.ready, status='new').count(), 2)
+
+    def test_stats(self, dispatch_many):
+        self.assertEqual(get_retry_stats(), {'retry_ready': 5, 'retry_scheduled': 1, 'permanent': 1, 'exhausted': 1})
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+TASKS = {
+    'process-pending-notifications': 'main_wh.tasks.process_pending_notifications',
+    'retry-failed-notifications': 'main_wh.tasks.retry_failed_notifications',
+    'cleanup-old-notifications': 'main_wh.tasks.cleanup_old_notifications',
+    'relay-business-outbox': 'main_wh.tasks.relay_business_outbox',
+}
+
+
+class SetupCelerySchedulesTests(TestCase):
+
+    def run_command(self):
+        call_command('setup_celery_schedules', stdout=StringIO())
+
+    def test_creates_tasks_with_single_schedule(self):
+        self.run_command()
+
+        tasks = {task.name: task for task in PeriodicTask.objects.all()}
+        self.assertEqual({name: tasks[name].task for name in TASKS}, TASKS)
+        for name in TASKS:
+            self.assertEqual((tasks[name].interval is None) + (tasks[name].crontab is None), 1, name)
+        self.assertEqual(tasks['relay-business-outbox'].interval.every, 30)
+        self.assertIsNotNone(tasks['cleanup-old-notifications'].crontab)
+
+    def test_is_idempotent(self):
+        self.run_command()
+        self.run_command()
+
+        self.assertEqual(PeriodicTask.objects.filter(name__in=TASKS).count(), len(TASKS))
+
+    def test_updates_schedule_of_existing_task(self):
+        self.run_command()
+
+        with override_settings(SWEEPER_MIN_INTERVAL=17):
+            self.run_command()
+
+        task = PeriodicTask.objects.get(name='process-pending-notifications')
+        self.assertEqual((task.interval.every, task.interval.period), (17, IntervalSchedule.SECONDS))
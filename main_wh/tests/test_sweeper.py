@@ -0,0 +1,106 @@
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from main_wh import sweeper
+from main_wh.sweeper import plan, run_tick
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+SWEEPER_SETTINGS = dict(SWEEPER_BATCH_SIZE=100, SWEEPER_MAX_BATCH_SIZE=1000, SWEEPER_TARGET_BATCH_SECONDS=2,
+                        SWEEPER_MIN_INTERVAL=10, SWEEPER_MAX_INTERVAL=300, SWEEPER_FANOUT_THRESHOLD=5000,
+                        SWEEPER_MAX_WORKERS=4, SWEEPER_MAX_SECONDS=240, SWEEPER_STATE_KEY='test_sweeper')
+
+
+@override_settings(**SWEEPER_SETTINGS)
+class PlanTests(SimpleTestCase):
+
+    def test_empty_backlog_doubles_interval_up_to_maximum(self):
+        for previous, interval in ((None, 20), (10, 20), (40, 80), (200, 300), (300, 300)):
+            with self.subTest(previous=previous):
+                self.assertEqual(plan(0, 50, previous), {'workers': 0, 'batch_size': 0, 'run_seconds': 0,
+                                                         'interval': interval, 'eta_seconds': 0})
+
+    def test_unmeasured_rate_uses_defaults(self):
+        self.assertEqual(plan(150, None, None), {'workers': 1, 'batch_size': 100, 'run_seconds': 240,
+                                                 'interval': 240, 'eta_seconds': None})
+
+    def test_small_backlog(self):
+        # 1 воркер, 50/с: пакет 100 (минимум), разбор за 2 с, интервал - минимальный
+        self.assertEqual(plan(100, 50, 10), {'workers': 1, 'batch_size': 100, 'run_seconds': 2,
+                                             'interval': 10, 'eta_seconds': 2.0})
+
+    def test_batch_size_follows_rate(self):
+        self.assertEqual(plan(1000, 200, 10)['batch_size'], 400)
+        self.assertEqual(plan(1000, 5000, 10)['batch_size'], 1000)
+
+    def test_workers_fan_out_with_backlog(self):
+        for backlog, workers in ((5000, 1), (5001, 2), (15000, 3), (100000, 4)):
+            with self.subTest(backlog=backlog):
+                self.assertEqual(plan(backlog, 100, 10)['workers'], workers)
+
+    def test_run_seconds_and_interval_are_capped(self):
+        parameters = plan(100000, 10, 10)
+
+        self.assertEqual(parameters['eta_seconds'], 2500)
+        self.assertEqual(parameters['run_seconds'], 240)
+        self.assertEqual(parameters['interval'], 240)
+
+
+@skipUnless(fakeredis, 'fakeredis не установлен')
+@override_settings(**SWEEPER_SETTINGS)
+@mock.patch('main_wh.tasks.drain_pending_notifications.apply_async')
+class RunTickTests(TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        # fakeredis без lupa не выполняет Lua: сценарий снятия блокировки воспроизводится на Python
+        self.eval = mock.patch.object(self.redis, 'eval', side_effect=self.release_lock).start()
+        mock.patch('main_wh.sweeper.redis_queue.get_client', return_value=self.redis).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def release_lock(self, script, numkeys, key, token):
+        self.assertEqual(script, sweeper.RELEASE_LOCK_SCRIPT)
+        if self.redis.get(key) == token:
+            return self.redis.delete(key)
+        return 0
+
+    def test_tick_dispatches_workers_and_releases_lock(self, apply_async):
+        with mock.patch('main_wh.sweeper.count_backlog', return_value=12000):
+            parameters = run_tick()
+
+        self.assertEqual(parameters['workers'], 3)
+        self.assertEqual(apply_async.call_count, 3)
+        apply_async.assert_called_with(args=[100, 240], expires=240)
+        self.assertIsNone(self.redis.get(sweeper._lock_key()))
+        self.assertEqual(sweeper.get_state(self.redis)['backlog'], 12000)
+
+    def test_tick_is_skipped_while_locked(self, apply_async):
+        self.redis.set(sweeper._lock_key(), 'other')
+
+        self.assertIsNone(run_tick())
+
+        apply_async.assert_not_called()
+        self.assertEqual(self.redis.get(sweeper._lock_key()), 'other')
+
+    def test_lock_taken_by_next_tick_is_not_released(self, apply_async):
+        def lock_expired_and_retaken():
+            self.redis.set(sweeper._lock_key(), 'next')
+            return 0
+
+        with mock.patch('main_wh.sweeper.count_backlog', side_effect=lock_expired_and_retaken):
+            run_tick()
+
+        self.assertEqual(self.eval.call_count, 1)
+        self.assertEqual(self.redis.get(sweeper._lock_key()), 'next')
+
+    def test_redis_unavailable_dispatches_single_drain(self, apply_async):
+        with mock.patch.object(self.redis, 'set', side_effect=ConnectionError('redis down')), \
+                mock.patch('main_wh.tasks.drain_pending_notifications.run') as run:
+            self.assertIsNone(run_tick())
+
+        run.assert_not_called()
+        apply_async.assert_called_once_with(args=[100, 240], expires=10)
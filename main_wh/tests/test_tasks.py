@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from main_wh import tasks
+from main_wh.models import BusinessOutbox, CategoryWebhook, WebhookRequest
+
+
+@mock.patch.object(tasks, 'relay_after_processing')
+@mock.patch('main_wh.tasks.change_feed.publish')
+class ProcessWebhookNotificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryWebhook.objects.create(id_ext='tasks', name='Tasks')
+        cls.notification = WebhookRequest.objects.create(category=category, path='/webhooks/tasks',
+                                                         ip_adr='10.0.0.1', data='{"a": 1}',
+                                                         content_type='application/json')
+
+    def test_category_is_loaded_with_notification(self, publish, relay_after_processing):
+        cached = []
+        add_to_outbox = tasks.add_to_outbox
+
+        def check_category(notifications):
+            # Сообщение outbox читает Категорию: без select_related - отдельный запрос в транзакции
+            cached.extend(WebhookRequest.category.is_cached(notification) for notification in notifications)
+            return add_to_outbox(notifications)
+
+        with mock.patch.object(tasks, 'add_to_outbox', side_effect=check_category):
+            tasks.process_webhook_notification.run(self.notification.id)
+
+        self.assertEqual(cached, [True])
+        self.assertEqual(BusinessOutbox.objects.count(), 1)
+        relay_after_processing.assert_called_once()
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from main_wh.parsing_profile import ParsingConfig
+from main_wh.utils import WebhookProcessor
+
+
+class PrevalidateJsonBodyTests(SimpleTestCase):
+
+    def setUp(self):
+        self.config = ParsingConfig.compile()
+
+    def test_valid_body_is_parsed_and_validated(self):
+        data, validated = WebhookProcessor.prevalidate_json_body(b'{"a": [1, 2, {"b": "c"}]}', config=self.config)
+
+        self.assertEqual(data, {'a': [1, 2, {'b': 'c'}]})
+        self.assertTrue(validated)
+
+    def test_empty_body(self):
+        self.assertEqual(WebhookProcessor.prevalidate_json_body(b'', config=self.config), ({}, True))
+
+    def test_too_deep_body_is_not_parsed(self):
+        body = ('[' * (self.config.max_json_depth + 2) + ']' * (self.config.max_json_depth + 2)).encode()
+
+        with mock.patch('main_wh.utils.parse_json_text') as parse_json_text:
+            data, validated = WebhookProcessor.prevalidate_json_body(body, config=self.config)
+
+        self.assertEqual((data, validated), ({}, False))
+        parse_json_text.assert_not_called()
+
+    def test_body_is_scanned_once_and_not_rechecked(self):
+        with mock.patch.object(ParsingConfig, 'check_text', autospec=True, return_value=None) as check_text, \
+                mock.patch.object(ParsingConfig, 'check_structure', autospec=True) as check_structure:
+            WebhookProcessor.prevalidate_json_body(b'{"a": 1}', config=self.config)
+
+        check_text.assert_called_once_with(self.config, '{"a": 1}')
+        check_structure.assert_not_called()
+
+    def test_syntax_error_raises_value_error(self):
+        with self.assertRaisesMessage(ValueError, 'JSON parse error'):
+            WebhookProcessor.prevalidate_json_body(b'{"a": ', config=self.config)
+
+    def test_non_finite_constants_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, 'not JSON compliant'):
+            WebhookProcessor.prevalidate_json_body(b'{"a": NaN}', config=self.config)
+
+    def test_invalid_encoding_raises_value_error(self):
+        with self.assertRaisesMessage(ValueError, 'JSON parse error'):
+            WebhookProcessor.prevalidate_json_body(b'{"a": "\xff"}', config=self.config)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.throttling import ScopedRateThrottle
+
+from main_wh import views
+from main_wh.models import CategoryWebhook, WebhookRequest
+
+SYNC_URL = '/webhooks/{}'
+ASYNC_URL = '/webhooks/async/{}'
+
+
+@mock.patch.object(views.notification_dispatcher, 'dispatch')
+class WebhookCreateViewsTests(TransactionTestCase):
+    """
+    Синхронная и асинхронная точки приёма отвечают одинаково.
+    TransactionTestCase: асинхронная точка пишет в БД из потока обработчика ASGI.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.category = CategoryWebhook.objects.create(id_ext='views', name='Views')
+
+    def post_both(self, id_ext, body, content_type):
+        sync_response = self.client.post(SYNC_URL.format(id_ext), body, content_type=content_type)
+        async_response = self.async_post(ASYNC_URL.format(id_ext), body, content_type)
+        return sync_response, async_response
+
+    def async_post(self, url, body, content_type):
+        return async_to_sync(self.async_client.post)(url, body, content_type=content_type)
+
+    def assertSameResponse(self, sync_response, async_response, status_code):
+        self.assertEqual(sync_response.status_code, status_code)
+        self.assertEqual(async_response.status_code, status_code)
+        self.assertEqual(sync_response.json(), async_response.json())
+
+    def test_valid_json_is_saved_and_dispatched(self, dispatch):
+        sync_response, async_response = self.post_both('views', '{"event": "paid"}', 'application/json')
+
+        self.assertSameResponse(sync_response, async_response, 200)
+        self.assertEqual(WebhookRequest.objects.filter(category=self.category, body_validated=True).count(), 2)
+        self.assertEqual(dispatch.call_count, 2)
+
+    def test_unknown_category_is_not_found(self, dispatch):
+        sync_response, async_response = self.post_both('missing', '{}', 'application/json')
+
+        self.assertSameResponse(sync_response, async_response, 404)
+        dispatch.assert_not_called()
+
+    def test_unsupported_content_type(self, dispatch):
+        sync_response, async_response = self.post_both('views', 'a,b', 'text/csv')
+
+        self.assertEqual(sync_response.status_code, 415)
+        self.assertEqual(async_response.status_code, 415)
+        self.assertFalse(WebhookRequest.objects.exists())
+
+    def test_invalid_json_is_bad_request(self, dispatch):
+        sync_response, async_response = self.post_both('views', '{"event": ', 'application/json')
+
+        self.assertSameResponse(sync_response, async_response, 400)
+        self.assertFalse(WebhookRequest.objects.exists())
+
+    def test_async_view_rejects_other_methods(self, dispatch):
+        response = async_to_sync(self.async_client.get)(ASYNC_URL.format('views'))
+
+        self.assertIn(response.status_code, (403, 405))
+
+    @mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'webhook': '1/min'})
+    def test_async_view_uses_drf_throttling(self, dispatch):
+        first = self.async_post(ASYNC_URL.format('views'), '{}', 'application/json')
+        second = self.async_post(ASYNC_URL.format('views'), '{}', 'application/json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second.headers)
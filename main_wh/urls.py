@@ -5,7 +5,9 @@ from rest_framework.routers import DefaultRouter
 
 from main_wh.apps import MainWhConfig
 from main_wh.views import (WebhookRequestCreateAPIView, HealthCheckAPIView, WebhookRequestListAPIView,
-                           WebhookRequestRetrieveAPIView, WebhookRequestUpdateAPIView, WebhookQueueStatsAPIView,)
+                           WebhookRequestRetrieveAPIView, WebhookRequestUpdateAPIView, WebhookQueueStatsAPIView,
+                           CategoryCacheStatsAPIView, AsyncWebhookCreateView, WebhookRequestExportAPIView,
+                           WebhookRequestBulkUpdateAPIView, WebhookChangeFeedAPIView, MetricsAPIView,)
 
 from rest_framework_simplejwt.views import (TokenObtainPairView, TokenRefreshView, TokenVerifyView)
 from main_wh.serializers import CustomTokenObtainPairSerializer
@@ -26,13 +28,20 @@ def health_check(request):
 
 urlpatterns = [
     path('webhooks/<str:id_ext>', WebhookRequestCreateAPIView.as_view(), name='webhook_create'),
+    # Асинхронная точка приёма (при запуске под ASGI-сервером)
+    path('webhooks/async/<str:id_ext>', AsyncWebhookCreateView.as_view(), name='webhook_create_async'),
     path('health', HealthCheckAPIView.as_view(), name='health_check'),
 
     # Внутренние API (только для сервисов)
     path('api/internal/webhooks/', WebhookRequestListAPIView.as_view(), name='webhook_list'),
+    path('api/internal/webhooks/export/', WebhookRequestExportAPIView.as_view(), name='webhook_export'),
+    path('api/internal/webhooks/bulk-update/', WebhookRequestBulkUpdateAPIView.as_view(), name='webhook_bulk_update'),
+    path('api/internal/webhooks/changes/', WebhookChangeFeedAPIView.as_view(), name='webhook_changes'),
     path('api/internal/webhooks/<int:id>/', WebhookRequestRetrieveAPIView.as_view(), name='webhook_detail'),
     path('api/internal/webhooks/<int:id>/update/', WebhookRequestUpdateAPIView.as_view(), name='webhook_update'),
     path('api/internal/queue/stats/', WebhookQueueStatsAPIView.as_view(), name='queue_stats'),
+    path('api/internal/cache/stats/', CategoryCacheStatsAPIView.as_view(), name='cache_stats'),
+    path('api/internal/metrics/', MetricsAPIView.as_view(), name='metrics'),
 
     # Получение, продление токенов авторизации
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
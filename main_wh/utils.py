@@ -1,7 +1,12 @@
 import json
 import logging
+from datetime import timedelta
+from django.http import HttpResponse
 from django.utils import timezone
-from main_wh.models import WebhookRequest
+from main_wh.json_guard import check_json_structure
+from main_wh.parsing_profile import get_parsing_config
+from main_wh.conf import app_settings
+from main_wh.models import NULL_DATE
 from urllib.parse import parse_qs
 
 logger = logging.getLogger(__name__)
@@ -19,24 +24,110 @@ def get_client_ip(request):
     return ip
 
 
+def render_json_response(data, status=200):
+    """
+    Ответ в том же виде, что формирует JSONRenderer DRF (компактный JSON без экранирования кириллицы).
+    Используется там, где ответ формируется без DRF (middleware).
+    """
+    content = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return HttpResponse(content.encode('utf-8'), status=status, content_type='application/json')
+
+
+def get_media_type(content_type):
+    """
+    Основной MIME-тип из заголовка Content-Type (без кодировки и других параметров).
+    """
+    if not content_type:
+        return content_type
+    return content_type.split(';')[0].strip().lower()
+
+
+def parse_json_text(text):
+    """
+    Разбор JSON тела запроса по тем же правилам, что JSONParser DRF (NaN и Infinity запрещены).
+    При ошибке выбрасывает ValueError с тем же текстом, что ParseError DRF.
+    """
+    try:
+        return json.loads(text, parse_constant=_reject_json_constant)
+    except ValueError as err:
+        raise ValueError('JSON parse error - %s' % str(err))
+
+
+def _reject_json_constant(constant):
+    raise ValueError('Out of range float values are not JSON compliant: ' + repr(constant))
+
+
+def build_notification_record(request, category, parsed_data, raw_body, body_validated=False):
+    """
+    Поля записи WebhookRequest по входящему запросу.
+    """
+    return {
+        'path': request.path,
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        'ip_adr': get_client_ip(request),
+        'parsed_body': parsed_data,
+        'data': raw_body,
+        'status': 'new',
+        'request_method': request.method,
+        'full_url': request.build_absolute_uri(),
+        'content_type': request.content_type,
+        'category_id': category.id,
+        'body_validated': body_validated,
+    }
+
+
 class WebhookProcessor:
     """
     Класс для безопасного парсинга и валидации входящих уведомлений
     """
 
+    # Поля, которые заполняет разбор уведомления
+    RESULT_FIELDS = ['parsed_body', 'status', 'error_description', 'processed_at', 'error_permanent', 'retry_after',
+                     'updated_at']
+
+    @classmethod
+    def save_result(cls, notification, commit=True):
+        """
+        Сохранение результата разбора уведомления (при commit=False сохраняет вызывающий)
+        """
+        if commit:
+            notification.save()
+        else:
+            # bulk_update не обновляет auto_now поля сам
+            notification.updated_at = timezone.now()
+
+    @classmethod
+    def set_error(cls, notification, description, permanent=True):
+        """
+        Ошибка разбора уведомления.
+        permanent - ошибка в самих данных (размер, невалидный JSON, Content-Type): повторная обработка
+        даст тот же результат, и retry_failed_notifications такие уведомления не берёт.
+        Для остальных ошибок повторная обработка откладывается с экспоненциально растущей паузой.
+        """
+        now = timezone.now()
+        notification.status = 'error'
+        notification.error_description = description
+        notification.processed_at = now
+        notification.error_permanent = permanent
+        notification.retry_after = NULL_DATE if permanent else now + timedelta(seconds=min(
+            app_settings.RETRY_BACKOFF_BASE * 2 ** notification.attempts, app_settings.RETRY_BACKOFF_MAX))
+
     @classmethod
-    def safe_parse_form_data(cls, notification, max_size=10000, max_params=50):
+    def safe_parse_form_data(cls, notification, config=None, commit=True):
         """
         Безопасный парсинг form-data с защитой от переполнения и атак
+        (лимиты - из параметров разбора категории)
         """
+        config = config or get_parsing_config()
+        max_size = config.max_body_size
+        max_params = config.max_form_params
+
         try:
             # 1. ПРОВЕРКА РАЗМЕРА
             body = notification.data
             if len(body) > max_size:
-                notification.status = 'error'
-                notification.error_description = f"Превышен максимальный размер данных: {len(body)} > {max_size}"
-                notification.processed_at = timezone.now()
-                notification.save()
+                cls.set_error(notification, f"Превышен максимальный размер данных: {len(body)} > {max_size}")
+                cls.save_result(notification, commit)
                 logger.warning(f"Webhook {notification.id}: превышен размер данных")
                 return
 
@@ -45,10 +136,8 @@ class WebhookProcessor:
 
             # 3. ПРОВЕРКА КОЛИЧЕСТВА ПАРАМЕТРОВ
             if len(parsed_qs) > max_params:
-                notification.status = 'error'
-                notification.error_description = f"Превышено максимальное количество параметров: {len(parsed_qs)} > {max_params}"
-                notification.processed_at = timezone.now()
-                notification.save()
+                cls.set_error(notification, f"Превышено максимальное количество параметров: {len(parsed_qs)} > {max_params}")
+                cls.save_result(notification, commit)
                 logger.warning(f"Webhook {notification.id}: слишком много параметров")
                 return
 
@@ -64,11 +153,11 @@ class WebhookProcessor:
 
                     # БЕЗОПАСНЫЙ ПАРСИНГ ВЛОЖЕННОГО JSON
                     if key in ['payload', 'data', 'json']:
-                        if len(value) <= 5000:  # Лимит для JSON
+                        if len(value) <= config.max_form_json_size:  # Лимит для JSON
                             if value.strip().startswith('{') or value.strip().startswith('['):
                                 try:
                                     parsed_json = json.loads(value)
-                                    if cls.is_safe_json_structure(parsed_json, max_depth=5):
+                                    if config.check_structure(parsed_json, config.max_form_json_depth) is None:
                                         result[key] = parsed_json
                                     else:
                                         result[key] = value[:1000]  # Обрезаем слишком сложные структуры
@@ -83,42 +172,82 @@ class WebhookProcessor:
             notification.parsed_body = result
             notification.status = 'complete'
             notification.processed_at = timezone.now()
-            notification.save()
+            cls.save_result(notification, commit)
             logger.info(f"Webhook {notification.id}: успешно обработан (form-data)")
 
         except Exception as err:
-            notification.status = 'error'
-            notification.error_description = f"Ошибка парсинга form-data: {str(err)}"
-            notification.processed_at = timezone.now()
-            notification.save()
+            cls.set_error(notification, f"Ошибка парсинга form-data: {str(err)}")
+            cls.save_result(notification, commit)
             logger.error(f"Webhook {notification.id}: ошибка парсинга form-data: {str(err)}")
 
     @classmethod
-    def safe_parse_json_data(cls, notification, max_size=10000):
+    def prevalidate_json_body(cls, body, encoding='utf-8', config=None):
+        """
+        Разбор и проверка структуры JSON при приёме уведомления: тело декодируется один раз,
+        структура проверяется по тексту до построения объектов (json_guard.scan_json_text),
+        затем текст разбирается. Ошибка разбора выбрасывается как ValueError (см. parse_json_text).
+        Документ, не прошедший проверку, не разбирается: его отклонит обработка в воркере.
+        В быстром профиле структура не проверяется.
+
+        Returns:
+            tuple: (разобранные данные, прошли ли данные проверку структуры)
+        """
+        config = config or get_parsing_config()
+
+        if not body:
+            return {}, True
+        try:
+            text = body.decode(encoding)
+        except UnicodeDecodeError as err:
+            raise ValueError('JSON parse error - %s' % str(err))
+
+        if config.validate_structure and config.check_text(text) is not None:
+            return {}, False
+
+        parsed_data = parse_json_text(text)
+        if parsed_data is None:
+            parsed_data = {}
+        return parsed_data, True
+
+    @classmethod
+    def safe_parse_json_data(cls, notification, config=None, commit=True):
         """
         Безопасный парсинг JSON данных
+        (лимиты - из параметров разбора категории)
         """
+        config = config or get_parsing_config()
+        max_size = config.max_body_size
+
         try:
             # 1. ПРОВЕРКА РАЗМЕРА
             body = notification.data
             if len(body) > max_size:
-                notification.status = 'error'
-                notification.error_description = f"Превышен максимальный размер JSON: {len(body)} > {max_size}"
-                notification.processed_at = timezone.now()
-                notification.save()
+                cls.set_error(notification, f"Превышен максимальный размер JSON: {len(body)} > {max_size}")
+                cls.save_result(notification, commit)
                 logger.warning(f"Webhook {notification.id}: превышен размер JSON")
                 return
 
+            # Данные уже разобраны и проверены при приёме - повторный разбор не нужен
+            if notification.body_validated:
+                notification.status = 'complete'
+                notification.processed_at = timezone.now()
+                cls.save_result(notification, commit)
+                logger.info(f"Webhook {notification.id}: успешно обработан (JSON проверен при приёме)")
+                return
+
             # 2. ПАРСИНГ JSON
             if body.strip():
-                parsed_data = json.loads(body)
+                # Большие документы проверяются по тексту до построения объектов
+                # (отсекает глубокие и широкие документы), затем проверяются разобранные данные
+                reason = config.scan_text(body)
+                if reason is None:
+                    parsed_data = json.loads(body)
+                    reason = config.check_structure(parsed_data) if config.validate_structure else None
 
                 # 3. ПРОВЕРКА СТРУКТУРЫ JSON
-                if not cls.is_safe_json_structure(parsed_data, max_depth=10):
-                    notification.status = 'error'
-                    notification.error_description = "Слишком сложная структура JSON"
-                    notification.processed_at = timezone.now()
-                    notification.save()
+                if reason is not None:
+                    cls.set_error(notification, f"Слишком сложная структура JSON: {reason}")
+                    cls.save_result(notification, commit)
                     logger.warning(f"Webhook {notification.id}: слишком сложная JSON структура")
                     return
 
@@ -126,69 +255,44 @@ class WebhookProcessor:
                 notification.parsed_body = parsed_data
                 notification.status = 'complete'
                 notification.processed_at = timezone.now()
-                notification.save()
+                cls.save_result(notification, commit)
                 logger.info(f"Webhook {notification.id}: успешно обработан (JSON)")
             else:
                 # Пустой JSON
                 notification.parsed_body = {}
                 notification.status = 'complete'
                 notification.processed_at = timezone.now()
-                notification.save()
+                cls.save_result(notification, commit)
 
         except json.JSONDecodeError as err:
-            notification.status = 'error'
-            notification.error_description = f"Невалидный JSON: {str(err)}"
-            notification.processed_at = timezone.now()
-            notification.save()
+            cls.set_error(notification, f"Невалидный JSON: {str(err)}")
+            cls.save_result(notification, commit)
             logger.warning(f"Webhook {notification.id}: невалидный JSON: {str(err)}")
         except Exception as err:
-            notification.status = 'error'
-            notification.error_description = f"Ошибка парсинга JSON: {str(err)}"
-            notification.processed_at = timezone.now()
-            notification.save()
+            cls.set_error(notification, f"Ошибка парсинга JSON: {str(err)}", permanent=False)
+            cls.save_result(notification, commit)
             logger.error(f"Webhook {notification.id}: ошибка парсинга JSON: {str(err)}")
 
     @classmethod
     def is_safe_json_structure(cls, data, max_depth=5, current_depth=0):
         """
         Проверка, что JSON не слишком сложный/глубокий для безопасности
+        (без рекурсии, см. json_guard.check_json_structure)
         """
         if current_depth > max_depth:
             return False
 
-        if isinstance(data, dict):
-            # Ограничение количества ключей в объекте
-            if len(data) > 100:
-                return False
-
-            for value in data.values():
-                if not cls.is_safe_json_structure(value, max_depth, current_depth + 1):
-                    return False
-
-        elif isinstance(data, list):
-            # Ограничение длины массива
-            if len(data) > 1000:
-                return False
-
-            for item in data:
-                if not cls.is_safe_json_structure(item, max_depth, current_depth + 1):
-                    return False
-
-        return True
+        return check_json_structure(data, max_depth=max_depth - current_depth) is None
 
     @classmethod
-    def validate_content_type(cls, content_type):
+    def validate_content_type(cls, content_type, config=None):
         """
         Валидация Content-Type
         """
-        allowed_content_types = [
-            'application/json',
-            'application/x-www-form-urlencoded'
-        ]
+        config = config or get_parsing_config()
 
         if content_type:
-            content_type = content_type.split(';')[0].strip().lower()
-            return content_type in allowed_content_types
+            return config.allows_content_type(get_media_type(content_type))
         return False
 
     @classmethod
@@ -199,28 +303,28 @@ class WebhookProcessor:
         return len(data) <= max_size
 
     @classmethod
-    def process_single_notification(cls, notification):
+    def process_single_notification(cls, notification, commit=True):
         """
-        Основной метод обработки уведомления - ТОЛЬКО ПАРСИНГ И ВАЛИДАЦИЯ
+        Основной метод обработки уведомления - ТОЛЬКО ПАРСИНГ И ВАЛИДАЦИЯ.
+        С commit=False результат не сохраняется (пакетная обработка сохраняет его через bulk_update).
         """
         logger.info(f"Начало обработки уведомления {notification.id}")
 
         try:
+            # Параметры разбора категории (собираются один раз и кэшируются в процессе)
+            config = get_parsing_config(notification.category_id)
+
             # 1. ВАЛИДАЦИЯ CONTENT-TYPE
-            if not cls.validate_content_type(notification.content_type):
-                notification.status = 'error'
-                notification.error_description = f"Неподдерживаемый Content-Type: {notification.content_type}"
-                notification.processed_at = timezone.now()
-                notification.save()
+            if not cls.validate_content_type(notification.content_type, config):
+                cls.set_error(notification, f"Неподдерживаемый Content-Type: {notification.content_type}")
+                cls.save_result(notification, commit)
                 logger.warning(f"Webhook {notification.id}: неподдерживаемый Content-Type")
                 return
 
             # 2. ВАЛИДАЦИЯ РАЗМЕРА ДАННЫХ
-            if not cls.validate_data_size(notification.data):
-                notification.status = 'error'
-                notification.error_description = f"Превышен максимальный размер данных"
-                notification.processed_at = timezone.now()
-                notification.save()
+            if not cls.validate_data_size(notification.data, config.max_body_size):
+                cls.set_error(notification, f"Превышен максимальный размер данных")
+                cls.save_result(notification, commit)
                 logger.warning(f"Webhook {notification.id}: превышен размер данных")
                 return
 
@@ -228,58 +332,20 @@ class WebhookProcessor:
             content_type = notification.content_type.split(';')[0].strip().lower()
 
             if content_type == 'application/x-www-form-urlencoded':
-                cls.safe_parse_form_data(notification)
+                cls.safe_parse_form_data(notification, config, commit)
             elif content_type == 'application/json':
-                cls.safe_parse_json_data(notification)
+                cls.safe_parse_json_data(notification, config, commit)
             else:
                 # Для неизвестных типов просто сохраняем сырые данные
                 # notification.parsed_body = {"raw_data": notification.data[:1000]}  # Обрезаем для безопасности
                 # notification.status = 'complete'
                 # logger.info(f"Webhook {notification.id}: обработан как сырые данные")
                 notification.parsed_body = {}
-                notification.status = 'error'
-                notification.error_description = f"Неизвестный тип content_type!"
-                notification.processed_at = timezone.now()
-                notification.save()
+                cls.set_error(notification, f"Неизвестный тип content_type!")
+                cls.save_result(notification, commit)
                 logger.error(f"Неизвестный тип content_type! при обработки уведомления {notification.id}")
 
         except Exception as err:
-            notification.status = 'error'
-            notification.error_description = f"Критическая ошибка обработки: {str(err)}"
-            notification.processed_at = timezone.now()
-            notification.save()
+            cls.set_error(notification, f"Критическая ошибка обработки: {str(err)}", permanent=False)
+            cls.save_result(notification, commit)
             logger.error(f"Критическая ошибка обработки уведомления {notification.id}: {str(err)}")
-
-    @classmethod
-    def process_pending_notifications(cls):
-        """
-        Обработка всех уведомлений со статусом 'новый'
-        """
-        pending_notifications = WebhookRequest.objects.filter(status='new')
-        total_count = pending_notifications.count()
-
-        if total_count == 0:
-            logger.info("Нет ожидающих уведомлений для обработки")
-            return
-
-        logger.info(f"Начало обработки {total_count} ожидающих уведомлений")
-
-        # Ограничение на batch processing
-        batch_size = 100
-        processed_count = 0
-        error_count = 0
-
-        for notification in pending_notifications[:batch_size]:
-            try:
-                cls.process_single_notification(notification)
-                processed_count += 1
-            except Exception as err:
-                error_count += 1
-                logger.error(f"Критическая ошибка обработки уведомления {notification.id}: {str(err)}")
-
-        logger.info(
-            f"Обработка завершена. "
-            f"Успешно: {processed_count}, "
-            f"Ошибок: {error_count}, "
-            f"Всего: {total_count}"
-        )
@@ -1,41 +1,169 @@
+import inspect
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 
-from rest_framework import status, generics, filters
+from rest_framework import status, generics, filters, exceptions
 from rest_framework.parsers import JSONParser, FormParser
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework.permissions import IsAuthenticated
 
 from main_wh.models import WebhookRequest, CategoryWebhook
 from main_wh.serializers import (WebhookRequestSerializer, WebhookRequestDetailSerializer,
-                                 WebhookRequestUpdateSerializer)
+                                 WebhookRequestUpdateSerializer, WebhookRequestBulkUpdateSerializer)
 from main_wh.permissions import (WebhookPermission, HealthCheckPermission,
                                  InternalServicePermission, WebhookReadPermission, WebhookUpdatePermission)
 from main_wh.authentication import InternalServiceJWT
-from main_wh.utils import get_client_ip
-
-# Импортируем Celery задачу
-from main_wh.tasks import process_webhook_notification
+from main_wh.utils import get_client_ip, build_notification_record, get_media_type, WebhookProcessor
+from main_wh.conf import app_settings
+from main_wh.ingest import get_ingest_buffer, ACK_DURABLE
+from main_wh.category_cache import category_cache
+from main_wh.parsing_profile import get_parsing_config
+from main_wh.pagination import WebhookPagination
+from main_wh.change_feed import change_feed
+from main_wh.conditional import get_not_modified_response, make_etag, set_validators
+from main_wh.fast_serializers import (WebhookRequestDetailFastSerializer, get_only_fields, get_requested_fields,
+                                      uses_category)
+from main_wh.export import EXPORT_CONTENT_TYPES, EXPORT_FORMAT_CSV, EXPORT_FORMAT_NDJSON, stream_export
+
+# Постановка уведомлений в обработку Celery
+from main_wh.dispatcher import notification_dispatcher
+from main_wh.sweeper import get_state as get_sweeper_state
 
 import logging
 logger = logging.getLogger(__name__)
 
 
-class WebhookRequestCreateAPIView(generics.CreateAPIView):
-    """Описание точки входа для создания записей"""
+class WebhookIngestMixin:
+    """
+    Общая логика приёма уведомлений синхронной и асинхронной точек:
+    проверки, запись в протоколе и ответы отправителю одинаковы.
+    """
 
     parser_classes = [JSONParser, FormParser]
     # Отключаем аутентификацию для webhook
     authentication_classes = []
     # Ограничиваем только методом POST
     permission_classes = [WebhookPermission]
-    serializer_class = WebhookRequestSerializer
 
     # Использует лимит 'webhook' из настроек throttling
     throttle_scope = 'webhook'
 
+    @staticmethod
+    def error_response(message, status_code):
+        return Response({"status": "error", "message": message}, status=status_code)
+
+    @staticmethod
+    def success_response():
+        return Response({
+            "status": "success",
+            "message": "Успех! Уведомление принято!"
+        }, status=status.HTTP_200_OK)
+
+    def not_found_response(self):
+        # Возвращаем 404 без деталей для безопасности
+        return self.error_response("Not found", status.HTTP_404_NOT_FOUND)
+
+    def prepare_record(self, request, category, parsing_config):
+        """
+        Проверка Content-Type и размера данных, разбор тела и поля записи в протоколе.
+        Только вычисления над уже прочитанным телом запроса (без обращений к БД и Redis).
+
+        Returns:
+            tuple: (поля WebhookRequest, None) или (None, ответ с ошибкой)
+        """
+
+        # Извлекает основной MIME-тип из заголовка Content-Type,
+        # игнорируя кодировку и другие параметры.
+        content_type_request = get_media_type(request.content_type)
+
+        # ЯВНАЯ проверка Content-Type
+        if not parsing_config.allows_content_type(content_type_request):
+            logger.warning(f"Заблокирован неподдерживаемый Content-Type: {request.content_type} "
+                           f"from IP: {get_client_ip(request)}")
+            return None, self.error_response("Unsupported Content-Type", status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        # Проверка размера данных
+        if len(request.body) > parsing_config.max_body_size:
+            logger.error(f"Превышен допустимый размер данных from IP: {get_client_ip(request)}")
+            return None, self.error_response("Превышен допустимый размер данных",
+                                             status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Извлечение полученных данных
+        try:
+            raw_body = request.body.decode('utf-8')
+        except (AttributeError, UnicodeDecodeError):
+            # Для бинарных данных или других кодировок
+            raw_body = request.body.decode('utf-8', errors='replace')
+
+        # ОБРАБОТКА РАЗНЫХ ФОРМАТОВ ДАННЫХ
+        parsed_data = {}
+        body_validated = False
+
+        if content_type_request == 'application/json':
+            # Разбираем и проверяем JSON один раз: воркер не будет повторять эту работу
+            parsed_data, body_validated = WebhookProcessor.prevalidate_json_body(
+                request.body, request.encoding or 'utf-8', parsing_config
+            )
+
+        # Поля записи в протоколе
+        return build_notification_record(request, category, parsed_data, raw_body, body_validated), None
+
+    def ticket_response(self, ticket, written):
+        """
+        Ответ отправителю по квитанции буфера приёма (written - дождались ли записи в БД
+        в режиме 'durable', в режиме 'accepted' - всегда True).
+        """
+
+        if not written:
+            logger.error("Истекло время ожидания записи уведомления из буфера")
+            return self.error_response("Service temporarily unavailable", status.HTTP_503_SERVICE_UNAVAILABLE)
+        if ticket.error:
+            return self.error_response(ticket.error, status.HTTP_400_BAD_REQUEST)
+        return self.success_response()
+
+    @staticmethod
+    def submit_to_buffer(record):
+        """
+        Помещение уведомления в буфер пакетной записи.
+        Returns:
+            tuple: (квитанция или None, если буфер переполнен и уведомление нужно записать напрямую,
+                    признак ожидания записи в БД)
+        """
+
+        durable = app_settings.INGEST_ACK_MODE == ACK_DURABLE
+        ticket = get_ingest_buffer().submit(record, durable=durable)
+        if ticket is None:
+            logger.warning("Буфер приёма уведомлений переполнен, запись напрямую")
+        return ticket, durable
+
+
+class WebhookRequestCreateAPIView(WebhookIngestMixin, generics.CreateAPIView):
+    """Описание точки входа для создания записей"""
+
+    serializer_class = WebhookRequestSerializer
+
+    def buffer_notification(self, record):
+        """
+        Помещение уведомления в буфер пакетной записи.
+        Возвращает ответ отправителю или None, если буфер переполнен
+        и уведомление нужно записать напрямую.
+        """
+
+        ticket, durable = self.submit_to_buffer(record)
+        if ticket is None:
+            return None
+
+        # В режиме 'durable' ждём, пока сборщик запишет пакет с этим уведомлением в БД
+        written = ticket.wait(app_settings.INGEST_ACK_TIMEOUT) if durable else True
+        return self.ticket_response(ticket, written)
+
     def create(self, request, *args, **kwargs):
         """
         Переопределяем метод создания записей для реализации задуманной логики
@@ -47,97 +175,135 @@ class WebhookRequestCreateAPIView(generics.CreateAPIView):
         try:
             find_category = CategoryWebhook.get_active_by_external_id(id_ext)
             if not find_category:
-                # Возвращаем 404 без деталей для безопасности
-                return Response(
-                    {"status": "error", "message": "Not found"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+                return self.not_found_response()
         except Exception as err:
             # Записываем в журнал ошибку
             logger.error(f"Ошибка при направлении Уведомления: {str(err)}")
 
             # Любая ошибка - возвращаем 404
-            return Response(
-                {"status": "error", "message": "Not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        # ЯВНАЯ проверка Content-Type
-        allowed_content_types = [
-            'application/json',
-            'application/x-www-form-urlencoded'
-        ]
-
-        # Извлекает основной MIME-тип из заголовка Content-Type,
-        # игнорируя кодировку и другие параметры.
-        content_type_request = request.content_type
-        if content_type_request:
-            # Разделяем строку по точке с запятой и берем первую часть,
-            # а также приводим к нижнему регистру для единообразия
-            content_type_request = content_type_request.split(';')[0].strip().lower()
-
-        if content_type_request not in allowed_content_types:
-            logger.warning(f"Заблокирован неподдерживаемый Content-Type: {request.content_type} "
-                           f"from IP: {get_client_ip(request)}")
-            return Response(
-                {"status": "error", "message": "Unsupported Content-Type"},
-                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
-            )
+            return self.not_found_response()
 
         try:
-            # Проверка размера данных
-            if len(request.body) > 10000:  # Лимит из модели
-                logger.error(f"Превышен допустимый размер данных from IP: {get_client_ip(request)}")
-                return Response({
-                    "status": "error",
-                    "message": "Превышен допустимый размер данных"
-                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-
-            # Извлечение полученных данных
-            try:
-                raw_body = request.body.decode('utf-8')
-            except (AttributeError, UnicodeDecodeError):
-                # Для бинарных данных или других кодировок
-                raw_body = request.body.decode('utf-8', errors='replace')
+            # Параметры разбора категории: допустимые Content-Type, лимиты и профиль проверки
+            parsing_config = get_parsing_config(find_category.id, find_category)
 
-            # ОБРАБОТКА РАЗНЫХ ФОРМАТОВ ДАННЫХ
-            parsed_data = {}
+            record, error_response = self.prepare_record(request, find_category, parsing_config)
+            if error_response is not None:
+                return error_response
 
-            if content_type_request == 'application/json':
-                # Для JSON используем request.data
-                parsed_data = request.data if request.data else {}
+            # Буферизованный режим: запись в БД и постановка в Celery выполняются пакетами
+            if app_settings.INGEST_BUFFER_ENABLED:
+                response = self.buffer_notification(record)
+                if response is not None:
+                    return response
 
             # Создание записи в протоколе
-            notification = WebhookRequest.objects.create(
-                path=request.path,
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                ip_adr=get_client_ip(request),
-                parsed_body=parsed_data,
-                data=raw_body,
-                status='new',
-                request_method=request.method,
-                full_url=request.build_absolute_uri(),
-                content_type=request.content_type,
-                category=find_category,
-            )
+            notification = WebhookRequest.objects.create(**record)
 
-            # Запуск обработки полученных данных через Celery
-            process_webhook_notification.delay(notification.id)
+            # Запуск обработки полученных данных через Celery (по одному или пакетами)
+            notification_dispatcher.dispatch(notification.id)
 
             # Возвращаем успешный ответ
-            return Response({
-                "status": "success",
-                "message": "Успех! Уведомление принято!"
-            }, status=status.HTTP_200_OK)
+            return self.success_response()
 
         except Exception as err:
             # Записываем в журнал ошибку, не пытаемся создавать уведомление об ошибке
             logger.error(f"Критическая ошибка при сохранении webhook: {str(err)}")
+            return self.error_response(str(err), status.HTTP_400_BAD_REQUEST)
 
-            return Response(
-                {"status": "error", "message": str(err)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+
+class AsyncAPIView(APIView):
+    """
+    APIView с асинхронными обработчиками (для запуска под ASGI-сервером):
+    DRF 3.16 не поддерживает их сам. Согласование формата, аутентификация, разрешения и throttling
+    (обращаются к БД и кэшу) выполняются вне цикла событий, исключения и оформление ответа -
+    штатными механизмами DRF. Отрисовку ответа выполняет обработчик Django.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncWebhookCreateView(WebhookIngestMixin, AsyncAPIView):
+    """
+    Асинхронная точка приёма уведомлений (для запуска под ASGI-сервером).
+    Проверки и ответы - общие с WebhookRequestCreateAPIView (WebhookIngestMixin), разрешения,
+    throttling, согласование формата и обработка исключений - те же механизмы DRF (AsyncAPIView).
+    Синхронные обращения к БД, кэшу, Redis и брокеру выполняются вне цикла событий (sync_to_async).
+    """
+
+    async def post(self, request, *args, **kwargs):
+        id_ext = kwargs.get('id_ext')
+
+        # Проверяем существование категории
+        try:
+            find_category = await CategoryWebhook.aget_active_by_external_id(id_ext)
+            if not find_category:
+                return self.not_found_response()
+        except Exception as err:
+            logger.error(f"Ошибка при направлении Уведомления: {str(err)}")
+            return self.not_found_response()
+
+        try:
+            # При промахе кэша параметры разбора загружаются из БД
+            parsing_config = await sync_to_async(get_parsing_config)(find_category.id, find_category)
+
+            # Тело запроса ASGI-сервер уже прочитал целиком, обращение к нему не блокирует цикл событий
+            record, error_response = self.prepare_record(request, find_category, parsing_config)
+            if error_response is not None:
+                return error_response
+
+            if app_settings.INGEST_BUFFER_ENABLED:
+                response = await self.buffer_notification(record)
+                if response is not None:
+                    return response
+
+            notification = await WebhookRequest.objects.acreate(**record)
+
+            # Публикация в брокер Celery (или Redis) синхронная, выполняем её вне цикла событий
+            await sync_to_async(notification_dispatcher.dispatch, thread_sensitive=False)(notification.id)
+
+            return self.success_response()
+
+        except Exception as err:
+            logger.error(f"Критическая ошибка при сохранении webhook: {str(err)}")
+            return self.error_response(str(err), status.HTTP_400_BAD_REQUEST)
+
+    async def buffer_notification(self, record):
+        """
+        Асинхронный вариант WebhookRequestCreateAPIView.buffer_notification.
+        """
+
+        ticket, durable = await sync_to_async(self.submit_to_buffer, thread_sensitive=False)(record)
+        if ticket is None:
+            return None
+
+        written = True
+        if durable:
+            written = await sync_to_async(ticket.wait, thread_sensitive=False)(app_settings.INGEST_ACK_TIMEOUT)
+        return self.ticket_response(ticket, written)
 
 
 class HealthCheckAPIView(generics.RetrieveAPIView):
@@ -164,31 +330,40 @@ class HealthCheckAPIView(generics.RetrieveAPIView):
         })
 
 
-class WebhookPagination(PageNumberPagination):
+class WebhookRequestFilterMixin:
     """
-    Модифицированная нумерация страниц с метаданными сервиса
+    Общая фильтрация Уведомлений для списка и выгрузки.
     """
-    page_size = 100
-    page_size_query_param = 'page_size'
-    max_page_size = 500
 
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,  # Общее количество (не только на странице!)
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data,
-            'service': 'webhook_service',
-            'version': '1.0',
-            'page': self.page.number,
-            'total_pages': self.page.paginator.num_pages,
-            'page_size': self.get_page_size(self.request)
-        })
+    # Поля, по которым доступна фильтрация через DjangoFilterBackend
+    filterset_fields = ['id', 'status', 'business_status', 'category__id_ext']
+
+    # Метод получения QuerySet (набора данных) для этого представления
+    def get_queryset(self):
+        # Начинаем с менеджера модели
+        # select_related('category') - оптимизация запроса: загружает связанную категорию одним запросом
+        queryset = WebhookRequest.objects.select_related('category')
+
+        # Фильтрация по дате: получаем параметры из query string запроса
+        date_from = self.request.query_params.get('date_from')  # Дата начала периода
+        date_to = self.request.query_params.get('date_to')  # Дата окончания периода
 
+        # Применяем фильтры в оптимальном порядке
+        if date_from and date_to:
+            # Используем __range для одного условия вместо двух
+            queryset = queryset.filter(inserted_at__range=[date_from, date_to])
+        elif date_from:
+            queryset = queryset.filter(inserted_at__gte=date_from)
+        elif date_to:
+            queryset = queryset.filter(inserted_at__lte=date_to)
 
-class WebhookRequestListAPIView(generics.ListAPIView):
+        return queryset
+
+
+class WebhookRequestListAPIView(WebhookRequestFilterMixin, generics.ListAPIView):
     """
     Список Уведомлений с фильтрацией.
+    Постраничный вывод по номеру страницы или по курсору (?pagination=cursor, см. WebhookCursorPagination).
     """
 
     authentication_classes = [InternalServiceJWT]
@@ -201,35 +376,101 @@ class WebhookRequestListAPIView(generics.ListAPIView):
     # filters.OrderingFilter - сортировка результатов
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
 
-    # Поля, по которым доступна фильтрация через DjangoFilterBackend
-    filterset_fields = ['id', 'status', 'business_status', 'category__id_ext']
-
     # Поля, по которым доступна сортировка через OrderingFilter
     ordering_fields = ['inserted_at', 'processed_at', 'business_processed_at']
 
     # Сортировка по умолчанию (по убыванию даты вставки)
     ordering = ['-inserted_at']
 
-    # Метод получения QuerySet (набора данных) для этого представления
-    def get_queryset(self):
-        # Начинаем с менеджера модели
-        # select_related('category') - оптимизация запроса: загружает связанную категорию одним запросом
-        queryset = WebhookRequest.objects.select_related('category')
+    def list(self, request, *args, **kwargs):
+        """
+        Страница выбирается по узким колонкам (id, inserted_at, updated_at): по ним строится ETag,
+        и при совпадении с If-None-Match клиент получает 304 без чтения остальных колонок.
+        Иначе колонки ответа читаются по id записей страницы и ответ строится из кортежей values_list
+        (WebhookRequestDetailFastSerializer), результат совпадает с ответом serializer_class.
+        """
 
-        # Фильтрация по дате: получаем параметры из query string запроса
-        date_from = self.request.query_params.get('date_from')  # Дата начала периода
-        date_to = self.request.query_params.get('date_to')  # Дата окончания периода
+        # Параметр fields= ограничивает и колонки запроса, и поля ответа
+        fields = get_requested_fields(request)
+        fast_serializer = WebhookRequestDetailFastSerializer(fields)
+        queryset = self.filter_queryset(self.get_queryset())
 
-        # Применяем фильтры в оптимальном порядке
-        if date_from and date_to:
-            # Используем __range для одного условия вместо двух
-            queryset = queryset.filter(inserted_at__range=[date_from, date_to])
-        elif date_from:
-            queryset = queryset.filter(inserted_at__gte=date_from)
-        elif date_to:
-            queryset = queryset.filter(inserted_at__lte=date_to)
+        # inserted_at и id нужны и для ссылок постраничного вывода по курсору.
+        # Название и код Категории копируются в ответ, поэтому с ними в версию входит и версия Категории
+        version_columns = ('updated_at', 'category__updated_at') if uses_category(fields) else ('updated_at',)
+        page = self.paginate_queryset(queryset.values_list('id', 'inserted_at', *version_columns, named=True))
+        if page is None:
+            return Response(fast_serializer.serialize(fast_serializer.prepare_queryset(queryset)))
 
-        return queryset
+        # Метаданные страницы (count, ссылки) входят в ETag вместе с версиями записей
+        response = self.get_paginated_response([])
+        versions = [(row.id, *(getattr(row, column) for column in version_columns)) for row in page]
+        last_modified = max((value for version in versions for value in version[1:] if value), default=None)
+        etag = make_etag(fields, [(key, value) for key, value in response.data.items() if key != 'results'],
+                         versions)
+
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        rows = fast_serializer.prepare_queryset(queryset.filter(id__in=[row.id for row in page]).order_by(),
+                                                named=True, extra_columns=('id',))
+        rows_by_id = {row.id: row for row in rows}
+        response.data['results'] = fast_serializer.serialize(
+            [rows_by_id[row.id] for row in page if row.id in rows_by_id])
+
+        return set_validators(response, etag, last_modified)
+
+
+class WebhookRequestExportAPIView(WebhookRequestFilterMixin, generics.GenericAPIView):
+    """
+    Потоковая выгрузка Уведомлений (NDJSON или CSV) с теми же фильтрами, что у списка.
+    Записи идут по возрастанию id; since_id - точка продолжения прерванной выгрузки.
+    Только для внутренних сервисов.
+    """
+
+    authentication_classes = [InternalServiceJWT]
+    permission_classes = [IsAuthenticated, InternalServicePermission]
+    filter_backends = [DjangoFilterBackend]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Формат ответа задаёт параметр output, а не заголовок Accept
+        return super().perform_content_negotiation(request, force=True)
+
+    @staticmethod
+    def get_int_param(request, name):
+        value = request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise exceptions.ValidationError({name: 'Ожидается целое число'})
+        if value < 0:
+            raise exceptions.ValidationError({name: 'Ожидается неотрицательное число'})
+        return value
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('output', EXPORT_FORMAT_NDJSON)
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise exceptions.ValidationError({'output': f"Допустимые значения: {', '.join(EXPORT_CONTENT_TYPES)}"})
+
+        since_id = self.get_int_param(request, 'since_id')
+        limit = self.get_int_param(request, 'limit')
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        response = StreamingHttpResponse(stream_export(queryset, export_format, since_id=since_id, limit=limit,
+                                                       fields=get_requested_fields(request)),
+                                         content_type=EXPORT_CONTENT_TYPES[export_format])
+        if export_format == EXPORT_FORMAT_CSV:
+            response['Content-Disposition'] = 'attachment; filename="webhooks.csv"'
+        # Без буферизации ответа в nginx: записи уходят клиенту по мере чтения из БД
+        response['X-Accel-Buffering'] = 'no'
+
+        logger.info(f"Выгрузка Уведомлений ({export_format}, since_id={since_id}) "
+                    f"сервисом {request.META.get('HTTP_X_SERVICE_NAME', 'unknown')}")
+        return response
 
 
 class WebhookRequestRetrieveAPIView(generics.RetrieveAPIView):
@@ -247,6 +488,43 @@ class WebhookRequestRetrieveAPIView(generics.RetrieveAPIView):
     # Поле, используемое для поиска объекта.
     lookup_field = 'id'
 
+    def get_queryset(self):
+        # Читаются только колонки запрошенных полей (fields=): без parsed_body JSONB не распаковывается.
+        # updated_at (и версия Категории, если её поля в ответе) - для ETag и Last-Modified
+        fields = get_requested_fields(self.request)
+        queryset = super().get_queryset()
+        if not uses_category(fields):
+            # Категория не нужна - без JOIN
+            return queryset.select_related(None).only(*get_only_fields(fields), 'updated_at')
+        return queryset.only(*get_only_fields(fields), 'updated_at', 'category__updated_at')
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = get_requested_fields(self.request)
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Запись читается одним запросом (только колонки запрошенных полей и версии): если версия
+        совпадает с версией клиента (If-None-Match / If-Modified-Since) - ответ 304, иначе
+        ответ строится из того же объекта.
+        """
+
+        # Ответ 404 - стандартным путём (Http404 из get_object)
+        instance = self.get_object()
+        fields = get_requested_fields(request)
+
+        versions = [instance.updated_at]
+        if uses_category(fields):
+            versions.append(instance.category.updated_at)
+        last_modified = max(versions)
+
+        etag = make_etag(instance.id, versions, fields)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        return set_validators(Response(self.get_serializer(instance).data), etag, last_modified)
+
 
 class WebhookRequestUpdateAPIView(generics.UpdateAPIView):
     """
@@ -275,6 +553,7 @@ class WebhookRequestUpdateAPIView(generics.UpdateAPIView):
         2. business_status - для сравнения старого и нового значения
         3. business_processed_at - для проверки NULL_DATE и установки времени
         4. status - проверка статуса из списка.
+        5. updated_at - версия записи (ETag): без неё частичное сохранение не обновит поле
         """
 
         # Импортируем NULL_DATE, если она используется в сериализаторе
@@ -286,6 +565,7 @@ class WebhookRequestUpdateAPIView(generics.UpdateAPIView):
             'business_status',  # Для сравнения старого/нового значения
             'business_processed_at',  # Для проверки в update() сериализатора
             'status',  # Для проверки validate_business_status сериализатора
+            'updated_at',  # Для обновления версии записи при сохранении
         )
 
     def get_serializer_context(self):
@@ -319,6 +599,123 @@ class WebhookRequestUpdateAPIView(generics.UpdateAPIView):
         return response
 
 
+class WebhookRequestBulkUpdateAPIView(generics.GenericAPIView):
+    """
+    Пакетное обновление бизнес-статуса Уведомлений.
+    Тело запроса - список {id, business_status, business_processed_at} (или {"items": [...]}),
+    в ответе - результат по каждому идентификатору.
+    Только для внутренних сервисов.
+    """
+
+    authentication_classes = [InternalServiceJWT]
+    permission_classes = [IsAuthenticated, InternalServicePermission, WebhookUpdatePermission]
+    serializer_class = WebhookRequestBulkUpdateSerializer
+
+    # Разрешенные HTTP-методы (только PATCH, т.к. обновляем частично)
+    http_method_names = ['patch']
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Добавляем имя сервиса из заголовка HTTP_X_SERVICE_NAME
+        context['service_name'] = self.request.META.get('HTTP_X_SERVICE_NAME', 'unknown')
+        return context
+
+    def patch(self, request, *args, **kwargs):
+        data = request.data if isinstance(request.data, dict) else {'items': request.data}
+
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+
+        return Response({
+            'updated': sum(1 for result in results if result['status'] == serializer.RESULT_UPDATED),
+            'not_found': sum(1 for result in results if result['status'] == serializer.RESULT_NOT_FOUND),
+            'invalid': sum(1 for result in results if result['status'] == serializer.RESULT_INVALID),
+            'results': results,
+        })
+
+
+class WebhookChangeFeedAPIView(AsyncAPIView):
+    """
+    Лента изменений Уведомлений вместо периодического опроса списка: события разбора (processed)
+    и изменения бизнес-статуса (business_status), см. main_wh.change_feed.
+    По умолчанию - long-poll: ответ приходит сразу, как только после курсора появляются события,
+    или через timeout секунд с пустым списком. С заголовком Accept: text/event-stream -
+    Server-Sent Events (курсор переподключения - заголовок Last-Event-ID).
+    Ожидание (timeout и Server-Sent Events) - только под ASGI-сервером (app-asgi): под WSGI каждый
+    ожидающий запрос занимал бы синхронный воркер gunicorn целиком, там доступен только опрос без ожидания.
+    Только для внутренних сервисов.
+    """
+
+    authentication_classes = [InternalServiceJWT]
+    permission_classes = [InternalServicePermission, WebhookReadPermission]
+
+    # Максимальное количество событий в одном ответе
+    max_limit = 1000
+
+    def perform_content_negotiation(self, request, force=False):
+        # text/event-stream отдаётся мимо рендереров DRF
+        return super().perform_content_negotiation(request, force=True)
+
+    async def get(self, request, *args, **kwargs):
+        if not app_settings.CHANGE_FEED_ENABLED:
+            raise exceptions.NotFound('Лента изменений отключена')
+
+        cursor = request.query_params.get('cursor') or request.META.get('HTTP_LAST_EVENT_ID')
+        if cursor and not change_feed.validate_cursor(cursor):
+            raise exceptions.ValidationError({'cursor': 'Недопустимый курсор'})
+
+        limit = min(WebhookRequestExportAPIView.get_int_param(request, 'limit') or 100, self.max_limit)
+        stream = 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+        timeout = WebhookRequestExportAPIView.get_int_param(request, 'timeout')
+
+        if not isinstance(request._request, ASGIRequest):
+            if stream:
+                raise exceptions.NotAcceptable('Server-Sent Events доступны только под ASGI-сервером')
+            if timeout:
+                raise exceptions.ValidationError({'timeout': 'Ожидание событий доступно только под ASGI-сервером'})
+            timeout = 0
+
+        if stream:
+            response = StreamingHttpResponse(self.stream_events(cursor, limit), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Без буферизации ответа в nginx: события уходят клиенту сразу
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        wait = min(app_settings.CHANGE_FEED_MAX_WAIT if timeout is None else timeout, app_settings.CHANGE_FEED_MAX_WAIT)
+
+        redis_client = change_feed.get_reader_client()
+        try:
+            events, cursor, truncated = await change_feed.aread(redis_client, cursor, limit=limit, wait=wait)
+        finally:
+            await redis_client.aclose()
+        return Response({'events': events, 'cursor': cursor, 'truncated': truncated})
+
+    @staticmethod
+    async def stream_events(cursor, limit):
+        # Клиент переподключается через секунду после закрытия соединения (CHANGE_FEED_SSE_DURATION)
+        yield 'retry: 1000\n\n'
+        redis_client = change_feed.get_reader_client()
+        try:
+            first = True
+            async for events, cursor, truncated in change_feed.aiter_events(redis_client, cursor, limit=limit):
+                if first and truncated:
+                    # Часть событий после курсора вытеснена: клиенту нужна сверка через список
+                    yield f'event: truncated\ndata: {json.dumps({"cursor": cursor})}\n\n'
+                first = False
+
+                if not events:
+                    # Комментарий SSE: соединение не простаивает и не закрывается прокси
+                    yield ': keepalive\n\n'
+                for event in events:
+                    yield f"id: {event['cursor']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as err:
+            logger.error(f"Ошибка чтения ленты изменений: {err}")
+        finally:
+            await redis_client.aclose()
+
+
 class WebhookQueueStatsAPIView(generics.RetrieveAPIView):
     """
     Статистика Redis очереди.
@@ -333,8 +730,63 @@ class WebhookQueueStatsAPIView(generics.RetrieveAPIView):
         # Импорт здесь, чтобы избежать циклических импортов
         from .redis_client import redis_queue
 
+        from .outbox import get_outbox_stats
+
         # Получаем статистику очереди из Redis-клиента
         stats = redis_queue.get_queue_stats()
+        # Сообщения, ещё не отправленные из outbox в очередь
+        stats['outbox'] = get_outbox_stats()
+
+        try:
+            stats['change_feed'] = change_feed.get_stats()
+        except Exception as err:
+            stats['change_feed'] = {'error': str(err)}
+
+        # Буфер приёма: ожидающие записи и отклонённые при записи уведомления
+        if app_settings.INGEST_BUFFER_ENABLED:
+            try:
+                stats['ingest_buffer'] = get_ingest_buffer().stats()
+            except Exception as err:
+                stats['ingest_buffer'] = {'error': str(err)}
+
+        # Состояние досборки ожидающих уведомлений (последний замер)
+        try:
+            stats['sweeper'] = get_sweeper_state()
+        except Exception as err:
+            stats['sweeper'] = {'error': str(err)}
 
         # Возвращаем статистику в виде JSON-ответа
         return Response(stats)
+
+
+class CategoryCacheStatsAPIView(generics.RetrieveAPIView):
+    """
+    Счётчики кэша Категорий Уведомлений (для воркера, обработавшего запрос).
+    Только для внутренних сервисов.
+    """
+
+    authentication_classes = [InternalServiceJWT]
+    permission_classes = [InternalServicePermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response(category_cache.stats())
+
+
+class MetricsAPIView(generics.GenericAPIView):
+    """
+    Метрики в формате Prometheus (досборка: размер очереди, скорость, оценка времени разбора).
+    Только для внутренних сервисов.
+    """
+
+    authentication_classes = [InternalServiceJWT]
+    permission_classes = [InternalServicePermission]
+
+    def get(self, request, *args, **kwargs):
+        # Импорт здесь: prometheus_client нужен только этой точке
+        from .metrics import CONTENT_TYPE, render_metrics
+
+        try:
+            return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+        except Exception as err:
+            logger.error(f"Ошибка получения метрик: {err}")
+            return Response({'error': 'Метрики недоступны'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)